@@ -0,0 +1,87 @@
+"""add problem categories, review classification and store problem stats
+
+Revision ID: a1c3e5b7d9f2
+Revises: f6b8d0e2a4c5
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import pgvector.sqlalchemy
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1c3e5b7d9f2'
+down_revision: Union[str, Sequence[str], None] = 'f6b8d0e2a4c5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('problem_categories',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('category_key', sa.String(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('keywords', sa.JSON(), nullable=False, server_default='[]'),
+    sa.Column('severity_weight', sa.Float(), nullable=False, server_default='0.5'),
+    sa.Column('action_template', sa.Text(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=False, server_default=sa.true()),
+    sa.Column('language', sa.String(), nullable=False, server_default='en'),
+    # Same type as the review embeddings it is compared against
+    sa.Column('embedding', pgvector.sqlalchemy.vector.VECTOR(dim=1536), nullable=True),
+    sa.Column('embedding_model', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('category_key')
+    )
+    op.create_index(op.f('ix_problem_categories_id'), 'problem_categories', ['id'], unique=False)
+
+    op.create_table('store_problem_stats',
+    sa.Column('store_id', sa.Integer(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('review_count', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('rating_sum', sa.Float(), nullable=False, server_default='0'),
+    sa.Column('similarity_sum', sa.Float(), nullable=False, server_default='0'),
+    sa.Column('last_review_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['store_id'], ['stores.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['category_id'], ['problem_categories.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('store_id', 'category_id')
+    )
+
+    op.add_column('reviews', sa.Column('problem_category_id', sa.Integer(), nullable=True))
+    op.add_column('reviews', sa.Column('problem_similarity', sa.Float(), nullable=True))
+    op.add_column('reviews', sa.Column('analyzed_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_foreign_key(
+        'reviews_problem_category_id_fkey', 'reviews', 'problem_categories',
+        ['problem_category_id'], ['id'], ondelete='SET NULL'
+    )
+
+    # CONCURRENTLY keeps reviews writable while the index is built
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_reviews_unanalyzed',
+            'reviews',
+            ['id'],
+            unique=False,
+            postgresql_where=sa.text('analyzed_at IS NULL AND embedding IS NOT NULL'),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_reviews_unanalyzed', table_name='reviews', postgresql_concurrently=True, if_exists=True)
+    op.drop_constraint('reviews_problem_category_id_fkey', 'reviews', type_='foreignkey')
+    op.drop_column('reviews', 'analyzed_at')
+    op.drop_column('reviews', 'problem_similarity')
+    op.drop_column('reviews', 'problem_category_id')
+    op.drop_table('store_problem_stats')
+    op.drop_index(op.f('ix_problem_categories_id'), table_name='problem_categories')
+    op.drop_table('problem_categories')
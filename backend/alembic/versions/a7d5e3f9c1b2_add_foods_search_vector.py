@@ -0,0 +1,54 @@
+"""add foods search vector
+
+Revision ID: a7d5e3f9c1b2
+Revises: f3b8c2d1a6e4
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d5e3f9c1b2'
+down_revision: Union[str, Sequence[str], None] = 'f3b8c2d1a6e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(json_to_tsvector('simple', coalesce(main_ingredients, '[]'::json), '[\"string\"]'), 'B') || "
+    "setweight(json_to_tsvector('simple', coalesce(mood_tags, '[]'::json), '[\"string\"]'), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('foods', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed(SEARCH_VECTOR_SQL, persisted=True),
+        nullable=True
+    ))
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_foods_search_vector',
+            'foods',
+            ['search_vector'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_foods_search_vector', table_name='foods', postgresql_concurrently=True, if_exists=True)
+    op.drop_column('foods', 'search_vector')
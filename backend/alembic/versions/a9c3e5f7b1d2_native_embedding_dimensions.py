@@ -0,0 +1,144 @@
+"""store embeddings at a fixed native dimension
+
+Resizes every embedding column to STORAGE / DIMENSIONS below, the defaults of
+EMBEDDING_STORAGE and EMBEDDING_DIMENSIONS (OpenRouter's native 1536, float32),
+then rebuilds the HNSW indexes with the matching operator class. The values are
+fixed so the revision migrates the same schema wherever it runs; a deployment
+that changes either setting adds a new revision calling _migrate with its
+values (e.g. 'vector', 768 for Gemini).
+
+Shrinking keeps the leading components, which is exact for vectors that
+were zero-padded (Gemini's 768 stored as 1536). Rows that carried data in
+the dropped tail are marked 'stale' for init/backfill_embeddings.py.
+User profiles are derived data; refresh them with
+init/rebuild_user_profiles.py afterwards.
+
+Revision ID: a9c3e5f7b1d2
+Revises: e2f4a6b8c0d1
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9c3e5f7b1d2'
+down_revision: Union[str, Sequence[str], None] = 'e2f4a6b8c0d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+HNSW_INDEXES = [
+    ('ix_foods_embedding_hnsw', 'foods'),
+    ('ix_stores_embedding_hnsw', 'stores'),
+    ('ix_reviews_embedding_hnsw', 'reviews'),
+]
+
+# (table, column, has embedding_status)
+EMBEDDING_COLUMNS = [
+    ('foods', 'embedding', True),
+    ('stores', 'embedding', True),
+    ('reviews', 'embedding', True),
+    ('user_profiles', 'liked_embedding', False),
+    ('user_profiles', 'all_embedding', False),
+    ('embedding_cache', 'embedding', False),
+]
+
+STORAGE = 'vector'
+DIMENSIONS = 1536
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 64
+
+# pgvector refuses to build HNSW indexes above these sizes
+HNSW_MAX_DIMENSIONS = {'vector': 2000, 'halfvec': 4000}
+
+
+def _current_type(table_name: str, column_name: str):
+    # For vector/halfvec the type modifier is the dimension
+    row = op.get_bind().execute(
+        sa.text(
+            "SELECT t.typname, a.atttypmod FROM pg_attribute a "
+            "JOIN pg_type t ON t.oid = a.atttypid "
+            "WHERE a.attrelid = CAST(:table_name AS regclass) AND a.attname = :column_name"
+        ),
+        {'table_name': table_name, 'column_name': column_name},
+    ).one()
+    return row.typname, row.atttypmod
+
+
+def _resize_column(table_name: str, column_name: str, has_status: bool, storage: str, dimensions: int) -> None:
+    current_storage, current_dimensions = _current_type(table_name, column_name)
+    if (current_storage, current_dimensions) == (storage, dimensions):
+        return
+
+    target = f"{storage}({dimensions})"
+    if dimensions < current_dimensions:
+        if table_name == 'embedding_cache':
+            # Cached vectors of the old size are useless; let them be re-fetched
+            op.execute("DELETE FROM embedding_cache")
+        elif has_status:
+            norm = 'vector_norm' if current_storage == 'vector' else 'l2_norm'
+            op.execute(
+                f"UPDATE {table_name} SET embedding_status = 'stale' "
+                f"WHERE {column_name} IS NOT NULL "
+                f"AND {norm}(subvector({column_name}, {dimensions + 1}, {current_dimensions - dimensions})) > 0"
+            )
+        using = f"subvector({column_name}, 1, {dimensions})::{target}"
+    elif dimensions > current_dimensions:
+        using = (
+            f"({column_name}::real[] || array_fill(0::real, ARRAY[{dimensions - current_dimensions}]))::{target}"
+        )
+    else:
+        using = f"{column_name}::{target}"
+
+    op.execute(f"ALTER TABLE {table_name} ALTER COLUMN {column_name} TYPE {target} USING {using}")
+
+
+def _drop_hnsw_indexes() -> None:
+    with op.get_context().autocommit_block():
+        for index_name, table_name in HNSW_INDEXES:
+            op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True, if_exists=True)
+
+
+def _create_hnsw_indexes(storage: str) -> None:
+    # CONCURRENTLY keeps the tables writable while the graphs are built
+    with op.get_context().autocommit_block():
+        for index_name, table_name in HNSW_INDEXES:
+            op.create_index(
+                index_name,
+                table_name,
+                ['embedding'],
+                unique=False,
+                postgresql_using='hnsw',
+                postgresql_with={'m': HNSW_M, 'ef_construction': HNSW_EF_CONSTRUCTION},
+                postgresql_ops={'embedding': f'{storage}_cosine_ops'},
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def _migrate(storage: str, dimensions: int) -> None:
+    if dimensions > HNSW_MAX_DIMENSIONS[storage]:
+        raise ValueError(
+            f"HNSW supports at most {HNSW_MAX_DIMENSIONS[storage]} dimensions for {storage}; "
+            f"got EMBEDDING_DIMENSIONS={dimensions}"
+        )
+
+    _drop_hnsw_indexes()
+    for table_name, column_name, has_status in EMBEDDING_COLUMNS:
+        _resize_column(table_name, column_name, has_status, storage, dimensions)
+    _create_hnsw_indexes(storage)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _migrate(STORAGE, DIMENSIONS)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Back to the original layout: float32, zero-padded to 1536
+    _migrate('vector', 1536)
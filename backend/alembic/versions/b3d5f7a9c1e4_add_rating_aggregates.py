@@ -0,0 +1,56 @@
+"""add rating aggregates to stores and foods
+
+Revision ID: b3d5f7a9c1e4
+Revises: a1c3e5b7d9f2
+Create Date: 2026-10-17 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3d5f7a9c1e4'
+down_revision: Union[str, Sequence[str], None] = 'a1c3e5b7d9f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (table, review column pointing at it)
+TABLES = [('stores', 'store_id'), ('foods', 'food_id')]
+
+# Stars rounded half up and clamped to 1..5, as in app/services/rating_aggregates.py
+BUCKET_SQL = "LEAST(5, GREATEST(1, FLOOR(rating + 0.5)))"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table_name, review_column in TABLES:
+        op.add_column(table_name, sa.Column('rating_avg', sa.Float(), nullable=True))
+        op.add_column(table_name, sa.Column('rating_count', sa.Integer(), nullable=False, server_default='0'))
+        op.add_column(table_name, sa.Column(
+            'rating_histogram', postgresql.ARRAY(sa.Integer()), nullable=False, server_default='{0,0,0,0,0}'
+        ))
+
+        histogram = ", ".join(
+            f"(count(*) FILTER (WHERE {BUCKET_SQL} = {bucket}))::int" for bucket in range(1, 6)
+        )
+        op.execute(
+            f"UPDATE {table_name} t SET rating_avg = r.rating_avg, rating_count = r.rating_count, "
+            f"rating_histogram = r.rating_histogram "
+            f"FROM (SELECT {review_column} AS id, avg(rating) AS rating_avg, count(*) AS rating_count, "
+            f"ARRAY[{histogram}] AS rating_histogram "
+            f"FROM reviews WHERE {review_column} IS NOT NULL GROUP BY {review_column}) r "
+            f"WHERE t.id = r.id"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table_name, _ in reversed(TABLES):
+        op.drop_column(table_name, 'rating_histogram')
+        op.drop_column(table_name, 'rating_count')
+        op.drop_column(table_name, 'rating_avg')
@@ -0,0 +1,62 @@
+"""add partial hnsw indexes for filtered vector search
+
+Builds the partial indexes for the default VECTOR_PARTIAL_INDEX_CATEGORIES,
+HNSW_M / HNSW_EF_CONSTRUCTION and EMBEDDING_STORAGE. The values are fixed in
+this revision; changing any of them needs a new revision.
+
+Revision ID: b6d8f0a2c4e6
+Revises: a9c3e5f7b1d2
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d8f0a2c4e6'
+down_revision: Union[str, Sequence[str], None] = 'a9c3e5f7b1d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+STORAGE = 'vector'
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 64
+CATEGORIES = ['drinks', 'desserts', 'main_meals', 'snacks']
+
+
+def _partial_indexes():
+    # Predicates must match the WHERE clauses built in ai_service (IS true, inline category)
+    yield 'ix_foods_embedding_hnsw_valid', 'foods', "is_valid_food IS true"
+    for category in CATEGORIES:
+        yield f'ix_foods_embedding_hnsw_{category}', 'foods', f"category = '{category}' AND is_valid_food IS true"
+    yield 'ix_stores_embedding_hnsw_valid', 'stores', "is_valid_store IS true"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY keeps the tables writable while the graphs are built
+    with op.get_context().autocommit_block():
+        for index_name, table_name, predicate in _partial_indexes():
+            op.create_index(
+                index_name,
+                table_name,
+                ['embedding'],
+                unique=False,
+                postgresql_using='hnsw',
+                postgresql_with={'m': HNSW_M, 'ef_construction': HNSW_EF_CONSTRUCTION},
+                postgresql_ops={'embedding': f'{STORAGE}_cosine_ops'},
+                postgresql_where=sa.text(predicate),
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for index_name, table_name, _ in _partial_indexes():
+            op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True, if_exists=True)
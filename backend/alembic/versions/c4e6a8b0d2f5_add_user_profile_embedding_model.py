@@ -0,0 +1,33 @@
+"""add embedding model to user profiles
+
+Stored profile vectors are means of food embeddings, so like the foods they
+belong to one embedding model. Rows from before this column are NULL and are
+used as the configured model; record it on them with
+init/backfill_embeddings.py --stamp-legacy before switching models.
+
+Revision ID: c4e6a8b0d2f5
+Revises: b3d5f7a9c1e4
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e6a8b0d2f5'
+down_revision: Union[str, Sequence[str], None] = 'b3d5f7a9c1e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('user_profiles', sa.Column('embedding_model', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('user_profiles', 'embedding_model')
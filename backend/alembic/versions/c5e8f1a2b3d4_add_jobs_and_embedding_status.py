@@ -0,0 +1,68 @@
+"""add jobs table and embedding status
+
+Revision ID: c5e8f1a2b3d4
+Revises: a7d5e3f9c1b2
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import pgvector.sqlalchemy
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e8f1a2b3d4'
+down_revision: Union[str, Sequence[str], None] = 'a7d5e3f9c1b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+EMBEDDED_TABLES = ['foods', 'stores', 'reviews']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('result', sa.JSON(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('run_after', sa.DateTime(), nullable=False),
+    sa.Column('locked_at', sa.DateTime(), nullable=True),
+    sa.Column('locked_by', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_jobs_id'), 'jobs', ['id'], unique=False)
+    op.create_index('ix_jobs_status_run_after', 'jobs', ['status', 'run_after'], unique=False)
+
+    # Rows written with background embeddings have no vector until a worker fills it in
+    for table_name in EMBEDDED_TABLES:
+        op.add_column(table_name, sa.Column('embedding_status', sa.String(), server_default='ready', nullable=False))
+        op.alter_column(table_name, 'embedding',
+                        existing_type=pgvector.sqlalchemy.vector.VECTOR(dim=1536),
+                        nullable=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table_name in EMBEDDED_TABLES:
+        # Rows still waiting for a vector get the zero vector the old write path fell back to
+        op.execute(f"UPDATE {table_name} SET embedding = array_fill(0, ARRAY[1536])::vector WHERE embedding IS NULL")
+        op.alter_column(table_name, 'embedding',
+                        existing_type=pgvector.sqlalchemy.vector.VECTOR(dim=1536),
+                        nullable=False)
+        op.drop_column(table_name, 'embedding_status')
+
+    op.drop_index('ix_jobs_status_run_after', table_name='jobs')
+    op.drop_index(op.f('ix_jobs_id'), table_name='jobs')
+    op.drop_table('jobs')
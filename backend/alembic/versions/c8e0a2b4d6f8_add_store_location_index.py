@@ -0,0 +1,44 @@
+"""add earthdistance location index on stores
+
+Revision ID: c8e0a2b4d6f8
+Revises: b6d8f0a2c4e6
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8e0a2b4d6f8'
+down_revision: Union[str, Sequence[str], None] = 'b6d8f0a2c4e6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # earthdistance (and the cube type it builds on) ship with Postgres contrib
+    op.execute("CREATE EXTENSION IF NOT EXISTS cube")
+    op.execute("CREATE EXTENSION IF NOT EXISTS earthdistance")
+
+    # CONCURRENTLY keeps stores writable while the index is built
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_stores_location_earth',
+            'stores',
+            [sa.text('ll_to_earth(latitude, longitude)')],
+            unique=False,
+            postgresql_using='gist',
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_stores_location_earth', table_name='stores', postgresql_concurrently=True, if_exists=True)
+    # The extensions are left installed; other objects may depend on them
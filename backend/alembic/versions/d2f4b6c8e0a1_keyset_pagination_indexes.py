@@ -0,0 +1,53 @@
+"""add composite (created_at, id) indexes for keyset pagination
+
+Revision ID: d2f4b6c8e0a1
+Revises: c8e0a2b4d6f8
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f4b6c8e0a1'
+down_revision: Union[str, Sequence[str], None] = 'c8e0a2b4d6f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index, table, columns): the list filter first, then the (created_at, id) sort key
+KEYSET_INDEXES = [
+    ('ix_foods_created_at_id', 'foods', ['created_at', 'id']),
+    ('ix_foods_store_id_created_at_id', 'foods', ['store_id', 'created_at', 'id']),
+    ('ix_foods_category_created_at_id', 'foods', ['category', 'created_at', 'id']),
+    ('ix_stores_created_at_id', 'stores', ['created_at', 'id']),
+    ('ix_reviews_store_id_created_at_id', 'reviews', ['store_id', 'created_at', 'id']),
+    ('ix_reviews_food_id_created_at_id', 'reviews', ['food_id', 'created_at', 'id']),
+    ('ix_reviews_user_id_created_at_id', 'reviews', ['user_id', 'created_at', 'id']),
+    ('ix_user_food_history_user_id_created_at_id', 'user_food_history', ['user_id', 'created_at', 'id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY keeps the tables writable while the indexes are built
+    with op.get_context().autocommit_block():
+        for index_name, table_name, columns in KEYSET_INDEXES:
+            op.create_index(
+                index_name,
+                table_name,
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for index_name, table_name, _ in reversed(KEYSET_INDEXES):
+            op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,54 @@
+"""add hnsw embedding indexes
+
+Revision ID: d4c3a9e1f2b7
+Revises: b81d2e4f6a90
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4c3a9e1f2b7'
+down_revision: Union[str, Sequence[str], None] = 'b81d2e4f6a90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Defaults of HNSW_M / HNSW_EF_CONSTRUCTION; changing them needs a new revision
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 64
+
+HNSW_INDEXES = [
+    ('ix_foods_embedding_hnsw', 'foods'),
+    ('ix_stores_embedding_hnsw', 'stores'),
+    ('ix_reviews_embedding_hnsw', 'reviews'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY keeps the tables writable while the graphs are built
+    with op.get_context().autocommit_block():
+        for index_name, table_name in HNSW_INDEXES:
+            op.create_index(
+                index_name,
+                table_name,
+                ['embedding'],
+                unique=False,
+                postgresql_using='hnsw',
+                postgresql_with={'m': HNSW_M, 'ef_construction': HNSW_EF_CONSTRUCTION},
+                postgresql_ops={'embedding': 'vector_cosine_ops'},
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for index_name, table_name in HNSW_INDEXES:
+            op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,42 @@
+"""add embedding model columns and clear zero vectors
+
+Existing vectors keep embedding_model NULL, which searches treat as the
+configured model (see ai_service.current_model).
+
+Revision ID: e2f4a6b8c0d1
+Revises: c5e8f1a2b3d4
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2f4a6b8c0d1'
+down_revision: Union[str, Sequence[str], None] = 'c5e8f1a2b3d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+EMBEDDED_TABLES = ['foods', 'stores', 'reviews']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table_name in EMBEDDED_TABLES:
+        op.add_column(table_name, sa.Column('embedding_model', sa.String(), nullable=True))
+        # Zero vectors are the old failure fallback: they carry no meaning and sort
+        # arbitrarily under cosine distance. Mark them for the backfill instead.
+        op.execute(
+            f"UPDATE {table_name} SET embedding = NULL, embedding_status = 'failed' "
+            f"WHERE embedding IS NOT NULL AND vector_norm(embedding) = 0"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table_name in EMBEDDED_TABLES:
+        op.drop_column(table_name, 'embedding_model')
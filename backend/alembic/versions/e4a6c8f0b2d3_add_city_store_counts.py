@@ -0,0 +1,65 @@
+"""add city_store_counts maintained by a trigger on stores
+
+Revision ID: e4a6c8f0b2d3
+Revises: d2f4b6c8e0a1
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a6c8f0b2d3'
+down_revision: Union[str, Sequence[str], None] = 'd2f4b6c8e0a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Moves a valid store out of its old city's total and into the new one.
+# Stores without a city are not counted, matching the old COUNT(*) WHERE city = ?.
+SYNC_FUNCTION = """
+CREATE OR REPLACE FUNCTION city_store_counts_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.is_valid_store IS true AND OLD.city IS NOT NULL THEN
+        UPDATE city_store_counts SET valid_store_count = valid_store_count - 1 WHERE city = OLD.city;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.is_valid_store IS true AND NEW.city IS NOT NULL THEN
+        INSERT INTO city_store_counts (city, valid_store_count) VALUES (NEW.city, 1)
+        ON CONFLICT (city) DO UPDATE SET valid_store_count = city_store_counts.valid_store_count + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('city_store_counts',
+    sa.Column('city', sa.String(), nullable=False),
+    sa.Column('valid_store_count', sa.Integer(), nullable=False, server_default='0'),
+    sa.PrimaryKeyConstraint('city')
+    )
+    op.execute(SYNC_FUNCTION)
+    op.execute(
+        "CREATE TRIGGER city_store_counts_sync "
+        "AFTER INSERT OR DELETE OR UPDATE OF city, is_valid_store ON stores "
+        "FOR EACH ROW EXECUTE FUNCTION city_store_counts_sync()"
+    )
+    # CREATE TRIGGER holds a lock blocking store writes until commit, so the
+    # backfill can't race a concurrent validate/invalidate
+    op.execute(
+        "INSERT INTO city_store_counts (city, valid_store_count) "
+        "SELECT city, count(*) FROM stores "
+        "WHERE is_valid_store IS true AND city IS NOT NULL GROUP BY city"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS city_store_counts_sync ON stores")
+    op.execute("DROP FUNCTION IF EXISTS city_store_counts_sync()")
+    op.drop_table('city_store_counts')
@@ -0,0 +1,45 @@
+"""add user profiles table
+
+Revision ID: f3b8c2d1a6e4
+Revises: d4c3a9e1f2b7
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import pgvector.sqlalchemy
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8c2d1a6e4'
+down_revision: Union[str, Sequence[str], None] = 'd4c3a9e1f2b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('user_profiles',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('liked_embedding', pgvector.sqlalchemy.vector.VECTOR(dim=1536), nullable=True),
+    sa.Column('liked_count', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('all_embedding', pgvector.sqlalchemy.vector.VECTOR(dim=1536), nullable=True),
+    sa.Column('all_count', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('category_counts', sa.JSON(), nullable=False, server_default='{}'),
+    sa.Column('taste_counts', sa.JSON(), nullable=False, server_default='{}'),
+    sa.Column('mood_counts', sa.JSON(), nullable=False, server_default='{}'),
+    sa.Column('selection_counts', sa.JSON(), nullable=False, server_default='{}'),
+    sa.Column('rating_sum', sa.Float(), nullable=False, server_default='0'),
+    sa.Column('rating_count', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('total_interactions', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_profiles')
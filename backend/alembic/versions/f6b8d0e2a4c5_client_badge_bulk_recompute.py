@@ -0,0 +1,103 @@
+"""one client_badges row per client, city change tracking, badge recompute runs
+
+Revision ID: f6b8d0e2a4c5
+Revises: e4a6c8f0b2d3
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6b8d0e2a4c5'
+down_revision: Union[str, Sequence[str], None] = 'e4a6c8f0b2d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Same as e4a6c8f0b2d3, now also stamping updated_at on every touched city
+SYNC_FUNCTION = """
+CREATE OR REPLACE FUNCTION city_store_counts_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.is_valid_store IS true AND OLD.city IS NOT NULL THEN
+        UPDATE city_store_counts SET valid_store_count = valid_store_count - 1, updated_at = now()
+        WHERE city = OLD.city;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.is_valid_store IS true AND NEW.city IS NOT NULL THEN
+        INSERT INTO city_store_counts (city, valid_store_count, updated_at) VALUES (NEW.city, 1, now())
+        ON CONFLICT (city) DO UPDATE
+        SET valid_store_count = city_store_counts.valid_store_count + 1, updated_at = now();
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+PREVIOUS_SYNC_FUNCTION = """
+CREATE OR REPLACE FUNCTION city_store_counts_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.is_valid_store IS true AND OLD.city IS NOT NULL THEN
+        UPDATE city_store_counts SET valid_store_count = valid_store_count - 1 WHERE city = OLD.city;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.is_valid_store IS true AND NEW.city IS NOT NULL THEN
+        INSERT INTO city_store_counts (city, valid_store_count) VALUES (NEW.city, 1)
+        ON CONFLICT (city) DO UPDATE SET valid_store_count = city_store_counts.valid_store_count + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keep the newest badge row per client so client_id can become unique
+    op.execute(
+        "DELETE FROM client_badges a USING client_badges b "
+        "WHERE a.client_id = b.client_id AND a.id < b.id"
+    )
+
+    op.add_column('city_store_counts', sa.Column(
+        'updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False
+    ))
+    op.create_index(op.f('ix_city_store_counts_updated_at'), 'city_store_counts', ['updated_at'], unique=False)
+    op.execute(SYNC_FUNCTION)
+
+    op.create_table('client_badge_runs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('mode', sa.String(), nullable=False),
+    sa.Column('started_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('cities_changed', sa.Integer(), nullable=True),
+    sa.Column('clients_updated', sa.Integer(), nullable=False, server_default='0'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_client_badge_runs_id'), 'client_badge_runs', ['id'], unique=False)
+
+    # Build the unique index without blocking badge writes, then adopt it as the constraint
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'client_badges_client_id_key',
+            'client_badges',
+            ['client_id'],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+    op.execute(
+        "ALTER TABLE client_badges ADD CONSTRAINT client_badges_client_id_key "
+        "UNIQUE USING INDEX client_badges_client_id_key"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('client_badges_client_id_key', 'client_badges', type_='unique')
+    op.drop_index(op.f('ix_client_badge_runs_id'), table_name='client_badge_runs')
+    op.drop_table('client_badge_runs')
+    op.execute(PREVIOUS_SYNC_FUNCTION)
+    op.drop_index(op.f('ix_city_store_counts_updated_at'), table_name='city_store_counts')
+    op.drop_column('city_store_counts', 'updated_at')
@@ -1,65 +1,173 @@
-from typing import Any, Optional, List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+import json
+from typing import Any, AsyncIterator, Iterator, Optional, List, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.api import deps
-from app.services import ai_service
+from app.core.database import SessionLocal
+from app.services import ai_service, batch_recommendations, job_queue, job_handlers
+from app.services.response_cache import FOODS, response_cache
 from app.models.food import Food
 from app.models.user import User
-from app.schemas.store import Store as StoreSchema
-from app.schemas.food import FoodRecommendationResponse, FoodRecommendationItem
+from app.schemas.store import Store as StoreSchema, NearbyStore
+from app.schemas.food import (
+    BatchRecommendationRequest,
+    FoodRecommendationResponse,
+    FoodRecommendationItem,
+    FoodResponse
+)
 from app.schemas.description import (
     DescriptionResponse,
     EnhancedDescriptionResponse,
     FlavorCharacteristics
 )
+from app.schemas.job import JobResponse
 
 router = APIRouter()
 
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # keep nginx from buffering the event stream
+}
+
+
+def _sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _sse_stream(results: dict, tokens: AsyncIterator[str]) -> AsyncIterator[str]:
+    """First event carries the retrieval results, then one event per LLM token"""
+    yield _sse_event("results", results)
+    try:
+        async for token in tokens:
+            yield _sse_event("token", {"text": token})
+    except Exception as e:
+        print(f"Error while streaming recommendation: {e}")
+        yield _sse_event("error", {"detail": "Recommendation stream interrupted"})
+    yield _sse_event("done", {})
+
 # ========== AI POWERED STORE RECOMMENDATION ENDPOINTS ==========
 
 @router.get("/search-stores")
-def search_stores(
+async def search_stores(
     query: str,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
+    ef_search: Optional[int] = Query(None, ge=1, le=1000, description="HNSW candidate list size (recall vs latency)"),
+    only_valid: bool = Query(True, description="Only stores validated by an admin"),
 ) -> List[StoreSchema]:
-    results = ai_service.search_stores_by_vector(query, db)
+    results = await ai_service.asearch_stores_by_vector(query, db, ef_search=ef_search, only_valid=only_valid)
     # Convert SQLAlchemy models to Pydantic schemas
     return [StoreSchema.model_validate(store) for store in results]
 
+@router.get("/nearby-stores", response_model=List[NearbyStore])
+async def nearby_stores(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius_m: Optional[float] = Query(None, gt=0, description="Search radius in metres (capped by STORE_NEARBY_MAX_RADIUS_M)"),
+    query: Optional[str] = Query(None, description="Rank by relevance to this text as well as distance"),
+    limit: int = Query(10, ge=1, le=100),
+    only_valid: bool = Query(True, description="Only stores validated by an admin"),
+    db: AsyncSession = Depends(deps.get_async_db),
+) -> Any:
+    """
+    Stores within `radius_m` of (lat, lng), closest first, or ranked by a blend of
+    embedding similarity and distance when `query` is given.
+    """
+    rows = await ai_service.asearch_nearby_stores(
+        db, lat, lng, radius_m=radius_m, query=query, limit=limit, only_valid=only_valid
+    )
+    return [
+        NearbyStore(store=StoreSchema.model_validate(store), distance_m=distance_m, score=score)
+        for store, distance_m, score in rows
+    ]
+
 @router.get("/recommend-stores")
-def recommend_stores(
+async def recommend_stores(
     preferences: str,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
+    ef_search: Optional[int] = Query(None, ge=1, le=1000, description="HNSW candidate list size (recall vs latency)"),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="User latitude; with lng, only nearby stores are considered"),
+    lng: Optional[float] = Query(None, ge=-180, le=180),
+    radius_m: Optional[float] = Query(None, gt=0),
 ) -> Any:
-    recommendation = ai_service.recommend_food(preferences, db)
+    recommendation = await ai_service.arecommend_food(
+        preferences, db, ef_search=ef_search, latitude=lat, longitude=lng, radius_m=radius_m
+    )
     return {"recommendation": recommendation}
 
+@router.get("/recommend-stores/stream")
+async def recommend_stores_stream(
+    preferences: str,
+    db: AsyncSession = Depends(deps.get_async_db),
+    ef_search: Optional[int] = Query(None, ge=1, le=1000, description="HNSW candidate list size (recall vs latency)"),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="User latitude; with lng, only nearby stores are considered"),
+    lng: Optional[float] = Query(None, ge=-180, le=180),
+    radius_m: Optional[float] = Query(None, gt=0),
+) -> StreamingResponse:
+    """
+    Server-Sent Events variant of /recommend-stores.
+    Emits a `results` event with the matched stores, then `token` events as the LLM writes.
+    """
+    context = None
+    if lat is not None and lng is not None:
+        rows = await ai_service.asearch_nearby_stores(db, lat, lng, radius_m=radius_m, query=preferences, limit=3)
+        stores = [store for store, _, _ in rows]
+        context = ai_service.nearby_store_context(rows)
+    else:
+        stores = await ai_service.asearch_stores_by_vector(preferences, db, limit=3, ef_search=ef_search)
+    results = {
+        "stores": [StoreSchema.model_validate(store).model_dump(mode="json") for store in stores],
+        "preferences": preferences,
+    }
+    # End the read transaction so the stream doesn't hold a pooled connection until the last token
+    await db.commit()
+    return StreamingResponse(
+        _sse_stream(results, ai_service.astream_store_recommendation(preferences, stores, context)),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
 
 # ========== AI POWERED FOOD RECOMMENDATION ENDPOINTS ==========
 
 @router.get("/search-foods")
-def search_foods(
+async def search_foods(
     query: str,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     limit: int = 5,
     category: Optional[str] = None,
-    max_calories: Optional[float] = None,
+    ef_search: Optional[int] = Query(None, ge=1, le=1000, description="HNSW candidate list size (recall vs latency)"),
+    mode: str = Query("semantic", pattern="^(semantic|hybrid)$", description="semantic: vector only; hybrid: full-text + vector fused with RRF"),
+    only_valid: bool = Query(True, description="Only foods validated by an admin or UMKM owner"),
+    rating_weight: Optional[float] = Query(None, ge=0, le=1, description="Semantic mode: share of the ranking given to the food's rating; defaults to FOOD_SEARCH_RATING_WEIGHT"),
 ) -> Any:
     try:
-        foods = ai_service.search_foods_by_vector(
-            query=query,
-            db=db,
-            limit=limit,
-            category=category,
-            max_calories=max_calories
-        )
+        if mode == "hybrid":
+            foods = await ai_service.ahybrid_search_foods(
+                query=query,
+                db=db,
+                limit=limit,
+                category=category,
+                ef_search=ef_search,
+                only_valid=only_valid
+            )
+        else:
+            foods = await ai_service.asearch_foods_by_vector(
+                query=query,
+                db=db,
+                limit=limit,
+                category=category,
+                ef_search=ef_search,
+                only_valid=only_valid,
+                rating_weight=rating_weight
+            )
         
-        from app.schemas.food import FoodResponse
         foods_data = [FoodResponse.model_validate(food) for food in foods]
         
         return {
             "foods": foods_data,
             "query": query,
+            "mode": mode,
             "total_results": len(foods_data)
         }
     except Exception as e:
@@ -74,19 +182,21 @@ def search_foods(
         }
 
 @router.get("/recommend-foods", response_model=FoodRecommendationResponse)
-def recommend_foods(
+async def recommend_foods(
     query: str,
-    db: Session = Depends(deps.get_db),
-    current_user: Optional[Any] = Depends(deps.get_current_user_optional),
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: Optional[Any] = Depends(deps.get_current_user_optional_async),
     limit: int = 10,
+    ef_search: Optional[int] = Query(None, ge=1, le=1000, description="HNSW candidate list size (recall vs latency)"),
 ) -> Any:
     user_id = current_user.id if current_user else None
     
-    result = ai_service.recommend_foods_by_mood(
+    result = await ai_service.arecommend_foods_by_mood(
         mood_description=query,
         db=db,
         user_id=user_id,
-        limit=limit
+        limit=limit,
+        ef_search=ef_search
     )
     
     # Build response
@@ -105,21 +215,57 @@ def recommend_foods(
         total_results=len(recommendations)
     )
 
+@router.get("/recommend-foods/stream")
+async def recommend_foods_stream(
+    query: str,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: Optional[Any] = Depends(deps.get_current_user_optional_async),
+    limit: int = 10,
+    ef_search: Optional[int] = Query(None, ge=1, le=1000, description="HNSW candidate list size (recall vs latency)"),
+) -> StreamingResponse:
+    """
+    Server-Sent Events variant of /recommend-foods.
+    Emits a `results` event with the vector-search matches, then `token` events as the LLM writes.
+    """
+    user_id = current_user.id if current_user else None
+
+    foods, user_context = await ai_service.aretrieve_mood_context(
+        query, db, user_id=user_id, limit=limit, ef_search=ef_search
+    )
+    recommendations = [FoodResponse.model_validate(food).model_dump(mode="json") for food in foods[:limit]]
+    results = {
+        "recommendations": recommendations,
+        "query": query,
+        "total_results": len(recommendations),
+    }
+    # End the read transaction so the stream doesn't hold a pooled connection until the last token
+    await db.commit()
+    return StreamingResponse(
+        _sse_stream(results, ai_service.astream_mood_explanation(query, foods, user_context)),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
 @router.get("/personalized-recommendations")
-def personalized_recommendations(
-    db: Session = Depends(deps.get_db),
-    current_user: Any = Depends(deps.get_current_user),
+async def personalized_recommendations(
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: Any = Depends(deps.get_current_user_async),
     limit: int = 10,
+    ef_search: Optional[int] = Query(None, ge=1, le=1000, description="HNSW candidate list size (recall vs latency)"),
+    recency_half_life_days: Optional[float] = Query(None, gt=0, description="Decay older interactions with this half-life (days)"),
+    rating_weighted: Optional[bool] = Query(None, description="Weight interactions by their rating"),
 ) -> Any:
     try:
-        foods = ai_service.get_personalized_recommendations(
+        foods = await ai_service.aget_personalized_recommendations(
             user_id=current_user.id,
             db=db,
-            limit=limit
+            limit=limit,
+            ef_search=ef_search,
+            recency_half_life_days=recency_half_life_days,
+            rating_weighted=rating_weighted
         )
         
         # Convert SQLAlchemy models to dicts for serialization
-        from app.schemas.food import FoodResponse
         foods_data = [FoodResponse.model_validate(food) for food in foods]
         
         return {
@@ -136,23 +282,56 @@ def personalized_recommendations(
             "error": str(e)
         }
 
+def _jsonl_stream(user_ids: Optional[List[int]], limit: int) -> Iterator[str]:
+    # Runs in Starlette's threadpool; owns its session because it outlives the request handler
+    db = SessionLocal()
+    try:
+        for row in batch_recommendations.iter_batch_recommendations(db, user_ids=user_ids, limit=limit):
+            yield json.dumps(row) + "\n"
+    finally:
+        db.close()
+
+@router.post("/batch-recommendations")
+async def batch_personalized_recommendations(
+    request: BatchRecommendationRequest,
+    current_user: User = Depends(deps.get_current_user_async),
+) -> StreamingResponse:
+    """
+    Personalized recommendations for many users at once (admin only).
+    Streams one JSON object per line: {"user_id": ..., "recommendations": [{"food_id": ..., "score": ...}]}.
+    Omit `user_ids` to score every user.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admin can request batch recommendations"
+        )
+
+    return StreamingResponse(
+        _jsonl_stream(request.user_ids, request.limit),
+        media_type="application/x-ndjson",
+    )
+
 
 # ========== FOOD DESCRIPTION GENERATION ENDPOINTS ==========
 
-@router.post("/generate-food-description/{food_id}", response_model=DescriptionResponse)
-def generate_food_description(
+@router.post("/generate-food-description/{food_id}", response_model=Union[DescriptionResponse, JobResponse])
+async def generate_food_description(
     food_id: int,
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    response: Response,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_user_async),
+    background: bool = Query(False, description="Queue the generation and return a job to poll at /jobs/{id}"),
 ) -> Any:
     """
     Generate compelling food descriptions using AI based on existing food data.
     Only the owner of the food can use this endpoint.
     Automatically saves the generated description to the database.
-    Returns short description, long description, selling points, and flavor characteristics.
+    Returns short description, long description, selling points, and flavor characteristics,
+    or 202 with a job when `background=true`.
     """
     # Check if food exists
-    food = db.query(Food).filter(Food.id == food_id).first()
+    food = await db.get(Food, food_id)
     if not food:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -165,9 +344,20 @@ def generate_food_description(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You do not have permission to generate descriptions for this food"
         )
+
+    if background:
+        job = await job_queue.aenqueue(
+            db, job_handlers.GENERATE_FOOD_DESCRIPTION, {"food_id": food_id}, user_id=current_user.id
+        )
+        await db.commit()
+        response.status_code = status.HTTP_202_ACCEPTED
+        return JobResponse.model_validate(job)
+
+    # End the read transaction so no connection is held during the LLM call
+    await db.commit()
     
     # Use existing food data to generate description
-    result = ai_service.generate_food_description(
+    result = await ai_service.agenerate_food_description(
         name=food.name,
         category=food.category,
         main_ingredients=food.main_ingredients or [],
@@ -176,8 +366,7 @@ def generate_food_description(
         region=None,  # Could be added to food model if needed
         selling_points=None,
         style="promotional",
-        language="en",
-        db=db
+        language="en"
     )
     
     # Convert flavor_characteristics dict to FlavorCharacteristics model if present
@@ -193,24 +382,28 @@ def generate_food_description(
     # Save generated description to database
     if result.get("short_description"):
         food.description = result["short_description"]
-        db.commit()
-        db.refresh(food)
+        await db.commit()
+        response_cache.invalidate_entity(FOODS, food_id)
+        await db.refresh(food)
     
     return DescriptionResponse(**result)
 
-@router.post("/generate-enhanced-food-description/{food_id}", response_model=EnhancedDescriptionResponse)
-def enhance_food_description(
+@router.post("/generate-enhanced-food-description/{food_id}", response_model=Union[EnhancedDescriptionResponse, JobResponse])
+async def enhance_food_description(
     food_id: int,
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    response: Response,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_user_async),
+    background: bool = Query(False, description="Queue the enhancement and return a job to poll at /jobs/{id}"),
 ) -> Any:
     """
     Enhance an existing food description using AI based on current description.
     Only the owner of the food can use this endpoint.
-    Automatically saves the enhanced description to the database.
+    Automatically saves the enhanced description to the database,
+    or returns 202 with a job when `background=true`.
     """
     # Check if food exists
-    food = db.query(Food).filter(Food.id == food_id).first()
+    food = await db.get(Food, food_id)
     if not food:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -223,11 +416,22 @@ def enhance_food_description(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You do not have permission to enhance descriptions for this food"
         )
+
+    if background:
+        job = await job_queue.aenqueue(
+            db, job_handlers.ENHANCE_FOOD_DESCRIPTION, {"food_id": food_id}, user_id=current_user.id
+        )
+        await db.commit()
+        response.status_code = status.HTTP_202_ACCEPTED
+        return JobResponse.model_validate(job)
     
     # Use existing food description to enhance
     current_description = food.description or f"{food.name} - {food.category}"
+
+    # End the read transaction so no connection is held during the LLM call
+    await db.commit()
     
-    enhanced = ai_service.enhance_food_description(
+    enhanced = await ai_service.aenhance_food_description(
         current_description=current_description,
         food_name=food.name,
         category=food.category,
@@ -237,8 +441,9 @@ def enhance_food_description(
     
     # Save enhanced description to database
     food.enhanced_description = enhanced
-    db.commit()
-    db.refresh(food)
+    await db.commit()
+    response_cache.invalidate_entity(FOODS, food_id)
+    await db.refresh(food)
     
     return EnhancedDescriptionResponse(enhanced_description=enhanced)
 
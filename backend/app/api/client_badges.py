@@ -1,12 +1,12 @@
 from typing import Any
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from app.api import deps
 from app.models.user import User
-from app.models.client_badge import ClientBadge
 from app.models.review import Review
-from app.models.store import Store
+from app.schemas.job import JobResponse
+from app.services import job_queue, job_handlers
+from app.services.client_badges import compute_city_badges, save_client_badges
 
 router = APIRouter()
 
@@ -23,134 +23,49 @@ def store_in_city_badges(
     
     Only authenticated users can use this endpoint.
     Automatically saves results to client_badges table.
+    City totals come from city_store_counts, so this is a single grouped query.
     """
     
-    # Get all reviews by the current user
-    user_reviews = db.query(Review).filter(
-        Review.user_id == current_user.id,
-        Review.store_id.isnot(None)
-    ).all()
-    
-    if not user_reviews:
-        # No reviews, create empty badge record
-        client_badge = db.query(ClientBadge).filter(
-            ClientBadge.client_id == current_user.id
-        ).first()
-        
-        if not client_badge:
-            client_badge = ClientBadge(
-                client_id=current_user.id,
-                badges=[],
-                reviewed_stores_id=[]
-            )
-            db.add(client_badge)
-        else:
-            client_badge.badges = []
-            client_badge.reviewed_stores_id = []
-        
-        db.commit()
-        db.refresh(client_badge)
-        
-        return {
-            "badges": [],
-            "total_cities": 0,
-            "message": "No reviews found"
-        }
-    
-    # Get unique store IDs from reviews
-    reviewed_store_ids = list(set([r.store_id for r in user_reviews if r.store_id]))
-    
-    # Get all reviewed stores with their cities - ONLY VALID STORES
-    reviewed_stores = db.query(Store).filter(
-        Store.id.in_(reviewed_store_ids),
-        Store.is_valid_store == True  # Only count valid stores
-    ).all()
-    
-    # If no valid stores were reviewed, return empty
-    if not reviewed_stores:
-        client_badge = db.query(ClientBadge).filter(
-            ClientBadge.client_id == current_user.id
-        ).first()
-        
-        if not client_badge:
-            client_badge = ClientBadge(
-                client_id=current_user.id,
-                badges=[],
-                reviewed_stores_id=[]
-            )
-            db.add(client_badge)
-        else:
-            client_badge.badges = []
-            client_badge.reviewed_stores_id = []
-        
-        db.commit()
-        db.refresh(client_badge)
-        
+    badges, valid_store_ids = compute_city_badges(db, current_user.id)
+    save_client_badges(db, current_user.id, badges, valid_store_ids)
+
+    if not badges:
+        has_reviews = db.query(
+            db.query(Review).filter(
+                Review.user_id == current_user.id,
+                Review.store_id.isnot(None)
+            ).exists()
+        ).scalar()
         return {
             "badges": [],
             "total_cities": 0,
-            "message": "No valid stores reviewed"
+            "message": "No valid stores reviewed" if has_reviews else "No reviews found"
         }
-    
-    # Group stores by city
-    stores_by_city = {}
-    for store in reviewed_stores:
-        city = store.city or "Unknown"
-        if city not in stores_by_city:
-            stores_by_city[city] = []
-        stores_by_city[city].append({
-            "id": store.id,
-            "name": store.name,
-            "address": store.address
-        })
-    
-    # Calculate badges for each city
-    badges = []
-    for city, reviewed_stores_in_city in stores_by_city.items():
-        # Get total VALID stores in this city
-        total_valid_stores_in_city = db.query(func.count(Store.id)).filter(
-            Store.city == city,
-            Store.is_valid_store == True  # Only count valid stores
-        ).scalar()
-        
-        reviewed_count = len(reviewed_stores_in_city)
-        badge_percentage = (reviewed_count / total_valid_stores_in_city * 100) if total_valid_stores_in_city > 0 else 0
-        
-        badges.append({
-            "city": city,
-            "badge_percentage": round(badge_percentage, 2),
-            "reviewed_count": reviewed_count,
-            "total_stores": total_valid_stores_in_city,
-            "reviewed_stores": reviewed_stores_in_city
-        })
-    
-    # Sort badges by percentage (highest first)
-    badges.sort(key=lambda x: x["badge_percentage"], reverse=True)
-    
-    # Save to client_badges table (only valid store IDs)
-    valid_store_ids = [s.id for s in reviewed_stores]
-    
-    client_badge = db.query(ClientBadge).filter(
-        ClientBadge.client_id == current_user.id
-    ).first()
-    
-    if not client_badge:
-        client_badge = ClientBadge(
-            client_id=current_user.id,
-            badges=badges,
-            reviewed_stores_id=valid_store_ids
-        )
-        db.add(client_badge)
-    else:
-        client_badge.badges = badges
-        client_badge.reviewed_stores_id = valid_store_ids
-    
-    db.commit()
-    db.refresh(client_badge)
-    
+
     return {
         "badges": badges,
         "total_cities": len(badges),
         "total_reviewed_stores": len(valid_store_ids),
         "message": "Badges calculated and saved successfully"
     }
+
+
+@router.post("/recompute", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+def recompute_badges(
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+    incremental: bool = Query(False, description="Only clients in cities whose valid-store totals changed since the last run"),
+) -> Any:
+    """
+    Queue a recompute of every client's badges (admin only); poll the job at /jobs/{id}.
+    The nightly run is init/recompute_client_badges.py.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can recompute badges")
+
+    job = job_queue.enqueue(
+        db, job_handlers.RECOMPUTE_CLIENT_BADGES, {"incremental": incremental}, user_id=current_user.id
+    )
+    db.commit()
+    db.refresh(job)
+    return job
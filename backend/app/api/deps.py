@@ -3,10 +3,12 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from pydantic import ValidationError
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core import security
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import get_db, get_async_db
 from app.models.user import User
 from app.schemas.user import TokenData
 
@@ -55,3 +57,43 @@ def get_current_user_optional(
     except (JWTError, ValidationError):
         return None
 
+async def get_current_user_async(
+    db: AsyncSession = Depends(get_async_db),
+    token: str = Depends(oauth2_scheme)
+) -> User:
+    """
+    Async variant of get_current_user for coroutine endpoints.
+    """
+    try:
+        payload = jwt.decode(
+            token, settings.SECRET_KEY.get_secret_value(), algorithms=[settings.ALGORITHM]
+        )
+        token_data = TokenData(**payload)
+    except (JWTError, ValidationError):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials",
+        )
+    user = await db.scalar(select(User).where(User.email == token_data.sub))
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+async def get_current_user_optional_async(
+    db: AsyncSession = Depends(get_async_db),
+    token: Optional[str] = Depends(oauth2_scheme_optional)
+) -> Optional[User]:
+    """
+    Async variant of get_current_user_optional for coroutine endpoints.
+    """
+    if not token:
+        return None
+
+    try:
+        payload = jwt.decode(
+            token, settings.SECRET_KEY.get_secret_value(), algorithms=[settings.ALGORITHM]
+        )
+        token_data = TokenData(**payload)
+        return await db.scalar(select(User).where(User.email == token_data.sub))
+    except (JWTError, ValidationError):
+        return None
@@ -1,16 +1,26 @@
+import csv
 from typing import Any, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File
+from pydantic import ValidationError
+from sqlalchemy import func, insert, select
 from sqlalchemy.orm import Session
+from app.core.config import settings
 from app.services.s3_service import s3_service
 from app.api import deps
+from app.api.pagination import keyset_paginate
 from app.models.food import Food
 from app.models.store import Store
 from app.schemas.food import (
     FoodCreate, 
     FoodUpdate, 
-    FoodResponse
+    FoodResponse,
+    FoodBulkImportResponse,
+    FoodBulkImportRowResult
 )
-from app.services.ai_service import generate_food_embedding
+from app.services.ai_service import generate_food_embedding, generate_food_embeddings, embedding_columns
+from app.services import food_import, job_queue, job_handlers
+from app.services.response_cache import FOODS, response_cache
+from app.services.text_search import prefix_tsquery
 from app.models.user import User
 
 router = APIRouter()
@@ -38,65 +48,207 @@ def create_food(
     # is_valid_food
     is_valid = current_user.role in ["admin", "umkm"]
 
-    # Generate embedding
     food_dict = food_in.model_dump()
-    embedding = generate_food_embedding(food_dict)
 
-    food = Food(
-        **food_dict,
-        embedding=embedding,
-        is_valid_food=is_valid,
-        user_id=current_user.id
-    )
+    if settings.BACKGROUND_EMBEDDINGS:
+        # Return immediately; a worker fills in the embedding
+        food = Food(
+            **food_dict,
+            embedding=None,
+            embedding_status="pending",
+            is_valid_food=is_valid,
+            user_id=current_user.id
+        )
+        db.add(food)
+        db.flush()
+        job_queue.enqueue(db, job_handlers.EMBED_FOOD, {"food_id": food.id}, user_id=current_user.id)
+    else:
+        # Generate embedding
+        embedding = generate_food_embedding(food_dict)
+
+        food = Food(
+            **food_dict,
+            **embedding_columns(embedding),
+            is_valid_food=is_valid,
+            user_id=current_user.id
+        )
+        db.add(food)
 
-    db.add(food)
     db.commit()
+    response_cache.invalidate_lists(FOODS)
     db.refresh(food)
     return food
 
+@router.post("/bulk", response_model=FoodBulkImportResponse, status_code=201)
+def bulk_import_foods(
+    *,
+    db: Session = Depends(deps.get_db),
+    file: UploadFile = File(..., description="CSV (with header) or JSON Lines file of foods"),
+    format: Optional[str] = Query(None, pattern="^(csv|jsonl)$", description="Override format detection"),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Import many foods at once from CSV or JSON Lines.
+    Rows are validated with FoodCreate, checked for duplicates in one query,
+    embedded in batches (or queued for the worker with BACKGROUND_EMBEDDINGS)
+    and inserted with a single multi-row INSERT.
+    Returns a per-row report; invalid rows do not block valid ones.
+    """
+    if current_user.role not in ["admin", "umkm", "client"]:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    fmt = format or food_import.detect_format(file.filename, file.content_type)
+    if fmt not in food_import.SUPPORTED_FORMATS:
+        raise HTTPException(status_code=400, detail="Unsupported file format, use .csv or .jsonl")
+
+    try:
+        parsed_rows = food_import.parse_rows(file.file.read(), fmt)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
+    except csv.Error as e:
+        raise HTTPException(status_code=400, detail=f"Malformed CSV: {e}")
+
+    if len(parsed_rows) > settings.FOOD_BULK_IMPORT_MAX_ROWS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many rows ({len(parsed_rows)}), maximum is {settings.FOOD_BULK_IMPORT_MAX_ROWS}"
+        )
+
+    results: dict = {}
+    valid_rows: List[tuple] = []
+
+    # 1. Validate every row against FoodCreate
+    for row_number, raw, parse_error in parsed_rows:
+        if parse_error:
+            results[row_number] = FoodBulkImportRowResult(row=row_number, status="error", error=parse_error)
+            continue
+        try:
+            valid_rows.append((row_number, FoodCreate.model_validate(raw)))
+        except ValidationError as e:
+            results[row_number] = FoodBulkImportRowResult(
+                row=row_number, status="error", name=raw.get("name"),
+                error=food_import.format_validation_error(e.errors())
+            )
+
+    # 2. Duplicate check in one set-based query, same rule as create_food:
+    # a name clashes with a food in the same store or in the global list
+    names = {food_in.name for _, food_in in valid_rows}
+    existing: dict = {}
+    if names:
+        for name, store_id in db.execute(
+            select(Food.name, Food.store_id).where(Food.name.in_(names))
+        ).all():
+            existing.setdefault(name, set()).add(store_id)
+
+    to_insert: List[tuple] = []
+    for row_number, food_in in valid_rows:
+        store_ids = existing.setdefault(food_in.name, set())
+        if food_in.store_id in store_ids or None in store_ids:
+            results[row_number] = FoodBulkImportRowResult(
+                row=row_number, status="error", name=food_in.name,
+                error="Food name already exists in this store or global list"
+            )
+            continue
+        # Rows later in the same file are checked against earlier ones too
+        store_ids.add(food_in.store_id)
+        to_insert.append((row_number, food_in))
+
+    # 3. Embed in batches (or leave it to the worker), then insert all rows with one statement
+    if to_insert:
+        is_valid = current_user.role in ["admin", "umkm"]
+        food_dicts = [food_in.model_dump() for _, food_in in to_insert]
+        if settings.BACKGROUND_EMBEDDINGS:
+            columns = [{"embedding": None, "embedding_status": "pending"}] * len(food_dicts)
+        else:
+            columns = [embedding_columns(vector) for vector in generate_food_embeddings(food_dicts)]
+
+        food_ids = db.scalars(
+            insert(Food).returning(Food.id, sort_by_parameter_order=True),
+            [
+                {**food_dict, **embedding, "is_valid_food": is_valid, "user_id": current_user.id}
+                for food_dict, embedding in zip(food_dicts, columns)
+            ]
+        ).all()
+        if settings.BACKGROUND_EMBEDDINGS:
+            # Same transaction as the rows, like create_food
+            job_queue.enqueue_many(
+                db, job_handlers.EMBED_FOOD, [{"food_id": food_id} for food_id in food_ids], user_id=current_user.id
+            )
+        db.commit()
+        response_cache.invalidate_lists(FOODS)
+
+        for (row_number, food_in), food_id in zip(to_insert, food_ids):
+            results[row_number] = FoodBulkImportRowResult(
+                row=row_number, status="created", name=food_in.name, food_id=food_id
+            )
+
+    ordered = [results[row_number] for row_number in sorted(results)]
+    created = sum(1 for r in ordered if r.status == "created")
+    return FoodBulkImportResponse(
+        total_rows=len(ordered),
+        created=created,
+        failed=len(ordered) - created,
+        results=ordered
+    )
+
 @router.get("/", response_model=List[FoodResponse])
 def list_foods(
+    request: Request,
+    response: Response,
     db: Session = Depends(deps.get_db),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     category: Optional[str] = Query(None, description="Filter by category"),
-    search: Optional[str] = Query(None, description="Search in name and description"),
+    search: Optional[str] = Query(None, description="Search in name, description, ingredients and mood tags"),
     store_id: Optional[int] = Query(None, description="Filter by store_id"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
 ) -> Any:
     """
-    Get list of foods with optional filters.
+    Get list of foods with optional filters, newest first.
+    Pass the X-Next-Cursor response header back as `cursor` for the next page;
+    `skip` still works. Search results are ranked by relevance and use `skip` only.
+    Served from the response cache with an ETag; send If-None-Match to get a 304.
     """
-    query = db.query(Food)
+    def load():
+        query = db.query(Food)
     
-    if category:
-        query = query.filter(Food.category == category)
+        if category:
+            query = query.filter(Food.category == category)
 
-    if store_id:
-        query = query.filter(Food.store_id == store_id)
+        if store_id:
+            query = query.filter(Food.store_id == store_id)
     
-    if search:
-        search_pattern = f"%{search}%"
-        query = query.filter(
-            (Food.name.ilike(search_pattern)) | 
-            (Food.description.ilike(search_pattern))
-        )
-    
-    foods = query.offset(skip).limit(limit).all()
-    return foods
+        if search:
+            # Prefix full-text match served by the GIN index on search_vector
+            tsquery = prefix_tsquery(search)
+            if tsquery is not None:
+                query = query.filter(Food.search_vector.op("@@")(tsquery)).order_by(
+                    func.ts_rank(Food.search_vector, tsquery).desc(), Food.id
+                )
+                return query.offset(skip).limit(limit).all()
+
+        return keyset_paginate(query, Food.created_at, Food.id, response, limit, cursor=cursor, skip=skip)
+
+    return response_cache.respond(request, response, FOODS, List[FoodResponse], load)
 
 
 @router.get("/{food_id}", response_model=FoodResponse)
 def get_food(
     food_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(deps.get_db),
 ) -> Any:
     """
-    Get specific food by ID.
+    Get specific food by ID (cached, with ETag).
     """
-    food = db.query(Food).filter(Food.id == food_id).first()
-    if not food:
-        raise HTTPException(status_code=404, detail="Food not found")
-    return food
+    def load():
+        food = db.query(Food).filter(Food.id == food_id).first()
+        if not food:
+            raise HTTPException(status_code=404, detail="Food not found")
+        return food
+
+    return response_cache.respond(request, response, FOODS, FoodResponse, load, entity_id=food_id)
 
 
 @router.put("/{food_id}", response_model=FoodResponse)
@@ -145,7 +297,11 @@ def update_food(
                       'taste_profile', 'texture', 'mood_tags']
     needs_embedding_update = any(field in update_data for field in content_fields)
 
-    if needs_embedding_update:
+    if needs_embedding_update and settings.BACKGROUND_EMBEDDINGS:
+        # Keep serving the previous vector until the worker replaces it
+        food.embedding_status = "pending"
+        job_queue.enqueue(db, job_handlers.EMBED_FOOD, {"food_id": food.id}, user_id=current_user.id)
+    elif needs_embedding_update:
         food_dict = {
             'name': food.name,
             'description': food.description,
@@ -155,9 +311,16 @@ def update_food(
             'texture': food.texture,
             'mood_tags': food.mood_tags
         }
-        food.embedding = generate_food_embedding(food_dict)
+        embedding = generate_food_embedding(food_dict)
+        if embedding is None:
+            # Keep the previous vector searchable; the backfill re-embeds stale rows
+            food.embedding_status = "stale"
+        else:
+            for field, value in embedding_columns(embedding).items():
+                setattr(food, field, value)
 
     db.commit()
+    response_cache.invalidate_entity(FOODS, food_id)
     db.refresh(food)
     return food
 
@@ -185,6 +348,7 @@ def upload_food_image(
     food.image_url = image_url
     db.add(food)
     db.commit()
+    response_cache.invalidate_entity(FOODS, food_id)
     db.refresh(food)
 
     return food
@@ -208,6 +372,7 @@ def delete_food(
     
     db.delete(food)
     db.commit()
+    response_cache.invalidate_entity(FOODS, food_id)
     
     return None
 
@@ -234,6 +399,7 @@ def validate_food(
     food.is_valid_food = True
 
     db.commit()
+    response_cache.invalidate_entity(FOODS, food_id)
     db.refresh(food)
     return food
 
@@ -257,5 +423,6 @@ def invalidate_food(
     food.is_valid_food = False
 
     db.commit()
+    response_cache.invalidate_entity(FOODS, food_id)
     db.refresh(food)
     return food
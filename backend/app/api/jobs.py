@@ -0,0 +1,26 @@
+from typing import Any
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from app.api import deps
+from app.models.job import Job
+from app.models.user import User
+from app.schemas.job import JobResponse
+
+router = APIRouter()
+
+@router.get("/{job_id}", response_model=JobResponse)
+def read_job(
+    job_id: int,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Poll a background job (embedding or AI description).
+    Only the user who enqueued it, or an admin, can read it.
+    """
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.user_id != current_user.id and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    return job
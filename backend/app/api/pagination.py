@@ -0,0 +1,65 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, or_, tuple_
+from sqlalchemy.orm import Query
+
+# Response header carrying the cursor of the next page; absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: Optional[datetime], row_id: int) -> str:
+    payload = json.dumps({"c": created_at.isoformat() if created_at else None, "i": row_id})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = datetime.fromisoformat(payload["c"]) if payload["c"] else None
+        return created_at, int(payload["i"])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_paginate(
+    query: Query,
+    created_col: Any,
+    id_col: Any,
+    response: Response,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+) -> List[Any]:
+    """
+    Newest-first page ordered by (created_at DESC, id DESC), backed by a
+    composite (..., created_at, id) index.
+
+    With `cursor` the page starts right after the row it encodes, so the cost
+    doesn't grow with depth. `skip` keeps the old offset mode working. When
+    another page exists its cursor is returned in the X-Next-Cursor header.
+    """
+    query = query.order_by(created_col.desc(), id_col.desc())
+
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        if created_at is None:
+            # NULL created_at sorts first under DESC: finish the NULL run, then everything dated
+            query = query.filter(or_(and_(created_col.is_(None), id_col < row_id), created_col.isnot(None)))
+        else:
+            query = query.filter(tuple_(created_col, id_col) < (created_at, row_id))
+    elif skip:
+        query = query.offset(skip)
+
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            getattr(last, created_col.key), getattr(last, id_col.key)
+        )
+    return rows
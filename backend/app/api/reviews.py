@@ -1,13 +1,17 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from app.api import deps
+from app.api.pagination import keyset_paginate
 from app.models.review import Review
 from app.models.store import Store
 from app.models.food import Food
 from app.models.user import User
-from app.schemas.review import ReviewCreate, Review as ReviewSchema
-from app.services.ai_service import generate_embedding
+from app.schemas.review import ReviewCreate, Review as ReviewSchema, StoreIssues
+from app.core.config import settings
+from app.services.ai_service import generate_embedding, embedding_columns
+from app.services import job_queue, job_handlers, rating_aggregates, review_analysis
+from app.services.response_cache import FOODS, STORES, response_cache
 
 router = APIRouter()
 
@@ -32,7 +36,10 @@ def create_review(
         if not food:
             raise HTTPException(status_code=404, detail="Food not found")
 
-    embedding = generate_embedding(review_in.comment)
+    if settings.BACKGROUND_EMBEDDINGS:
+        embedding_fields = {"embedding": None, "embedding_status": "pending"}
+    else:
+        embedding_fields = embedding_columns(generate_embedding(review_in.comment))
 
     review = Review(
         user_id=current_user.id,
@@ -40,68 +47,92 @@ def create_review(
         comment=review_in.comment,
         store_id=review_in.store_id,
         food_id=review_in.food_id,
-        embedding=embedding
+        **embedding_fields
     )
 
     db.add(review)
+    db.flush()
+    # Atomic increments of the store/food rating aggregates, committed with the review
+    rating_aggregates.record_review(db, review.store_id, review.food_id, review.rating)
+    if settings.BACKGROUND_EMBEDDINGS:
+        job_queue.enqueue(db, job_handlers.EMBED_REVIEW, {"review_id": review.id}, user_id=current_user.id)
+    else:
+        # Classify against the problem categories and update the store's issue totals
+        review_analysis.analyze_reviews(db, [review.id])
     db.commit()
+    # The reviewed store's and food's cached details carry the rating aggregates that just
+    # changed; list pages are left alone and pick the new ratings up within the cache TTL
+    if review.store_id:
+        response_cache.invalidate_entity(STORES, review.store_id, lists=False)
+    if review.food_id:
+        response_cache.invalidate_entity(FOODS, review.food_id, lists=False)
     db.refresh(review)
     return review
 
 @router.get("/store/{store_id}", response_model=List[ReviewSchema])
 def read_reviews_by_store(
     store_id: int,
+    response: Response,
     db: Session = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
 ) -> Any:
-    reviews = db.query(Review).filter(Review.store_id == store_id).offset(skip).limit(limit).all()
-    return reviews
+    """
+    Get reviews of a store, newest first.
+    Pass the X-Next-Cursor response header back as `cursor` for the next page.
+    """
+    query = db.query(Review).filter(Review.store_id == store_id)
+    return keyset_paginate(query, Review.created_at, Review.id, response, limit, cursor=cursor, skip=skip)
 
 @router.get("/food/{food_id}", response_model=List[ReviewSchema])
 def read_reviews_by_food(
     food_id: int,
+    response: Response,
     db: Session = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
 ) -> Any:
-    reviews = db.query(Review).filter(Review.food_id == food_id).offset(skip).limit(limit).all()
-    return reviews
+    """
+    Get reviews of a food, newest first.
+    Pass the X-Next-Cursor response header back as `cursor` for the next page.
+    """
+    query = db.query(Review).filter(Review.food_id == food_id)
+    return keyset_paginate(query, Review.created_at, Review.id, response, limit, cursor=cursor, skip=skip)
 
 @router.get("/user/{user_id}", response_model=List[ReviewSchema])
 def read_reviews_by_user(
     user_id: int,
+    response: Response,
     db: Session = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
 ) -> Any:
     """
-    Get all reviews written by a specific user.
+    Get all reviews written by a specific user, newest first.
+    Pass the X-Next-Cursor response header back as `cursor` for the next page.
     """
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    reviews = (
-        db.query(Review)
-        .filter(Review.user_id == user_id)
-        .order_by(Review.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-
-    return reviews
+    query = db.query(Review).filter(Review.user_id == user_id)
+    return keyset_paginate(query, Review.created_at, Review.id, response, limit, cursor=cursor, skip=skip)
 
 @router.get("/umkm/me", response_model=List[ReviewSchema])
 def read_reviews_for_umkm(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user),
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
 ) -> Any:
     """
-    Get all reviews for stores owned by the current UMKM user.
+    Get all reviews for stores owned by the current UMKM user, newest first.
+    Pass the X-Next-Cursor response header back as `cursor` for the next page.
     """
     if current_user.role != "umkm":
         raise HTTPException(status_code=403, detail="Not enough permissions")
@@ -113,13 +144,20 @@ def read_reviews_for_umkm(
     if not store_ids:
         return []
 
-    reviews = (
-        db.query(Review)
-        .filter(Review.store_id.in_(store_ids))
-        .order_by(Review.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-    
-    return reviews
+    query = db.query(Review).filter(Review.store_id.in_(store_ids))
+    return keyset_paginate(query, Review.created_at, Review.id, response, limit, cursor=cursor, skip=skip)
+
+@router.get("/umkm/issues", response_model=List[StoreIssues])
+def read_issues_for_umkm(
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Issues dashboard for the current UMKM user's stores: complaints per problem
+    category, most severe first, with a suggested action.
+    Read from the per-store problem aggregates, not from the reviews themselves.
+    """
+    if current_user.role != "umkm":
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    return review_analysis.store_issues(db, current_user.id)
@@ -1,12 +1,16 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File
 from sqlalchemy.orm import Session
 from app.api import deps
+from app.api.pagination import keyset_paginate
 from app.models.store import Store
 from app.models.user import User
 from app.schemas.store import StoreCreate, Store as StoreSchema, StoreUpdate
 from app.services.s3_service import s3_service
-from app.services.ai_service import generate_embedding
+from app.core.config import settings
+from app.services.ai_service import generate_embedding, build_store_embedding_text, embedding_columns
+from app.services import job_queue, job_handlers
+from app.services.response_cache import FOODS, STORES, response_cache
 
 router = APIRouter()
 
@@ -33,9 +37,12 @@ def create_store(
     # is_valid_store
     is_valid = current_user.role in ["admin", "umkm"]
 
-    # Generate embedding
-    embedding_text = f"{store_in.name} {store_in.description or ''} {store_in.address or ''}"
-    embedding = generate_embedding(embedding_text)
+    # Generate embedding (or leave it to a worker)
+    if settings.BACKGROUND_EMBEDDINGS:
+        embedding_fields = {"embedding": None, "embedding_status": "pending"}
+    else:
+        embedding_text = build_store_embedding_text(store_in.name, store_in.description, store_in.address)
+        embedding_fields = embedding_columns(generate_embedding(embedding_text))
 
     # Convert Pydantic → dict, remove umkm_id if provided by request
     store_data = store_in.model_dump(exclude={"umkm_id"})
@@ -45,40 +52,58 @@ def create_store(
         store = Store(
             **store_data,
             umkm_id=current_user.id,
-            embedding=embedding,
+            **embedding_fields,
             is_valid_store=is_valid
         )
     else:
         # Admin & Client: no umkm_id attached
         store = Store(
             **store_data,
-            embedding=embedding,
+            **embedding_fields,
             is_valid_store=is_valid
         )
 
     db.add(store)
+    if settings.BACKGROUND_EMBEDDINGS:
+        db.flush()
+        job_queue.enqueue(db, job_handlers.EMBED_STORE, {"store_id": store.id}, user_id=current_user.id)
     db.commit()
+    response_cache.invalidate_lists(STORES)
     db.refresh(store)
     return store
 
 @router.get("/", response_model=List[StoreSchema])
 def read_stores(
+    request: Request,
+    response: Response,
     db: Session = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
 ) -> Any:
-    stores = db.query(Store).offset(skip).limit(limit).all()
-    return stores
+    """
+    Get stores, newest first. Pass the X-Next-Cursor response header back as
+    `cursor` for the next page; `skip` still works. Cached, with an ETag.
+    """
+    def load():
+        return keyset_paginate(db.query(Store), Store.created_at, Store.id, response, limit, cursor=cursor, skip=skip)
+
+    return response_cache.respond(request, response, STORES, List[StoreSchema], load)
 
 @router.get("/{store_id}", response_model=StoreSchema)
 def read_store(
     store_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(deps.get_db),
 ) -> Any:
-    store = db.query(Store).filter(Store.id == store_id).first()
-    if not store:
-        raise HTTPException(status_code=404, detail="Store not found")
-    return store
+    def load():
+        store = db.query(Store).filter(Store.id == store_id).first()
+        if not store:
+            raise HTTPException(status_code=404, detail="Store not found")
+        return store
+
+    return response_cache.respond(request, response, STORES, StoreSchema, load, entity_id=store_id)
 
 @router.put("/{store_id}", response_model=StoreSchema)
 def update_store(
@@ -100,6 +125,7 @@ def update_store(
     
     db.add(store)
     db.commit()
+    response_cache.invalidate_entity(STORES, store_id)
     db.refresh(store)
     return store
 
@@ -121,6 +147,7 @@ def upload_store_image(
     store.image_url = image_url
     db.add(store)
     db.commit()
+    response_cache.invalidate_entity(STORES, store_id)
     db.refresh(store)
     return store
 
@@ -139,6 +166,9 @@ def delete_store(
    
     db.delete(store)
     db.commit()
+    response_cache.invalidate_entity(STORES, store_id)
+    # The store's foods go with it
+    response_cache.invalidate(FOODS)
     return None
 
 @router.put("/{store_id}/validate", response_model=StoreSchema)
@@ -164,6 +194,7 @@ def validate_store(
     store.is_valid_store = True
 
     db.commit()
+    response_cache.invalidate_entity(STORES, store_id)
     db.refresh(store)
     return store
 
@@ -187,5 +218,6 @@ def invalidate_store(
     store.is_valid_store = False
 
     db.commit()
+    response_cache.invalidate_entity(STORES, store_id)
     db.refresh(store)
     return store
\ No newline at end of file
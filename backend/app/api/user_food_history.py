@@ -1,10 +1,12 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from app.api import deps
+from app.api.pagination import keyset_paginate
 from app.models.user import User
 from app.models.user_food_history import UserFoodHistory
 from app.models.food import Food
+from app.services import user_profile_service
 from app.schemas.user_food_history import (
     UserFoodHistoryCreate,
     UserFoodHistoryResponse,
@@ -15,20 +17,21 @@ router = APIRouter()
 
 @router.get("/me/food-history", response_model=List[UserFoodHistoryResponse])
 def get_user_food_history(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user),
-    skip: int = 0,
-    limit: int = 50,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
 ) -> Any:
-    history = (
-        db.query(UserFoodHistory)
-        .filter(UserFoodHistory.user_id == current_user.id)
-        .order_by(UserFoodHistory.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
+    """
+    The current user's food history, newest first.
+    Pass the X-Next-Cursor response header back as `cursor` for the next page.
+    """
+    query = db.query(UserFoodHistory).filter(UserFoodHistory.user_id == current_user.id)
+    return keyset_paginate(
+        query, UserFoodHistory.created_at, UserFoodHistory.id, response, limit, cursor=cursor, skip=skip
     )
-    return history
 
 
 @router.post("/me/food-history", response_model=UserFoodHistoryResponse, status_code=201)
@@ -47,6 +50,8 @@ def create_food_history(
     )
 
     db.add(history)
+    # Keep the materialized profile in step, in the same transaction
+    user_profile_service.record_interaction(db, history, food)
     db.commit()
     db.refresh(history)
     return history
@@ -57,14 +62,10 @@ def get_user_food_preferences(
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user),
 ) -> Any:
+    # Served from the materialized profile; read-only, so a GET never commits
+    profile = user_profile_service.read_profile(db, current_user.id)
 
-    history = (
-        db.query(UserFoodHistory)
-        .filter(UserFoodHistory.user_id == current_user.id)
-        .all()
-    )
-
-    if not history:
+    if not profile.total_interactions:
         return UserFoodPreferences(
             favorite_categories=[],
             favorite_tastes=[],
@@ -74,60 +75,28 @@ def get_user_food_preferences(
             most_selected_foods=[]
         )
 
-    food_ids = [h.food_id for h in history]
-    foods = db.query(Food).filter(Food.id.in_(food_ids)).all()
-    food_map = {f.id: f for f in foods}
-
-    categories, tastes, moods, ratings = [], [], [], []
-    food_selection_count = {}
-
-    for h in history:
-        food = food_map.get(h.food_id)
-        if not food:
-            continue
-
-        if food.category:
-            categories.append(food.category)
-
-        if food.taste_profile:
-            tastes.extend(food.taste_profile)
-
-        if food.mood_tags:
-            moods.extend(food.mood_tags)
-
-        if h.interaction_type == "rated" and h.rating is not None:
-            ratings.append(h.rating)
-
-        if h.interaction_type == "selected":
-            food_selection_count[h.food_id] = food_selection_count.get(h.food_id, 0) + 1
-
-    from collections import Counter
-
-    favorite_categories = [c for c, _ in Counter(categories).most_common(3)]
-    favorite_tastes = [t for t, _ in Counter(tastes).most_common(5)]
-    favorite_moods = [m for m, _ in Counter(moods).most_common(5)]
+    top_selections = user_profile_service.top_selections(profile, 5)
+    food_names = dict(
+        db.query(Food.id, Food.name)
+        .filter(Food.id.in_([food_id for food_id, _ in top_selections]))
+        .all()
+    ) if top_selections else {}
 
     most_selected_foods = [
         {
             "food_id": food_id,
-            "food_name": food_map[food_id].name,
+            "food_name": food_names[food_id],
             "selection_count": count,
         }
-        for food_id, count in sorted(
-            food_selection_count.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:5]
-        if food_id in food_map
+        for food_id, count in top_selections
+        if food_id in food_names
     ]
 
-    avg_rating = sum(ratings) / len(ratings) if ratings else None
-
     return UserFoodPreferences(
-        favorite_categories=favorite_categories,
-        favorite_tastes=favorite_tastes,
-        favorite_moods=favorite_moods,
-        average_rating=avg_rating,
-        total_interactions=len(history),
+        favorite_categories=user_profile_service.top_keys(profile.category_counts, 3),
+        favorite_tastes=user_profile_service.top_keys(profile.taste_counts, 5),
+        favorite_moods=user_profile_service.top_keys(profile.mood_counts, 5),
+        average_rating=user_profile_service.average_rating(profile),
+        total_interactions=profile.total_interactions,
         most_selected_foods=most_selected_foods
     )
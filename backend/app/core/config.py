@@ -29,6 +29,30 @@ class Settings(BaseSettings):
             f"{values.get('POSTGRES_SERVER')}/{values.get('POSTGRES_DB')}"
         )
 
+    # asyncpg-backed URL for the async engine; derived from DATABASE_URL when unset
+    ASYNC_DATABASE_URL: Union[str, None] = None
+
+    @field_validator("ASYNC_DATABASE_URL", mode="before")
+    @classmethod
+    def assemble_async_db_connection(cls, v: str | None, info) -> str:
+        if isinstance(v, str):
+            return v
+        database_url = info.data.get("DATABASE_URL") or ""
+        _, _, rest = database_url.partition("://")
+        return f"postgresql+asyncpg://{rest}" if rest else database_url
+
+    # Connection pools (applied to both the sync and the async engine)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 30
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Server-side statement timeout in milliseconds; None keeps the server default
+    DB_STATEMENT_TIMEOUT_MS: int | None = None
+    # PgBouncer (transaction pooling) compatible mode: no startup options, no
+    # server-side prepared statement cache, per-transaction SET LOCAL instead
+    DB_PGBOUNCER_MODE: bool = False
+
     # OpenRouter Configuration
     OPENROUTER_API_KEY: SecretStr | None = None
     OPENROUTER_MODEL: str = "google/gemini-2.0-flash-001"
@@ -42,6 +66,143 @@ class Settings(BaseSettings):
     # Legacy/Optional
     OPENAI_API_KEY: SecretStr | None = None
 
+    # Embedding storage. Both values must match the columns created by the
+    # migrations (vector(1536), see a9c3e5f7b1d2); the app refuses to start
+    # otherwise. Shorter provider output (Gemini's 768) is zero-padded and longer
+    # output truncated. Changing either value needs a new Alembic revision that
+    # resizes the columns, and a backfill if dimensions grow.
+    EMBEDDING_DIMENSIONS: int = 1536
+    # "vector" (float32) or "halfvec" (float16, half the storage and index memory)
+    EMBEDDING_STORAGE: str = "vector"
+
+    @field_validator("EMBEDDING_STORAGE")
+    @classmethod
+    def check_embedding_storage(cls, v: str) -> str:
+        if v not in ("vector", "halfvec"):
+            raise ValueError("EMBEDDING_STORAGE must be 'vector' or 'halfvec'")
+        return v
+
+    # Embedding Cache (in-process LRU in front of a Postgres-backed table)
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MAX_SIZE: int = 2048
+    EMBEDDING_CACHE_TTL_SECONDS: int = 60 * 60 * 24 * 30
+    EMBEDDING_CACHE_DB_ENABLED: bool = True
+    EMBEDDING_CACHE_DB_MAX_ROWS: int = 200_000
+    EMBEDDING_CACHE_DB_PRUNE_EVERY: int = 500
+
+    # LLM response cache for mood recommendations (exact + semantic match per retrieved set)
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_MAX_SIZE: int = 1024
+    LLM_CACHE_TTL_SECONDS: int = 60 * 60 * 6
+    # Cosine similarity a new query needs to reuse a cached answer; None disables the semantic layer
+    LLM_CACHE_SEMANTIC_THRESHOLD: float | None = 0.95
+
+    # Response cache for public catalog reads (GET /foods, /stores), with ETag/304 support
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAX_SIZE: int = 1024
+    # Server-side lifetime; also bounds staleness after writes the API doesn't see
+    RESPONSE_CACHE_TTL_SECONDS: int = 60
+    # Cache-Control max-age for clients and CDNs, which revalidate with If-None-Match afterwards
+    RESPONSE_CACHE_MAX_AGE_SECONDS: int = 30
+    # Optional shared tier (e.g. redis://localhost:6379/0) so all workers share entries and invalidations
+    RESPONSE_CACHE_REDIS_URL: str | None = None
+    # How often each worker re-reads invalidation counters from the shared tier
+    RESPONSE_CACHE_GENERATION_REFRESH_SECONDS: float = 1.0
+
+    # Background jobs: write endpoints enqueue embedding work for `python -m app.worker`
+    # instead of calling the provider inside the request
+    BACKGROUND_EMBEDDINGS: bool = False
+    JOB_WORKER_BATCH_SIZE: int = 32
+    JOB_WORKER_POLL_SECONDS: float = 2.0
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BACKOFF_SECONDS: int = 30
+    # Running jobs whose worker has been silent this long are handed to another worker
+    JOB_LOCK_TIMEOUT_SECONDS: int = 600
+
+    # Batched embedding (bulk imports, backfills)
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_BATCH_CONCURRENCY: int = 4
+    FOOD_BULK_IMPORT_MAX_ROWS: int = 2000
+
+    # User profile vector for personalized recommendations.
+    # Half-life (days) for recency decay; None disables decay
+    PROFILE_RECENCY_HALF_LIFE_DAYS: float | None = None
+    PROFILE_RATING_WEIGHTED: bool = False
+    # Weight used for interactions without a rating when rating weighting is on
+    PROFILE_NEUTRAL_RATING: float = 3.0
+
+    # Hybrid (full-text + vector) food search, fused with reciprocal rank fusion
+    HYBRID_SEARCH_RRF_K: int = 60
+    # Candidates taken from each ranking before fusion
+    HYBRID_SEARCH_CANDIDATES: int = 50
+
+    # Batch recommendations (POST /ai/batch-recommendations, init/batch_recommendations.py)
+    # Users scored per matrix multiply against the catalog
+    BATCH_RECOMMENDATION_CHUNK_SIZE: int = 1024
+    # Chunks scored in parallel while the next chunk is read from Postgres
+    BATCH_RECOMMENDATION_WORKERS: int = 2
+    # How long the in-process catalog matrix is reused before reloading
+    CATALOG_MATRIX_TTL_SECONDS: int = 300
+
+    # Optional in-process food vector index (brute force over a memory-mapped snapshot)
+    VECTOR_INDEX_ENABLED: bool = False
+    # Snapshot directory; share it between workers on one host so they share pages
+    VECTOR_INDEX_SNAPSHOT_DIR: str = "/tmp/mood2makan-food-index"
+    VECTOR_INDEX_REFRESH_SECONDS: float = 30.0
+    # Searches fall back to pgvector when the last refresh is older than this
+    VECTOR_INDEX_MAX_STALENESS_SECONDS: float = 120.0
+    # Changed rows kept in memory before they are folded into a new snapshot
+    VECTOR_INDEX_MAX_DELTA_ROWS: int = 5000
+    # Refreshes re-read changes this far before the watermark: updated_at is set at
+    # flush, so a row from a long transaction can commit after newer rows were read
+    VECTOR_INDEX_WATERMARK_OVERLAP_SECONDS: int = 300
+
+    # HNSW vector indexes (build parameters; the migrations pin their own copies)
+    HNSW_M: int = 16
+    HNSW_EF_CONSTRUCTION: int = 64
+    # Default hnsw.ef_search for search endpoints; None keeps the server default (40)
+    HNSW_EF_SEARCH: int | None = None
+
+    # Filtered vector search (see app/services/vector_search_planner.py)
+    # Categories with their own partial HNSW index over valid foods; a change needs
+    # a new migration adding/dropping the indexes (see b6d8f0a2c4e6)
+    VECTOR_PARTIAL_INDEX_CATEGORIES: List[str] = ["drinks", "desserts", "main_meals", "snacks"]
+    # Filters matching at most this many rows are answered by an exact scan
+    VECTOR_EXACT_SCAN_MAX_ROWS: int = 5000
+    # hnsw.iterative_scan for filtered queries without a partial index: strict_order or relaxed_order
+    HNSW_ITERATIVE_SCAN: str = "strict_order"
+    HNSW_MAX_SCAN_TUPLES: int = 20000
+    # How long per-filter row counts are cached for the planner
+    VECTOR_FILTER_STATS_TTL_SECONDS: int = 300
+
+    # Nearby store search (cube/earthdistance); distances in metres
+    STORE_NEARBY_DEFAULT_RADIUS_M: float = 5000.0
+    STORE_NEARBY_MAX_RADIUS_M: float = 50000.0
+    # Share of the ranking score given to proximity (the rest is embedding similarity)
+    STORE_NEARBY_DISTANCE_WEIGHT: float = 0.4
+
+    # Bulk client badge recompute (init/recompute_client_badges.py, POST /client-badges/recompute)
+    # Clients aggregated and upserted per statement
+    CLIENT_BADGE_BATCH_SIZE: int = 1000
+    # Incremental runs re-read city changes this far before the previous run started,
+    # so a store update committed while that run was reading isn't missed
+    CLIENT_BADGE_WATERMARK_OVERLAP_SECONDS: int = 300
+
+    # Review problem analysis (app/services/review_analysis.py, init/analyze_reviews.py)
+    # Only reviews rated at or below this count as complaints
+    REVIEW_PROBLEM_MAX_RATING: float = 3.0
+    # Minimum cosine similarity to the nearest problem category
+    REVIEW_PROBLEM_MIN_SIMILARITY: float = 0.3
+    REVIEW_ANALYSIS_BATCH_SIZE: int = 500
+
+    # Ratings as a food search ranking feature (0 disables re-ranking)
+    FOOD_SEARCH_RATING_WEIGHT: float = 0.0
+    # Nearest neighbours fetched per requested result before re-ranking by rating
+    FOOD_SEARCH_RATING_CANDIDATES_FACTOR: int = 4
+    # Bayesian prior: items with few reviews are pulled towards this mean
+    RATING_PRIOR_MEAN: float = 3.5
+    RATING_PRIOR_WEIGHT: float = 5.0
+
     # S3 Settings
     S3_ACCESS_KEY: str | None = None
     S3_SECRET_KEY: str | None = None
@@ -1,10 +1,132 @@
-from sqlalchemy import create_engine
+import time
+import uuid
+from sqlalchemy import create_engine, event, exc
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from pgvector.asyncpg import register_vector
 from app.core.config import settings
+from app.core.metrics import (
+    DB_POOL_CHECKOUT_SECONDS, DB_POOL_TIMEOUTS, DB_POOL_CHECKED_OUT,
+    DB_POOL_CAPACITY, DB_POOL_SATURATION, DB_QUERY_SECONDS, sql_operation
+)
 
-engine = create_engine(settings.DATABASE_URL)
+
+class _InstrumentedPoolMixin:
+    """Records how long checkouts wait for a connection and how often they time out"""
+    metrics_label = "sync"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            DB_POOL_TIMEOUTS.labels(self.metrics_label).inc()
+            raise
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.labels(self.metrics_label).observe(time.perf_counter() - start)
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    metrics_label = "sync"
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    metrics_label = "async"
+
+
+def _pool_kwargs() -> dict:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def _sync_connect_args() -> dict:
+    # PgBouncer rejects startup options, so the timeout is set per transaction instead
+    if settings.DB_STATEMENT_TIMEOUT_MS and not settings.DB_PGBOUNCER_MODE:
+        return {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+    return {}
+
+
+def _async_connect_args() -> dict:
+    connect_args = {}
+    if settings.DB_PGBOUNCER_MODE:
+        # Transaction pooling can hand each statement a different server connection,
+        # so named prepared statements must be unique and never cached
+        connect_args.update({
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        })
+    elif settings.DB_STATEMENT_TIMEOUT_MS:
+        connect_args["server_settings"] = {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}
+    return connect_args
+
+
+engine = create_engine(
+    settings.DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    connect_args=_sync_connect_args(),
+    **_pool_kwargs()
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine used by the /ai router so LLM round trips don't pin a threadpool worker
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL,
+    poolclass=InstrumentedAsyncQueuePool,
+    connect_args=_async_connect_args(),
+    **_pool_kwargs()
+)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+@event.listens_for(async_engine.sync_engine, "connect")
+def register_vector_type(dbapi_connection, connection_record):
+    # asyncpg needs the pgvector codec registered on every new connection
+    dbapi_connection.run_async(register_vector)
+
+
+if settings.DB_PGBOUNCER_MODE and settings.DB_STATEMENT_TIMEOUT_MS:
+    def set_local_statement_timeout(conn):
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(settings.DB_STATEMENT_TIMEOUT_MS)}")
+
+    event.listen(engine, "begin", set_local_statement_timeout)
+    event.listen(async_engine.sync_engine, "begin", set_local_statement_timeout)
+
+
+def _register_pool_gauges(label: str, sync_engine) -> None:
+    # Read at scrape time; engine.pool is looked up each time because dispose() replaces it
+    capacity = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+    DB_POOL_CAPACITY.labels(label).set(capacity)
+    DB_POOL_CHECKED_OUT.labels(label).set_function(lambda: sync_engine.pool.checkedout())
+    DB_POOL_SATURATION.labels(label).set_function(
+        lambda: sync_engine.pool.checkedout() / capacity if capacity else 0.0
+    )
+
+_register_pool_gauges("sync", engine)
+_register_pool_gauges("async", async_engine.sync_engine)
+
+
+def _register_query_timing(label: str, sync_engine) -> None:
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        context._query_start_time = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def observe_query_time(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_query_start_time", None)
+        if started is not None:
+            DB_QUERY_SECONDS.labels(label, sql_operation(statement)).observe(time.perf_counter() - started)
+
+_register_query_timing("sync", engine)
+_register_query_timing("async", async_engine.sync_engine)
+
 Base = declarative_base()
 
 def get_db():
@@ -13,3 +135,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
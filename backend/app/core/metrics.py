@@ -0,0 +1,138 @@
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# ---------- database connection pools ----------
+
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for a connection from the pool",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total",
+    "Pool checkouts that gave up after DB_POOL_TIMEOUT",
+    ["engine"],
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Connections currently checked out of the pool",
+    ["engine"],
+)
+DB_POOL_CAPACITY = Gauge(
+    "db_pool_capacity",
+    "Maximum connections the pool may hold (pool_size + max_overflow)",
+    ["engine"],
+)
+DB_POOL_SATURATION = Gauge(
+    "db_pool_saturation",
+    "Checked out connections as a fraction of pool capacity",
+    ["engine"],
+)
+
+
+# ---------- HTTP ----------
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template, including streamed bodies",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+# ---------- database queries ----------
+
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds",
+    "SQL statement execution time",
+    ["engine", "operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+# ---------- AI providers ----------
+
+AI_CALL_SECONDS = Histogram(
+    "ai_call_duration_seconds",
+    "Latency of embedding and LLM calls",
+    ["provider", "operation"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120),
+)
+AI_CALL_ERRORS = Counter(
+    "ai_call_errors_total",
+    "Embedding and LLM calls that raised",
+    ["provider", "operation"],
+)
+AI_TOKENS = Counter(
+    "ai_tokens_total",
+    "Tokens reported by the provider",
+    ["provider", "kind"],
+)
+
+# ---------- caches ----------
+
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total",
+    "Cache lookups by outcome; hit rate = hits / all lookups",
+    ["cache", "result"],
+)
+
+_SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "BEGIN", "COMMIT", "ROLLBACK", "SET"}
+
+
+def sql_operation(statement: str) -> str:
+    """First keyword of a statement, folded into a small label set"""
+    parts = statement.lstrip().split(None, 1)
+    keyword = parts[0].upper() if parts else ""
+    return keyword if keyword in _SQL_OPERATIONS else "OTHER"
+
+
+@contextmanager
+def observe_ai_call(provider: Optional[str], operation: str):
+    """Time one provider call and count it as an error if it raises (works around awaits too)"""
+    provider = provider or "none"
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        AI_CALL_ERRORS.labels(provider, operation).inc()
+        raise
+    finally:
+        AI_CALL_SECONDS.labels(provider, operation).observe(time.perf_counter() - start)
+
+
+class PrometheusMiddleware:
+    """
+    Pure ASGI middleware recording latency per route template (e.g. /api/v1/foods/{food_id}).
+    The timer stops when the response body is finished, so SSE streams are measured in full.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the scope; unmatched paths share
+            # one label so arbitrary URLs cannot blow up cardinality
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.labels(
+                scope.get("method", ""), template, str(status_code)
+            ).observe(time.perf_counter() - start)
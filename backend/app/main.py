@@ -1,14 +1,31 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from app.core.config import settings
+from app.core.metrics import PrometheusMiddleware
 from app.api import (
     auth, users, stores, ai, reviews, 
-    foods, user_food_history, client_badges
+    foods, user_food_history, client_badges, jobs
 )
+from app.models.base import check_embedding_schema
+from app.services.vector_index import food_vector_index
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    check_embedding_schema()
+    # Load (or build) the food vector index snapshot and keep it refreshed
+    if settings.VECTOR_INDEX_ENABLED:
+        food_vector_index.start()
+    yield
+    food_vector_index.stop()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # Set all CORS enabled origins
@@ -18,8 +35,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets browser clients read the keyset pagination cursor and cache validator
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# Per-route latency histograms, exposed on /metrics
+app.add_middleware(PrometheusMiddleware)
+
 app.include_router(auth.router, prefix=f"{settings.API_V1_STR}/auth", tags=["auth"])
 app.include_router(users.router, prefix=f"{settings.API_V1_STR}/users", tags=["users"])
 app.include_router(stores.router, prefix=f"{settings.API_V1_STR}/stores", tags=["stores"])
@@ -28,7 +50,13 @@ app.include_router(reviews.router, prefix=f"{settings.API_V1_STR}/reviews", tags
 app.include_router(foods.router, prefix=f"{settings.API_V1_STR}/foods", tags=["foods"])
 app.include_router(user_food_history.router, prefix=f"{settings.API_V1_STR}/users", tags=["user-food-history"])
 app.include_router(client_badges.router, prefix=f"{settings.API_V1_STR}/client-badges", tags=["client-badges"])
+app.include_router(jobs.router, prefix=f"{settings.API_V1_STR}/jobs", tags=["jobs"])
 
 @app.get("/")
 def root():
     return {"message": "Welcome to Mood2Makan API"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
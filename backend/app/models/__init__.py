@@ -4,3 +4,10 @@ from app.models.food import Food
 from app.models.review import Review
 from app.models.client_badge import ClientBadge
 from app.models.user_food_history import UserFoodHistory
+from app.models.embedding_cache import EmbeddingCacheEntry
+from app.models.user_profile import UserProfile
+from app.models.job import Job
+from app.models.city_store_count import CityStoreCount
+from app.models.client_badge_run import ClientBadgeRun
+from app.models.problem_category import ProblemCategory
+from app.models.store_problem_stat import StoreProblemStat
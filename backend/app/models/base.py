@@ -1,6 +1,53 @@
-from app.core.database import Base
+from sqlalchemy import Index, text
+from pgvector.sqlalchemy import Vector, HALFVEC
+from app.core.database import Base, engine
+from app.core.config import settings
 
 # Import all models here for Alembic to discover
 # from app.models.user import User
 # from app.models.store import Store
 # ...
+
+
+def embedding_type():
+    """Column type for embeddings: EMBEDDING_DIMENSIONS, as vector or halfvec"""
+    if settings.EMBEDDING_STORAGE == "halfvec":
+        return HALFVEC(settings.EMBEDDING_DIMENSIONS)
+    return Vector(settings.EMBEDDING_DIMENSIONS)
+
+
+def embedding_ops() -> str:
+    """Cosine operator class matching embedding_type()"""
+    return "halfvec_cosine_ops" if settings.EMBEDDING_STORAGE == "halfvec" else "vector_cosine_ops"
+
+
+def check_embedding_schema() -> None:
+    """
+    Fail fast when EMBEDDING_STORAGE / EMBEDDING_DIMENSIONS differ from the migrated
+    foods.embedding column; otherwise every embedding write and vector query errors.
+    """
+    with engine.connect() as conn:
+        row = conn.execute(text(
+            "SELECT t.typname, a.atttypmod FROM pg_attribute a "
+            "JOIN pg_type t ON t.oid = a.atttypid "
+            "WHERE a.attrelid = 'foods'::regclass AND a.attname = 'embedding'"
+        )).one()
+    # For vector/halfvec the type modifier is the dimension
+    if (row.typname, row.atttypmod) != (settings.EMBEDDING_STORAGE, settings.EMBEDDING_DIMENSIONS):
+        raise RuntimeError(
+            f"foods.embedding is {row.typname}({row.atttypmod}) but the settings say "
+            f"{settings.EMBEDDING_STORAGE}({settings.EMBEDDING_DIMENSIONS}); "
+            "fix EMBEDDING_STORAGE / EMBEDDING_DIMENSIONS or add a migration that resizes the columns"
+        )
+
+
+def hnsw_cosine_index(name: str, column: str = "embedding", **kwargs) -> Index:
+    """HNSW index serving `cosine_distance` ORDER BY ... LIMIT queries on an embedding column"""
+    return Index(
+        name,
+        column,
+        postgresql_using="hnsw",
+        postgresql_with={"m": settings.HNSW_M, "ef_construction": settings.HNSW_EF_CONSTRUCTION},
+        postgresql_ops={column: embedding_ops()},
+        **kwargs,
+    )
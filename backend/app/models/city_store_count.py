@@ -0,0 +1,20 @@
+from sqlalchemy import Integer, String, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+from app.core.database import Base
+from datetime import datetime
+
+class CityStoreCount(Base):
+    """
+    Valid stores per city, kept current by the city_store_counts_sync trigger on
+    stores (insert, delete, and updates of city or is_valid_store), so validating
+    or invalidating a store adjusts its city's total in the same transaction.
+    """
+    __tablename__ = "city_store_counts"
+
+    city: Mapped[str] = mapped_column(String, primary_key=True)
+    valid_store_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # Set by the trigger on every change; incremental badge recomputes read it
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False, index=True
+    )
@@ -6,7 +6,7 @@ class ClientBadge(Base):
     __tablename__ = "client_badges"
 
     id = Column(Integer, primary_key=True, index=True)
-    client_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    client_id = Column(Integer, ForeignKey("users.id"), nullable=False, unique=True)  # one row per client, target of bulk upserts
     badges = Column(JSON, default=[], nullable=False)  # List of badge objects
     reviewed_stores_id = Column(JSON, default=[], nullable=False)  # List of reviewed store IDs
 
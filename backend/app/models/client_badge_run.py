@@ -0,0 +1,16 @@
+from sqlalchemy import Integer, String, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+from app.core.database import Base
+from datetime import datetime
+
+class ClientBadgeRun(Base):
+    """One bulk badge recompute; the last finished run is the incremental watermark"""
+    __tablename__ = "client_badge_runs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    mode: Mapped[str] = mapped_column(String, nullable=False)  # "full" or "incremental"
+    started_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    cities_changed: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    clients_updated: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
@@ -0,0 +1,15 @@
+from sqlalchemy import String, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from pgvector.sqlalchemy import Vector
+from app.core.database import Base
+from app.models.base import embedding_type
+from datetime import datetime
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+
+    # sha256 of model name + normalized text
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    model: Mapped[str] = mapped_column(String, nullable=False)
+    embedding: Mapped[Vector] = mapped_column(embedding_type(), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False, index=True)
@@ -1,7 +1,10 @@
-from sqlalchemy import Integer, String, ForeignKey, JSON, DateTime, Boolean, Float
+from sqlalchemy import Integer, String, ForeignKey, JSON, DateTime, Boolean, Float, Computed, Index, text
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from pgvector.sqlalchemy import Vector
+from app.core.config import settings
 from app.core.database import Base
+from app.models.base import embedding_type, hnsw_cosine_index
 from datetime import datetime
 from typing import List, Optional, Any, TYPE_CHECKING
 
@@ -11,8 +14,34 @@ if TYPE_CHECKING:
     from app.models.review import Review
     from app.models.user_food_history import UserFoodHistory
 
+# Full-text document for keyword search: name weighs most, then ingredients and
+# mood tags, then the description. 'simple' keeps Indonesian dish names unstemmed.
+FOOD_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(json_to_tsvector('simple', coalesce(main_ingredients, '[]'::json), '[\"string\"]'), 'B') || "
+    "setweight(json_to_tsvector('simple', coalesce(mood_tags, '[]'::json), '[\"string\"]'), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'C')"
+)
+
 class Food(Base):
     __tablename__ = "foods"
+    __table_args__ = (
+        hnsw_cosine_index("ix_foods_embedding_hnsw"),
+        # Partial HNSW indexes so filtered searches don't lose recall to post-filtering
+        hnsw_cosine_index("ix_foods_embedding_hnsw_valid", postgresql_where=text("is_valid_food IS true")),
+        *[
+            hnsw_cosine_index(
+                f"ix_foods_embedding_hnsw_{category}",
+                postgresql_where=text(f"category = '{category}' AND is_valid_food IS true"),
+            )
+            for category in settings.VECTOR_PARTIAL_INDEX_CATEGORIES
+        ],
+        Index("ix_foods_search_vector", "search_vector", postgresql_using="gin"),
+        # Keyset pagination, newest first (see app/api/pagination.py)
+        Index("ix_foods_created_at_id", "created_at", "id"),
+        Index("ix_foods_store_id_created_at_id", "store_id", "created_at", "id"),
+        Index("ix_foods_category_created_at_id", "category", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     store_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("stores.id"), nullable=True)
@@ -27,8 +56,15 @@ class Food(Base):
     texture: Mapped[List[str]] = mapped_column(JSON, default=[], nullable=False)  # e.g., ["crispy", "soft", "chewy", "crunchy"]
     mood_tags: Mapped[List[str] | None] = mapped_column(JSON, default=[], nullable=True)  # e.g., ["happy", "sad", "stressed", "energetic", "comfort"]
     image_url: Mapped[str | None] = mapped_column(String, nullable=True)
-    embedding: Mapped[Vector] = mapped_column(Vector(1536), nullable=False) # Embedding for semantic search (1536 dimensions for OpenAI embeddings)
+    embedding: Mapped[Vector | None] = mapped_column(embedding_type(), nullable=True) # Embedding for semantic search (EMBEDDING_DIMENSIONS, zero-padded if the provider's is shorter)
+    embedding_status: Mapped[str] = mapped_column(String, default="ready", server_default="ready", nullable=False)  # ready, pending, failed
+    embedding_model: Mapped[str | None] = mapped_column(String, nullable=True)  # e.g. "openrouter:text-embedding-3-small"
+    search_vector: Mapped[Any] = mapped_column(TSVECTOR, Computed(FOOD_SEARCH_VECTOR_SQL, persisted=True), deferred=True)
     is_valid_food: Mapped[bool | None] = mapped_column(Boolean, default=False)
+    # Review aggregates, bumped atomically by create_review (app/services/rating_aggregates.py)
+    rating_avg: Mapped[float | None] = mapped_column(Float, nullable=True)
+    rating_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    rating_histogram: Mapped[List[int]] = mapped_column(ARRAY(Integer), default=lambda: [0] * 5, server_default="{0,0,0,0,0}", nullable=False)  # reviews per star, 1..5
     created_at: Mapped[datetime | None] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime | None] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
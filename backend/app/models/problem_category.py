@@ -0,0 +1,30 @@
+from sqlalchemy import Integer, String, Float, Boolean, DateTime, Text, JSON
+from sqlalchemy.orm import Mapped, mapped_column
+from pgvector.sqlalchemy import Vector
+from app.core.database import Base
+from app.models.base import embedding_type
+from datetime import datetime
+from typing import List
+
+class ProblemCategory(Base):
+    """
+    A kind of complaint (slow delivery, untidy packaging, ...). Its embedding is
+    computed once from name, description and keywords; reviews are classified by
+    their nearest category (see app/services/review_analysis.py).
+    """
+    __tablename__ = "problem_categories"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    category_key: Mapped[str] = mapped_column(String, unique=True, nullable=False)
+    name: Mapped[str] = mapped_column(String, nullable=False)
+    description: Mapped[str | None] = mapped_column(Text, nullable=True)
+    keywords: Mapped[List[str]] = mapped_column(JSON, default=list, nullable=False)
+    # Multiplies the review count in the issues dashboard's severity score
+    severity_weight: Mapped[float] = mapped_column(Float, default=0.5, nullable=False)
+    action_template: Mapped[str | None] = mapped_column(Text, nullable=True)  # Suggested fix shown to the owner
+    is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
+    language: Mapped[str] = mapped_column(String, default="en", nullable=False)
+    embedding: Mapped[Vector | None] = mapped_column(embedding_type(), nullable=True)
+    embedding_model: Mapped[str | None] = mapped_column(String, nullable=True)
+    created_at: Mapped[datetime | None] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime | None] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
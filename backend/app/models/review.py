@@ -1,8 +1,9 @@
-from sqlalchemy import Integer, String, ForeignKey, DateTime, Float
+from sqlalchemy import Integer, String, ForeignKey, DateTime, Float, Index, text
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from sqlalchemy.sql import func
 from pgvector.sqlalchemy import Vector
 from app.core.database import Base
+from app.models.base import embedding_type, hnsw_cosine_index
 from datetime import datetime
 from typing import Optional, TYPE_CHECKING
 
@@ -13,6 +14,15 @@ if TYPE_CHECKING:
 
 class Review(Base):
     __tablename__ = "reviews"
+    __table_args__ = (
+        hnsw_cosine_index("ix_reviews_embedding_hnsw"),
+        # Keyset pagination, newest first (see app/api/pagination.py)
+        Index("ix_reviews_store_id_created_at_id", "store_id", "created_at", "id"),
+        Index("ix_reviews_food_id_created_at_id", "food_id", "created_at", "id"),
+        Index("ix_reviews_user_id_created_at_id", "user_id", "created_at", "id"),
+        # Embedded reviews still waiting for classification
+        Index("ix_reviews_unanalyzed", "id", postgresql_where=text("analyzed_at IS NULL AND embedding IS NOT NULL")),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
@@ -20,7 +30,13 @@ class Review(Base):
     food_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("foods.id"), nullable=True)
     rating: Mapped[float] = mapped_column(Float, nullable=False) # 0-5
     comment: Mapped[str] = mapped_column(String, nullable=False)
-    embedding: Mapped[Vector] = mapped_column(Vector(1536), nullable=False)  # For semantic analysis
+    embedding: Mapped[Vector | None] = mapped_column(embedding_type(), nullable=True)  # For semantic analysis
+    embedding_status: Mapped[str] = mapped_column(String, default="ready", server_default="ready", nullable=False)  # ready, pending, failed
+    embedding_model: Mapped[str | None] = mapped_column(String, nullable=True)  # e.g. "openrouter:text-embedding-3-small"
+    # Nearest problem category, set only for low-rated reviews close enough to one (app/services/review_analysis.py)
+    problem_category_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("problem_categories.id", ondelete="SET NULL"), nullable=True)
+    problem_similarity: Mapped[float | None] = mapped_column(Float, nullable=True)
+    analyzed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     created_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime | None] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
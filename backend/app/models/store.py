@@ -1,12 +1,23 @@
-from sqlalchemy import Integer, String, ForeignKey, Float, Boolean, DateTime, Text
+from sqlalchemy import Integer, String, ForeignKey, Float, Boolean, DateTime, Text, Index, text
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from pgvector.sqlalchemy import Vector
 from app.core.database import Base
+from app.models.base import embedding_type, hnsw_cosine_index
 from datetime import datetime
 from typing import List, Optional
 
 class Store(Base):
     __tablename__ = "stores"
+    __table_args__ = (
+        hnsw_cosine_index("ix_stores_embedding_hnsw"),
+        # Partial HNSW index so searches over validated stores don't lose recall to post-filtering
+        hnsw_cosine_index("ix_stores_embedding_hnsw_valid", postgresql_where=text("is_valid_store IS true")),
+        # earthdistance GiST index serving the earth_box() bounding-box prefilter of nearby searches
+        Index("ix_stores_location_earth", text("ll_to_earth(latitude, longitude)"), postgresql_using="gist"),
+        # Keyset pagination, newest first (see app/api/pagination.py)
+        Index("ix_stores_created_at_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     umkm_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("users.id"), nullable=True)
@@ -21,8 +32,14 @@ class Store(Base):
     image_url: Mapped[str | None] = mapped_column(String, nullable=True)
     suggestion: Mapped[str | None] = mapped_column(Text, nullable=True)
     suggestion_complete: Mapped[bool | None] = mapped_column(Boolean, default=False)
-    embedding: Mapped[Vector] = mapped_column(Vector(1536), nullable=False) # OpenAI embedding dimension
+    embedding: Mapped[Vector | None] = mapped_column(embedding_type(), nullable=True) # Native provider embedding dimension
+    embedding_status: Mapped[str] = mapped_column(String, default="ready", server_default="ready", nullable=False)  # ready, pending, failed
+    embedding_model: Mapped[str | None] = mapped_column(String, nullable=True)  # e.g. "openrouter:text-embedding-3-small"
     is_valid_store: Mapped[bool | None] = mapped_column(Boolean, default=False)
+    # Review aggregates, bumped atomically by create_review (app/services/rating_aggregates.py)
+    rating_avg: Mapped[float | None] = mapped_column(Float, nullable=True)
+    rating_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    rating_histogram: Mapped[List[int]] = mapped_column(ARRAY(Integer), default=lambda: [0] * 5, server_default="{0,0,0,0,0}", nullable=False)  # reviews per star, 1..5
     created_at: Mapped[datetime | None] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime | None] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -0,0 +1,18 @@
+from sqlalchemy import Integer, ForeignKey, DateTime, Float
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.database import Base
+from datetime import datetime
+
+class StoreProblemStat(Base):
+    """
+    Per-store totals of reviews classified into each problem category,
+    incremented as reviews are analyzed so the issues dashboard never scans reviews.
+    """
+    __tablename__ = "store_problem_stats"
+
+    store_id: Mapped[int] = mapped_column(Integer, ForeignKey("stores.id", ondelete="CASCADE"), primary_key=True)
+    category_id: Mapped[int] = mapped_column(Integer, ForeignKey("problem_categories.id", ondelete="CASCADE"), primary_key=True)
+    review_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    rating_sum: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+    similarity_sum: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+    last_review_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, String, ForeignKey, Float, DateTime
+from sqlalchemy import Integer, String, ForeignKey, Float, DateTime, Index
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from app.core.database import Base
 from datetime import datetime
@@ -6,6 +6,10 @@ from typing import Optional
 
 class UserFoodHistory(Base):
     __tablename__ = "user_food_history"
+    __table_args__ = (
+        # Keyset pagination, newest first (see app/api/pagination.py)
+        Index("ix_user_food_history_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False, index=True)
@@ -0,0 +1,36 @@
+from sqlalchemy import Integer, ForeignKey, JSON, DateTime, Float, String
+from sqlalchemy.orm import Mapped, mapped_column
+from pgvector.sqlalchemy import Vector
+from app.core.database import Base
+from app.models.base import embedding_type
+from datetime import datetime
+from typing import Dict
+
+class UserProfile(Base):
+    """
+    Materialized preference profile, maintained incrementally from user_food_history.
+    Embeddings are running means over distinct foods; counters are {value: count} maps.
+    """
+    __tablename__ = "user_profiles"
+
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+
+    # Running mean of the embeddings of distinct highly rated (>= 4) foods
+    liked_embedding: Mapped[Vector | None] = mapped_column(embedding_type(), nullable=True)
+    liked_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # Running mean over every distinct interacted food (implicit feedback fallback)
+    all_embedding: Mapped[Vector | None] = mapped_column(embedding_type(), nullable=True)
+    all_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # Embedding model the two means were built from; vectors from another model are not used
+    embedding_model: Mapped[str | None] = mapped_column(String, nullable=True)
+
+    category_counts: Mapped[Dict[str, int]] = mapped_column(JSON, default=dict, nullable=False)
+    taste_counts: Mapped[Dict[str, int]] = mapped_column(JSON, default=dict, nullable=False)
+    mood_counts: Mapped[Dict[str, int]] = mapped_column(JSON, default=dict, nullable=False)
+    selection_counts: Mapped[Dict[str, int]] = mapped_column(JSON, default=dict, nullable=False)  # food_id -> times selected
+
+    rating_sum: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+    rating_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    total_interactions: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    updated_at: Mapped[datetime | None] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
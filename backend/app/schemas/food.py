@@ -38,6 +38,10 @@ class FoodResponse(FoodBase):
     id: int
     store_id: Optional[int] = None
     is_valid_food: bool 
+    embedding_status: Optional[str] = None
+    rating_avg: Optional[float] = None
+    rating_count: int = 0
+    rating_histogram: List[int] = Field(default_factory=lambda: [0] * 5, description="Reviews per star, 1 to 5")
     created_at: datetime
     updated_at: datetime
 
@@ -62,3 +66,22 @@ class FoodRecommendationResponse(BaseModel):
     recommendations: List[FoodRecommendationItem]
     query: str
     total_results: int
+
+# Schema for batch personalized recommendations (streamed back as JSON Lines)
+class BatchRecommendationRequest(BaseModel):
+    user_ids: Optional[List[int]] = Field(None, description="Users to score; every user when omitted")
+    limit: int = Field(default=10, ge=1, le=100)
+
+# Schemas for bulk food import
+class FoodBulkImportRowResult(BaseModel):
+    row: int = Field(..., description="1-based row number in the uploaded file")
+    status: str = Field(..., description="created or error")
+    name: Optional[str] = None
+    food_id: Optional[int] = None
+    error: Optional[str] = None
+
+class FoodBulkImportResponse(BaseModel):
+    total_rows: int
+    created: int
+    failed: int
+    results: List[FoodBulkImportRowResult]
@@ -0,0 +1,15 @@
+from typing import Any, Optional
+from pydantic import BaseModel, ConfigDict
+from datetime import datetime
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: str
+    attempts: int
+    last_error: Optional[str] = None
+    result: Optional[Any] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
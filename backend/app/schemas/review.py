@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field, ConfigDict
 from datetime import datetime
 
@@ -18,7 +18,24 @@ class Review(BaseModel):
     food_id: Optional[int]
     rating: float
     comment: str
+    embedding_status: Optional[str] = None
     created_at: datetime
     updated_at: Optional[datetime]
 
     model_config = ConfigDict(from_attributes=True)
+
+class ProblemIssue(BaseModel):
+    category_key: str
+    name: str
+    review_count: int
+    average_rating: float
+    average_similarity: float
+    severity_score: float
+    suggested_action: Optional[str] = None
+    last_review_at: Optional[datetime] = None
+
+class StoreIssues(BaseModel):
+    store_id: int
+    store_name: str
+    total_problem_reviews: int
+    issues: List[ProblemIssue]
@@ -39,7 +39,17 @@ class StoreUpdate(BaseModel):
 class Store(StoreBase):
     id: int
     umkm_id: Optional[int] = None
+    embedding_status: Optional[str] = None
+    rating_avg: Optional[float] = None
+    rating_count: int = 0
+    rating_histogram: List[int] = Field(default_factory=lambda: [0] * 5, description="Reviews per star, 1 to 5")
     created_at: datetime
     updated_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class NearbyStore(BaseModel):
+    store: Store
+    distance_m: float
+    score: Optional[float] = None
@@ -1,18 +1,37 @@
-from typing import List, Optional
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+import numpy as np
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from app.core.config import settings
+from app.core.metrics import observe_ai_call
 from app.models.store import Store
 from app.models.food import Food
 from app.models.user_food_history import UserFoodHistory
-from sqlalchemy import text, func, and_
+from app.models.user_profile import UserProfile
+from app.services.embedding_cache import as_array, embedding_cache, make_cache_key, normalize_text
+from app.services.llm_metrics import LLMMetricsCallback
+from app.services.text_search import websearch_tsquery
+from app.services.llm_cache import llm_response_cache, make_bucket_key
+from app.services.user_profile_service import LIKED_RATING_THRESHOLD
+from app.services.vector_index import food_vector_index
+from app.services import rating_aggregates, vector_search_planner
+from app.services.vector_search_planner import PLAN_EXACT, PLAN_ITERATIVE_SCAN, PLAN_UNFILTERED
+from sqlalchemy import text, func, and_, or_, case, select, literal
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # Initialize AI clients (supports both OpenRouter and Gemini)
 embeddings = None
 llm = None
+embedding_model_name = None
+ai_provider = None  # "openrouter" or "gemini"; used as the metrics label
+llm_model_name = None
 
 # Try OpenRouter first
 if settings.OPENROUTER_API_KEY:
@@ -25,8 +44,13 @@ if settings.OPENROUTER_API_KEY:
         llm = ChatOpenAI(
             api_key=settings.OPENROUTER_API_KEY,
             base_url="https://openrouter.ai/api/v1",
-            model=settings.OPENROUTER_MODEL
+            model=settings.OPENROUTER_MODEL,
+            stream_usage=True,
+            callbacks=[LLMMetricsCallback("openrouter")]
         )
+        embedding_model_name = f"openrouter:{settings.OPENROUTER_EMBEDDING_MODEL}"
+        llm_model_name = f"openrouter:{settings.OPENROUTER_MODEL}"
+        ai_provider = "openrouter"
         print("✅ AI Service initialized with OpenRouter")
     except Exception as e:
         print(f"⚠️ OpenRouter initialization failed: {e}")
@@ -40,8 +64,12 @@ if not llm and settings.GEMINI_API_KEY:
         )
         llm = ChatGoogleGenerativeAI(
             model=settings.GEMINI_MODEL,
-            google_api_key=settings.GEMINI_API_KEY
+            google_api_key=settings.GEMINI_API_KEY,
+            callbacks=[LLMMetricsCallback("gemini")]
         )
+        embedding_model_name = f"gemini:{settings.GEMINI_EMBEDDING_MODEL}"
+        llm_model_name = f"gemini:{settings.GEMINI_MODEL}"
+        ai_provider = "gemini"
         print("✅ AI Service initialized with Gemini")
     except Exception as e:
         print(f"⚠️ Gemini initialization failed: {e}")
@@ -50,329 +78,75 @@ if not llm:
     print("⚠️ No AI provider configured. Set either OPENROUTER_API_KEY or GEMINI_API_KEY in .env")
 
 
-def generate_embedding(text_content: str) -> List[float]:
-    """Generate embedding vector, padding to 1536 dimensions if needed"""
-    if not embeddings:
-        # Mock for dev/test
-        return [0.0] * 1536
-    
-    try:
-        # Clean text
-        cleaned_text = text_content.replace("\n", " ")
-        embedding_vector = embeddings.embed_query(cleaned_text)
-        
-        # Pad to 1536 dimensions if needed (for Gemini which returns 768)
-        if len(embedding_vector) < 1536:
-            padding = [0.0] * (1536 - len(embedding_vector))
-            embedding_vector = embedding_vector + padding
-        # Truncate if longer (shouldn't happen but just in case)
-        elif len(embedding_vector) > 1536:
-            embedding_vector = embedding_vector[:1536]
-            
-        return embedding_vector
-    except Exception as e:
-        print(f"Embedding Error: {e}")
-        return [0.0] * 1536
-
-
-# ========== STORE-SPECIFIC FUNCTIONS ==========
-
-def search_stores_by_vector(query: str, db, limit: int = 3):
-    query_vector = generate_embedding(query)
-    stores = db.query(Store).order_by(
-        Store.embedding.cosine_distance(query_vector)
-    ).limit(limit).all()
-    
-    return stores
+# ========== PROMPTS ==========
 
-def recommend_food(user_preferences: str, db):
-    if not llm:
-        return "AI service not configured."
-        
-    # 1. Search for relevant stores/products first (RAG)
-    # For simplicity, let's just search stores based on preferences
-    relevant_stores = search_stores_by_vector(user_preferences, db, limit=3)
-    
-    context = "\n".join([f"- {s.name}: {s.description} ({s.address})" for s in relevant_stores])
-    
-    prompt = ChatPromptTemplate.from_template("""
+STORE_RECOMMENDATION_PROMPT = ChatPromptTemplate.from_template("""
     You are a helpful food recommendation assistant for 'Mood2Makan'.
-    
+
     User Preferences: {preferences}
-    
+
     Here are some nearby/relevant stores found in our database:
     {context}
-    
+
     Based on the user's preferences and the available stores, suggest where they should eat and what they might like.
     If no stores seem relevant, give a general suggestion but mention we might not have a perfect match nearby.
     """)
-    
-    chain = prompt | llm | StrOutputParser()
-    
-    return chain.invoke({"preferences": user_preferences, "context": context})
-
-
-# ========== FOOD-SPECIFIC FUNCTIONS ==========
-
-def generate_food_embedding(food_data: dict) -> List[float]:
-    """Generate embedding from food attributes"""
-    # Combine all relevant food attributes into a rich text description
-    text_parts = [
-        f"Food: {food_data.get('name', '')}",
-        f"Description: {food_data.get('description', '')}",
-        f"Category: {food_data.get('category', '')}",
-        f"Ingredients: {', '.join(food_data.get('main_ingredients', []))}",
-        f"Taste: {', '.join(food_data.get('taste_profile', []))}",
-        f"Texture: {', '.join(food_data.get('texture', []))}",
-        f"Mood: {', '.join(food_data.get('mood_tags', []))}"
-    ]
-    
-    combined_text = " | ".join(text_parts)
-    return generate_embedding(combined_text)
-
-
-def search_foods_by_vector(query: str, db: Session, limit: int = 5, 
-                           category: Optional[str] = None,
-                           max_calories: Optional[float] = None) -> List[Food]:
-    """Search foods using vector similarity"""
-    try:
-        query_vector = generate_embedding(query)
-        
-        # Build query with optional filters
-        foods_query = db.query(Food)
-        
-        if category:
-            foods_query = foods_query.filter(Food.category == category)
-        
-        if max_calories:
-            foods_query = foods_query.filter(Food.calories <= max_calories)
-        
-        # Order by similarity
-        foods = foods_query.order_by(
-            Food.embedding.cosine_distance(query_vector)
-        ).limit(limit).all()
-        
-        return foods
-    except Exception as e:
-        print(f"Error in search_foods_by_vector: {e}")
-        # Fallback: return foods without vector search
-        foods_query = db.query(Food)
-        if category:
-            foods_query = foods_query.filter(Food.category == category)
-        if max_calories:
-            foods_query = foods_query.filter(Food.calories <= max_calories)
-        return foods_query.limit(limit).all()
-
 
-def recommend_foods_by_mood(mood_description: str, db: Session, 
-                            user_id: Optional[int] = None,
-                            limit: int = 5) -> dict:
-    """Get AI-powered food recommendations based on mood/preferences"""
-    if not llm:
-        # Fallback to vector search only
-        foods = search_foods_by_vector(mood_description, db, limit=limit)
-        return {
-            "recommendations": foods,
-            "explanation": "AI service not configured. Showing similar foods based on your description."
-        }
-    
-    # 1. Get relevant foods using vector search
-    relevant_foods = search_foods_by_vector(mood_description, db, limit=5)
-    
-    # 2. Get user history if available
-    user_context = ""
-    if user_id:
-        user_history = db.query(UserFoodHistory).filter(
-            UserFoodHistory.user_id == user_id
-        ).order_by(UserFoodHistory.created_at.desc()).limit(5).all()
-        
-        if user_history:
-            liked_foods = [h.food.name for h in user_history if h.rating and h.rating >= 4]
-            if liked_foods:
-                user_context = f"\nUser previously enjoyed: {', '.join(liked_foods[:5])}"
-    
-    # 3. Build context from relevant foods
-    food_context = "\n".join([
-        f"- {f.name} ({f.category}): {f.description or 'No description'}\n"
-        f"  Taste: {', '.join(f.taste_profile)}, Texture: {', '.join(f.texture)}\n"
-        f"  Mood tags: {', '.join(f.mood_tags or [])}"
-        for f in relevant_foods[:10]
-    ])
-    
-    # 4. Use LLM to generate personalized recommendations
-    prompt = ChatPromptTemplate.from_template("""
+FOOD_RECOMMENDATION_PROMPT = ChatPromptTemplate.from_template("""
     You are a food recommendation expert for 'Mood2Makan'.
-    
+
     User's mood/preferences: {mood_description}
     {user_context}
-    
+
     Available foods in our database:
     {food_context}
-    
+
     Based on the user's mood and preferences, recommend 3-5 foods from the list above.
     For each recommendation, explain why it matches their mood/preferences.
     Be empathetic and consider how different foods can affect mood and satisfaction.
-    
+
     Format your response as a friendly, conversational recommendation.
     """)
-    
-    chain = prompt | llm | StrOutputParser()
-    
-    explanation = chain.invoke({
-        "mood_description": mood_description,
-        "user_context": user_context,
-        "food_context": food_context
-    })
-    
-    return {
-        "recommendations": relevant_foods[:limit],
-        "explanation": explanation
-    }
-
-
-def get_personalized_recommendations(user_id: int, db: Session, limit: int = 10) -> List[Food]:
-    """Get personalized food recommendations based on user history using vector search"""
-    try:
-        # 1. Get user's interaction history
-        user_history = db.query(UserFoodHistory).filter(
-            UserFoodHistory.user_id == user_id
-        ).all()
-        
-        if not user_history:
-            # No history, return random foods
-            return db.query(Food).order_by(func.random()).limit(limit).all()
-        
-        # 2. Identify "liked" foods to build the preference profile
-        # Prefer highly rated foods (>= 4)
-        liked_history = [h for h in user_history if h.rating and h.rating >= 4]
-        
-        # If no highly rated foods, use all interactions (implicit feedback)
-        target_history = liked_history if liked_history else user_history
-        target_food_ids = [h.food_id for h in target_history]
-        
-        # 3. Fetch embeddings of target foods
-        target_foods = db.query(Food).filter(Food.id.in_(target_food_ids)).all()
-        valid_embeddings = [f.embedding for f in target_foods if f.embedding is not None]
-        
-        if not valid_embeddings:
-            return db.query(Food).order_by(func.random()).limit(limit).all()
-            
-        # 4. Calculate average embedding vector (User Profile Vector)
-        vector_dim = len(valid_embeddings[0])  # type: ignore
-        avg_vector = [0.0] * vector_dim
-        
-        for emb in valid_embeddings:
-            for i in range(vector_dim):
-                avg_vector[i] += emb[i]  # type: ignore
-                
-        avg_vector = [x / len(valid_embeddings) for x in avg_vector]
-        
-        # 5. Find similar foods using vector similarity
-        # Exclude foods the user has already interacted with
-        interacted_food_ids = [h.food_id for h in user_history]
-        
-        recommendations = db.query(Food).filter(
-            ~Food.id.in_(interacted_food_ids)
-        ).order_by(
-            Food.embedding.cosine_distance(avg_vector)
-        ).limit(limit).all()
-        
-        return recommendations
-        
-    except Exception as e:
-        print(f"Error in get_personalized_recommendations: {e}")
-        # Fallback: return random foods
-        return db.query(Food).order_by(func.random()).limit(limit).all()
-
 
-# ========== FOOD DESCRIPTION GENERATION FUNCTIONS ==========
+# Bump whenever FOOD_RECOMMENDATION_PROMPT changes so cached explanations are not reused
+FOOD_RECOMMENDATION_PROMPT_VERSION = "1"
 
-def generate_food_description(
-    name: str,
-    category: str,
-    main_ingredients: Optional[List[str]] = None,
-    taste_profile: Optional[List[str]] = None,
-    texture: Optional[List[str]] = None,
-    region: Optional[str] = None,
-    selling_points: Optional[List[str]] = None,
-    style: str = "promotional",
-    language: str = "en",
-    db: Optional[Session] = None
-) -> dict:
-    """
-    Generate compelling food descriptions using AI.
-    Returns short description, long description, selling points, and flavor characteristics.
-    """
-    if not llm:
-        return {
-            "short_description": f"{name} - A delicious {category.replace('_', ' ')}",
-            "long_description": f"{name} is a wonderful {category.replace('_', ' ')} that you'll love.",
-            "selling_points": selling_points or [],
-            "flavor_characteristics": {}
-        }  
-    
-    # Build context
-    context_parts = [f"Food Name: {name}", f"Category: {category.replace('_', ' ')}"]
-    
-    if main_ingredients:
-        context_parts.append(f"Main Ingredients: {', '.join(main_ingredients)}")
-    if taste_profile:
-        context_parts.append(f"Taste Profile: {', '.join(taste_profile)}")
-    if texture:
-        context_parts.append(f"Texture: {', '.join(texture)}")
-    if region:
-        context_parts.append(f"Region of Origin: {region}")
-    if selling_points:
-        context_parts.append(f"Key Selling Points: {', '.join(selling_points)}")
-    
-    context = "\n".join(context_parts)
-    
-    # Determine style instructions
-    style_instructions = {
-        "promotional": "Write in an engaging, marketing-focused style that highlights the food's appeal and makes people want to try it.",
-        "informational": "Write in a clear, factual style that educates readers about the food.",
-        "casual": "Write in a friendly, conversational style as if recommending to a friend."
-    }
-    
-    style_instruction = style_instructions.get(style, style_instructions["promotional"])
-    
-    # Create prompt
-    prompt = ChatPromptTemplate.from_template("""
+FOOD_DESCRIPTION_PROMPT = ChatPromptTemplate.from_template("""
     You are an expert food writer and marketing copywriter. Generate compelling food descriptions.
-    
+
     Food Information:
     {context}
-    
+
     Available Promotional Keywords (use naturally if relevant): {keywords}
-    
+
     Style: {style_instruction}
     Language: {language}
-    
+
     Generate the following:
-    
+
     1. SHORT DESCRIPTION (1-2 sentences, ~30-50 words):
     - Concise and impactful
     - Highlight the most appealing aspects
     - Perfect for menus or quick listings
-    
+
     2. LONG DESCRIPTION (1 paragraph, ~80-120 words):
     - Detailed and evocative
     - Tell a story about the food
     - Include sensory details (taste, aroma, texture, appearance)
     - Mention preparation method if relevant
     - Create desire and appetite appeal
-    
+
     3. SELLING POINTS (3-5 bullet points):
     - Key features that make this food special
     - What sets it apart
     - Benefits to the customer
-    
+
     4. FLAVOR CHARACTERISTICS:
     - Primary flavors
     - Secondary flavors
     - Texture description
     - Aroma notes
-    
+
     Format your response as JSON:
     {{
         "short_description": "...",
@@ -386,96 +160,1357 @@ def generate_food_description(
         }}
     }}
     """)
-    
-    chain = prompt | llm | StrOutputParser()
-    
-    try:
-        result = chain.invoke({
-            "context": context,
-            "style_instruction": style_instruction,
-            "language": language,
-            "keywords": ""  # Add keywords parameter for template
-        })
-        
-        # Parse JSON response
-        import json
-        # Try to extract JSON from response
-        if "```json" in result:
-            result = result.split("```json")[1].split("```")[0].strip()
-        elif "```" in result:
-            result = result.split("```")[1].split("```")[0].strip()
-        
-        parsed = json.loads(result)
-        return parsed
-        
-    except Exception as e:
-        print(f"Description generation error: {e}")
-        # Fallback
-        return {
-            "short_description": f"Delicious {name} from {region or 'our kitchen'}. {' '.join(taste_profile[:2]) if taste_profile else 'A must-try dish'}.",
-            "long_description": f"Experience the authentic taste of {name}, a {category.replace('_', ' ')} that combines {', '.join(main_ingredients[:3]) if main_ingredients else 'quality ingredients'}. {'Featuring ' + ', '.join(taste_profile) if taste_profile else 'Perfectly prepared'} to deliver an unforgettable dining experience.",
-            "selling_points": selling_points or ["High quality ingredients", "Expertly prepared", "Authentic recipe"],
-            "flavor_characteristics": {
-                "primary_flavors": taste_profile[:2] if taste_profile else [],
-                "secondary_flavors": taste_profile[2:] if taste_profile and len(taste_profile) > 2 else [],
-                "texture_description": ", ".join(texture) if texture else "Perfect texture",
-                "aroma_notes": "Aromatic and inviting"
-            }
-        }
 
-def enhance_food_description(
-    current_description: str,
-    food_name: str,
-    category: str,
-    enhance_for: str = "promotional",
-    additional_info: Optional[dict] = None
-) -> str:
-    """
-    Enhance an existing food description using AI.
-    """
-    if not llm:
-        return current_description
-    
-    enhancement_goals = {
-        "promotional": "Make it more engaging and marketing-focused to drive sales",
-        "seo": "Optimize for search engines while maintaining readability and appeal",
-        "detailed": "Add more sensory details and descriptive language"
-    }
-    
-    goal = enhancement_goals.get(enhance_for, enhancement_goals["promotional"])
-    
-    additional_context = ""
-    if additional_info:
-        additional_context = "\n".join([f"{k}: {v}" for k, v in additional_info.items()])
-    
-    prompt = ChatPromptTemplate.from_template("""
+ENHANCE_DESCRIPTION_PROMPT = ChatPromptTemplate.from_template("""
     You are an expert food writer. Enhance the following food description.
-    
+
     Food Name: {food_name}
     Category: {category}
     Current Description: {current_description}
-    
+
     {additional_context}
-    
+
     Enhancement Goal: {goal}
-    
+
     Rewrite the description to be more compelling, vivid, and appealing.
     Maintain accuracy but enhance the language to be more evocative and appetizing.
     Keep the same general length but improve quality and impact.
-    
+
     Enhanced Description:
     """)
-    
-    chain = prompt | llm | StrOutputParser()
-    
+
+
+# ========== EMBEDDINGS ==========
+
+def _fit_dimensions(embedding_vector: List[float]) -> List[float]:
+    # Vectors are stored at EMBEDDING_DIMENSIONS, the migrated column size.
+    # Longer outputs are truncated (gemini-embedding-001 and text-embedding-3 are
+    # trained so that leading components stand alone); shorter ones are zero-padded,
+    # which leaves cosine similarity unchanged.
+    dimensions = settings.EMBEDDING_DIMENSIONS
+    if len(embedding_vector) < dimensions:
+        embedding_vector = embedding_vector + [0.0] * (dimensions - len(embedding_vector))
+    elif len(embedding_vector) > dimensions:
+        embedding_vector = embedding_vector[:dimensions]
+    return embedding_vector
+
+
+def generate_embedding(text_content: str) -> Optional[List[float]]:
+    """
+    Generate embedding vector at EMBEDDING_DIMENSIONS (the migrated column size).
+    Returns None when the provider fails, so callers never store a zero vector.
+    """
+    if not embeddings:
+        # Mock for dev/test
+        return [0.0] * settings.EMBEDDING_DIMENSIONS
+
+    # Clean text; identical normalized text under the same model hits the cache
+    cleaned_text = normalize_text(text_content)
+    cache_key = make_cache_key(embedding_model_name, cleaned_text)
+    if settings.EMBEDDING_CACHE_ENABLED:
+        cached = embedding_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    try:
+        with observe_ai_call(ai_provider, "embedding"):
+            embedding_vector = _fit_dimensions(embeddings.embed_query(cleaned_text))
+
+        if settings.EMBEDDING_CACHE_ENABLED:
+            embedding_cache.put(cache_key, embedding_model_name, embedding_vector)
+
+        return embedding_vector
+    except Exception as e:
+        print(f"Embedding Error: {e}")
+        return None
+
+
+def _embed_batch(texts: List[str]) -> List[Optional[List[float]]]:
+    try:
+        with observe_ai_call(ai_provider, "embedding_batch"):
+            return [_fit_dimensions(v) for v in embeddings.embed_documents(texts)]
+    except Exception as e:
+        print(f"Batch Embedding Error: {e}")
+        return [None for _ in texts]
+
+
+def generate_embeddings(texts: List[str]) -> List[Optional[List[float]]]:
+    """
+    Embed many texts with embed_documents.
+    Cache hits are served first; misses are split into EMBEDDING_BATCH_SIZE
+    batches and sent with at most EMBEDDING_BATCH_CONCURRENCY requests in flight.
+    Texts whose batch failed come back as None.
+    """
+    if not embeddings:
+        # Mock for dev/test
+        return [[0.0] * settings.EMBEDDING_DIMENSIONS for _ in texts]
+
+    cleaned_texts = [normalize_text(t) for t in texts]
+    cache_keys = [make_cache_key(embedding_model_name, t) for t in cleaned_texts]
+    results: List[Optional[List[float]]] = [None] * len(texts)
+
+    # Deduplicate misses so repeated texts in one import are embedded once
+    pending: dict = {}
+    for i, key in enumerate(cache_keys):
+        cached = embedding_cache.get(key) if settings.EMBEDDING_CACHE_ENABLED else None
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.setdefault(key, []).append(i)
+
+    miss_keys = list(pending)
+    batch_size = max(1, settings.EMBEDDING_BATCH_SIZE)
+    batches = [miss_keys[i:i + batch_size] for i in range(0, len(miss_keys), batch_size)]
+
+    with ThreadPoolExecutor(max_workers=max(1, settings.EMBEDDING_BATCH_CONCURRENCY)) as executor:
+        embedded = executor.map(
+            lambda batch: _embed_batch([cleaned_texts[pending[key][0]] for key in batch]),
+            batches
+        )
+        for batch, vectors in zip(batches, embedded):
+            for key, vector in zip(batch, vectors):
+                for i in pending[key]:
+                    results[i] = vector
+                if settings.EMBEDDING_CACHE_ENABLED and vector is not None:
+                    embedding_cache.put(key, embedding_model_name, vector)
+
+    return results
+
+
+async def agenerate_embedding(text_content: str) -> Optional[List[float]]:
+    """Async variant of generate_embedding using aembed_query"""
+    if not embeddings:
+        # Mock for dev/test
+        return [0.0] * settings.EMBEDDING_DIMENSIONS
+
+    cleaned_text = normalize_text(text_content)
+    cache_key = make_cache_key(embedding_model_name, cleaned_text)
+    if settings.EMBEDDING_CACHE_ENABLED:
+        cached = await embedding_cache.aget(cache_key)
+        if cached is not None:
+            return cached
+
+    try:
+        with observe_ai_call(ai_provider, "embedding"):
+            embedding_vector = _fit_dimensions(await embeddings.aembed_query(cleaned_text))
+
+        if settings.EMBEDDING_CACHE_ENABLED:
+            await embedding_cache.aput(cache_key, embedding_model_name, embedding_vector)
+
+        return embedding_vector
+    except Exception as e:
+        print(f"Embedding Error: {e}")
+        return None
+
+
+def embedding_columns(vector: Optional[List[float]]) -> dict:
+    """
+    Column values for a row whose embedding was just computed.
+    A failed embedding is stored as NULL with status 'failed' (never as zeros)
+    so searches skip the row until init/backfill_embeddings.py fills it in.
+    """
+    if vector is None:
+        return {"embedding": None, "embedding_status": "failed", "embedding_model": None}
+    return {"embedding": vector, "embedding_status": "ready", "embedding_model": embedding_model_name}
+
+
+def is_current_model(name: Optional[str]) -> bool:
+    """
+    Whether vectors recorded as produced by `name` are comparable with new ones.
+    NULL marks vectors written before the model was tracked; they count as the
+    configured model until init/backfill_embeddings.py --stamp-legacy records it.
+    """
+    return name is None or name == embedding_model_name
+
+
+def current_model(column):
+    """SQL form of is_current_model for an embedding_model column"""
+    return or_(column.is_(None), column == embedding_model_name)
+
+
+def current_embedding(model):
+    """
+    Rows whose vector is searchable: present and produced by the configured model.
+    During a model switch rows still holding the previous model's vectors drop out
+    of vector search until init/backfill_embeddings.py --mode stale reaches them,
+    instead of being ranked against query vectors from another embedding space.
+    """
+    return and_(model.embedding.isnot(None), current_model(model.embedding_model))
+
+
+# pgvector's default hnsw.ef_search; an HNSW scan never returns more rows than this
+_DEFAULT_EF_SEARCH = 40
+
+
+def _ef_search_value(ef_search: Optional[int], limit: Optional[int] = None) -> Optional[str]:
+    ef_search = ef_search or settings.HNSW_EF_SEARCH
+    if limit and limit > (ef_search or _DEFAULT_EF_SEARCH):
+        ef_search = limit
+    return str(int(ef_search)) if ef_search else None
+
+
+_SET_EF_SEARCH = text("SELECT set_config('hnsw.ef_search', :value, true)")
+
+
+def set_hnsw_ef_search(db: Session, ef_search: Optional[int] = None, limit: Optional[int] = None) -> None:
+    """
+    Set hnsw.ef_search for the current transaction only.
+    Higher values trade latency for recall on the HNSW embedding indexes;
+    it is raised to `limit` when needed so LIMIT k can be met.
+    """
+    value = _ef_search_value(ef_search, limit)
+    if value:
+        db.execute(_SET_EF_SEARCH, {"value": value})
+
+
+async def aset_hnsw_ef_search(db: AsyncSession, ef_search: Optional[int] = None,
+                              limit: Optional[int] = None) -> None:
+    """Async variant of set_hnsw_ef_search"""
+    value = _ef_search_value(ef_search, limit)
+    if value:
+        await db.execute(_SET_EF_SEARCH, {"value": value})
+
+
+# ========== STORE-SPECIFIC FUNCTIONS ==========
+
+def _vector_order(distance, exact: bool):
+    # "+ 0" hides the distance operator from the planner, forcing an exact sort
+    # over the filtered rows instead of an HNSW scan
+    return distance + 0 if exact else distance
+
+
+def _stores_by_vector_stmt(query_vector: List[float], limit: int,
+                           only_valid: bool = False, exact: bool = False):
+    # Rows without a current-model embedding (pending, failed, other model) are not searchable
+    stmt = select(Store).where(current_embedding(Store))
+    if only_valid:
+        # IS true (not = :param) so the partial index predicate is provable
+        stmt = stmt.where(Store.is_valid_store.is_(True))
+    return stmt.order_by(
+        _vector_order(Store.embedding.cosine_distance(query_vector), exact)
+    ).limit(limit)
+
+
+def _store_context(stores: List[Store]) -> str:
+    return "\n".join([f"- {s.name}: {s.description} ({s.address})" for s in stores])
+
+
+def search_stores_by_vector(query: str, db, limit: int = 3, ef_search: Optional[int] = None,
+                            only_valid: bool = False):
+    query_vector = generate_embedding(query)
+    if query_vector is None:
+        stmt = select(Store).limit(limit)
+        if only_valid:
+            stmt = stmt.where(Store.is_valid_store.is_(True))
+        return db.execute(stmt).scalars().all()
+
+    plan = vector_search_planner.plan_store_search(db, only_valid)
+    set_hnsw_ef_search(db, ef_search, limit)
+    vector_search_planner.apply_plan(db, plan)
+    stores = db.execute(
+        _stores_by_vector_stmt(query_vector, limit, only_valid, exact=plan == PLAN_EXACT)
+    ).scalars().all()
+    if len(stores) < limit and plan not in (PLAN_EXACT, PLAN_UNFILTERED):
+        # The scan gave up before enough rows passed the filter; finish exactly
+        stores = db.execute(_stores_by_vector_stmt(query_vector, limit, only_valid, exact=True)).scalars().all()
+
+    return stores
+
+
+async def asearch_stores_by_vector(query: str, db: AsyncSession, limit: int = 3,
+                                   ef_search: Optional[int] = None,
+                                   only_valid: bool = False) -> List[Store]:
+    query_vector = await agenerate_embedding(query)
+    if query_vector is None:
+        stmt = select(Store).limit(limit)
+        if only_valid:
+            stmt = stmt.where(Store.is_valid_store.is_(True))
+        return list((await db.execute(stmt)).scalars().all())
+
+    plan = await vector_search_planner.aplan_store_search(db, only_valid)
+    await aset_hnsw_ef_search(db, ef_search, limit)
+    await vector_search_planner.aapply_plan(db, plan)
+    result = await db.execute(_stores_by_vector_stmt(query_vector, limit, only_valid, exact=plan == PLAN_EXACT))
+    stores = list(result.scalars().all())
+    if len(stores) < limit and plan not in (PLAN_EXACT, PLAN_UNFILTERED):
+        result = await db.execute(_stores_by_vector_stmt(query_vector, limit, only_valid, exact=True))
+        stores = list(result.scalars().all())
+    return stores
+
+
+def _nearby_stores_stmt(latitude: float, longitude: float, radius_m: float, limit: int,
+                        query_vector: Optional[List[float]] = None, only_valid: bool = False):
+    """
+    Stores within `radius_m` metres, as (Store, distance_m, score) rows.
+
+    earth_box(origin, r) @> ll_to_earth(lat, lng) is a bounding-box test served
+    by the GiST index on ll_to_earth(latitude, longitude); the exact great-circle
+    distance is only computed for rows inside the box. With a query vector, rows
+    are ranked by a blend of cosine similarity and proximity:
+
+        score = (1 - w) * (1 - cosine_distance) + w * (1 - distance / radius)
+
+    with w = STORE_NEARBY_DISTANCE_WEIGHT; otherwise by distance alone.
+    """
+    origin = func.ll_to_earth(latitude, longitude)
+    location = func.ll_to_earth(Store.latitude, Store.longitude)
+    distance = func.earth_distance(origin, location)
+
+    filters = [
+        Store.latitude.isnot(None),
+        Store.longitude.isnot(None),
+        func.earth_box(origin, radius_m).op("@>")(location),
+        distance <= radius_m,
+    ]
+    if only_valid:
+        filters.append(Store.is_valid_store.is_(True))
+
+    if query_vector is None:
+        return select(Store, distance.label("distance_m"), literal(None).label("score")).where(
+            *filters
+        ).order_by(distance).limit(limit)
+
+    weight = settings.STORE_NEARBY_DISTANCE_WEIGHT
+    score = (
+        (1 - weight) * (1 - Store.embedding.cosine_distance(query_vector))
+        + weight * (1 - distance / radius_m)
+    )
+    return select(Store, distance.label("distance_m"), score.label("score")).where(
+        *filters, current_embedding(Store)
+    ).order_by(score.desc(), distance).limit(limit)
+
+
+def _nearby_radius(radius_m: Optional[float]) -> float:
+    radius_m = radius_m or settings.STORE_NEARBY_DEFAULT_RADIUS_M
+    return min(radius_m, settings.STORE_NEARBY_MAX_RADIUS_M)
+
+
+def search_nearby_stores(db: Session, latitude: float, longitude: float,
+                         radius_m: Optional[float] = None, query: Optional[str] = None,
+                         limit: int = 10, only_valid: bool = False) -> List[Tuple[Store, float, Optional[float]]]:
+    """Stores near a point, optionally ranked by relevance to `query` as well as distance"""
+    query_vector = generate_embedding(query) if query else None
+    stmt = _nearby_stores_stmt(latitude, longitude, _nearby_radius(radius_m), limit, query_vector, only_valid)
+    return [tuple(row) for row in db.execute(stmt).all()]
+
+
+async def asearch_nearby_stores(db: AsyncSession, latitude: float, longitude: float,
+                                radius_m: Optional[float] = None, query: Optional[str] = None,
+                                limit: int = 10, only_valid: bool = False) -> List[Tuple[Store, float, Optional[float]]]:
+    """Async variant of search_nearby_stores"""
+    query_vector = await agenerate_embedding(query) if query else None
+    stmt = _nearby_stores_stmt(latitude, longitude, _nearby_radius(radius_m), limit, query_vector, only_valid)
+    return [tuple(row) for row in (await db.execute(stmt)).all()]
+
+
+def nearby_store_context(rows: List[Tuple[Store, float, Optional[float]]]) -> str:
+    return "\n".join([
+        f"- {s.name}: {s.description} ({s.address}, {distance_m / 1000:.1f} km away)"
+        for s, distance_m, _ in rows
+    ])
+
+
+def recommend_food(user_preferences: str, db, ef_search: Optional[int] = None,
+                   latitude: Optional[float] = None, longitude: Optional[float] = None,
+                   radius_m: Optional[float] = None):
+    if not llm:
+        return "AI service not configured."
+
+    # 1. Search for relevant stores/products first (RAG)
+    # With the user's location the stores are actually nearby; otherwise only relevant
+    if latitude is not None and longitude is not None:
+        rows = search_nearby_stores(db, latitude, longitude, radius_m, query=user_preferences, limit=3)
+        context = nearby_store_context(rows)
+    else:
+        context = _store_context(search_stores_by_vector(user_preferences, db, limit=3, ef_search=ef_search))
+
+    chain = STORE_RECOMMENDATION_PROMPT | llm | StrOutputParser()
+
+    return chain.invoke({"preferences": user_preferences, "context": context})
+
+
+async def arecommend_food(user_preferences: str, db: AsyncSession, ef_search: Optional[int] = None,
+                          latitude: Optional[float] = None, longitude: Optional[float] = None,
+                          radius_m: Optional[float] = None) -> str:
+    if not llm:
+        return "AI service not configured."
+
+    if latitude is not None and longitude is not None:
+        rows = await asearch_nearby_stores(db, latitude, longitude, radius_m, query=user_preferences, limit=3)
+        context = nearby_store_context(rows)
+    else:
+        context = _store_context(await asearch_stores_by_vector(user_preferences, db, limit=3, ef_search=ef_search))
+    # Retrieval is done; give the connection back to the pool before the LLM round trip
+    await db.commit()
+
+    chain = STORE_RECOMMENDATION_PROMPT | llm | StrOutputParser()
+
+    return await chain.ainvoke({"preferences": user_preferences, "context": context})
+
+
+async def astream_store_recommendation(user_preferences: str, stores: List[Store],
+                                       context: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    Stream the LLM store recommendation for already-retrieved stores token by token.
+    `context` overrides the store list rendering (e.g. with distances for nearby stores).
+    """
+    if not llm:
+        yield "AI service not configured."
+        return
+
+    chain = STORE_RECOMMENDATION_PROMPT | llm | StrOutputParser()
+
+    async for chunk in chain.astream({"preferences": user_preferences, "context": context or _store_context(stores)}):
+        yield chunk
+
+
+# ========== FOOD-SPECIFIC FUNCTIONS ==========
+
+def build_food_embedding_text(food_data: dict) -> str:
+    """Combine all relevant food attributes into a rich text description"""
+    text_parts = [
+        f"Food: {food_data.get('name', '')}",
+        f"Description: {food_data.get('description', '')}",
+        f"Category: {food_data.get('category', '')}",
+        f"Ingredients: {', '.join(food_data.get('main_ingredients') or [])}",
+        f"Taste: {', '.join(food_data.get('taste_profile') or [])}",
+        f"Texture: {', '.join(food_data.get('texture') or [])}",
+        f"Mood: {', '.join(food_data.get('mood_tags') or [])}"
+    ]
+
+    return " | ".join(text_parts)
+
+
+def build_store_embedding_text(name: str, description: Optional[str], address: Optional[str]) -> str:
+    return f"{name} {description or ''} {address or ''}"
+
+
+def generate_food_embedding(food_data: dict) -> Optional[List[float]]:
+    """Generate embedding from food attributes"""
+    return generate_embedding(build_food_embedding_text(food_data))
+
+
+def generate_food_embeddings(foods_data: List[dict]) -> List[Optional[List[float]]]:
+    """Batched variant of generate_food_embedding, results in input order"""
+    return generate_embeddings([build_food_embedding_text(f) for f in foods_data])
+
+
+def _food_filters(category: Optional[str] = None, only_valid: bool = False) -> list:
+    filters = []
+
+    if category:
+        # Rendered inline: with a bind parameter a generic plan can't match the
+        # per-category partial HNSW indexes
+        filters.append(Food.category == literal(category, literal_execute=True))
+
+    if only_valid:
+        filters.append(Food.is_valid_food.is_(True))
+
+    return filters
+
+
+def _filtered_foods_stmt(category: Optional[str] = None, only_valid: bool = False):
+    return select(Food).where(*_food_filters(category, only_valid))
+
+
+def _foods_by_vector_stmt(query_vector: List[float], limit: int,
+                          category: Optional[str] = None,
+                          only_valid: bool = False,
+                          exact: bool = False):
+    # Order by similarity, skipping rows without a current-model embedding
+    return _filtered_foods_stmt(category, only_valid).where(current_embedding(Food)).order_by(
+        _vector_order(Food.embedding.cosine_distance(query_vector), exact)
+    ).limit(limit)
+
+
+def _indexed_food_ids(query_vector: List[float], limit: int,
+                      category: Optional[str] = None,
+                      only_valid: bool = False) -> Optional[List[int]]:
+    if not settings.VECTOR_INDEX_ENABLED:
+        return None
+    return food_vector_index.search(query_vector, limit, category=category, only_valid=only_valid)
+
+
+def _in_id_order(foods: List[Food], food_ids: List[int]) -> List[Food]:
+    by_id = {food.id: food for food in foods}
+    return [by_id[food_id] for food_id in food_ids if food_id in by_id]
+
+
+def _food_context(foods: List[Food]) -> str:
+    return "\n".join([
+        f"- {f.name} ({f.category}): {f.description or 'No description'}\n"
+        f"  Taste: {', '.join(f.taste_profile)}, Texture: {', '.join(f.texture)}\n"
+        f"  Mood tags: {', '.join(f.mood_tags or [])}"
+        for f in foods[:10]
+    ])
+
+
+def _liked_food_names_stmt(user_id: int):
+    # Names of highly rated foods among the user's 5 most recent interactions,
+    # joined in one query instead of lazy-loading h.food per history row
+    recent = select(
+        UserFoodHistory.food_id, UserFoodHistory.rating, UserFoodHistory.created_at
+    ).where(
+        UserFoodHistory.user_id == user_id
+    ).order_by(UserFoodHistory.created_at.desc()).limit(5).subquery()
+
+    return select(Food.name).join(recent, recent.c.food_id == Food.id).where(
+        recent.c.rating >= 4
+    ).order_by(recent.c.created_at.desc())
+
+
+def _user_context(liked_foods: List[str]) -> str:
+    if not liked_foods:
+        return ""
+    return f"\nUser previously enjoyed: {', '.join(liked_foods[:5])}"
+
+
+def _planned_foods_by_vector(db: Session, query_vector: List[float], limit: int,
+                             category: Optional[str], only_valid: bool,
+                             ef_search: Optional[int]) -> List[Food]:
+    plan = vector_search_planner.plan_food_search(db, category, only_valid)
+    set_hnsw_ef_search(db, ef_search, limit)
+    vector_search_planner.apply_plan(db, plan)
+
+    foods = db.execute(
+        _foods_by_vector_stmt(query_vector, limit, category, only_valid, exact=plan == PLAN_EXACT)
+    ).scalars().all()
+    if len(foods) < limit and plan not in (PLAN_EXACT, PLAN_UNFILTERED):
+        # The scan gave up before enough rows passed the filter; finish exactly
+        foods = db.execute(
+            _foods_by_vector_stmt(query_vector, limit, category, only_valid, exact=True)
+        ).scalars().all()
+    return foods
+
+
+async def _aplanned_foods_by_vector(db: AsyncSession, query_vector: List[float], limit: int,
+                                    category: Optional[str], only_valid: bool,
+                                    ef_search: Optional[int]) -> List[Food]:
+    plan = await vector_search_planner.aplan_food_search(db, category, only_valid)
+    await aset_hnsw_ef_search(db, ef_search, limit)
+    await vector_search_planner.aapply_plan(db, plan)
+
+    result = await db.execute(
+        _foods_by_vector_stmt(query_vector, limit, category, only_valid, exact=plan == PLAN_EXACT)
+    )
+    foods = list(result.scalars().all())
+    if len(foods) < limit and plan not in (PLAN_EXACT, PLAN_UNFILTERED):
+        result = await db.execute(
+            _foods_by_vector_stmt(query_vector, limit, category, only_valid, exact=True)
+        )
+        foods = list(result.scalars().all())
+    return foods
+
+
+def _rating_weight(rating_weight: Optional[float]) -> float:
+    weight = settings.FOOD_SEARCH_RATING_WEIGHT if rating_weight is None else rating_weight
+    return min(max(weight, 0.0), 1.0)
+
+
+def _rating_candidates(limit: int, rating_weight: float) -> int:
+    # Re-ranking needs more neighbours than it returns, or it can only reorder the top `limit`
+    return limit * max(1, settings.FOOD_SEARCH_RATING_CANDIDATES_FACTOR) if rating_weight > 0 else limit
+
+
+def _rerank_by_rating(foods: List[Food], query_vector: List[float], limit: int,
+                      rating_weight: float) -> List[Food]:
+    """
+    Blend cosine similarity with the Bayesian-smoothed rating (scaled to 0..1):
+    (1 - w) * similarity + w * rating / 5. A weight of 0 keeps the vector order.
+    """
+    if rating_weight <= 0 or not foods:
+        return list(foods)[:limit]
+    query = as_array(query_vector)
+    query = query / (np.linalg.norm(query) or 1.0)
+
+    def score(food: Food) -> float:
+        vector = as_array(food.embedding) if food.embedding is not None else None
+        similarity = float(vector @ query / (np.linalg.norm(vector) or 1.0)) if vector is not None else 0.0
+        rating = rating_aggregates.bayesian_rating(food.rating_avg, food.rating_count)
+        return (1 - rating_weight) * similarity + rating_weight * rating / 5
+
+    return sorted(foods, key=score, reverse=True)[:limit]
+
+
+def search_foods_by_vector(query: str, db: Session, limit: int = 5,
+                           category: Optional[str] = None,
+                           ef_search: Optional[int] = None,
+                           only_valid: bool = False,
+                           rating_weight: Optional[float] = None) -> List[Food]:
+    """
+    Search foods using vector similarity.
+    Filters go through vector_search_planner, so `limit` rows come back whenever
+    that many foods match the filters.
+    With a `rating_weight` (default FOOD_SEARCH_RATING_WEIGHT) the nearest
+    candidates are re-ranked using the stored rating aggregates.
+    """
+    try:
+        query_vector = generate_embedding(query)
+        if query_vector is None:
+            raise RuntimeError("query embedding unavailable")
+
+        weight = _rating_weight(rating_weight)
+        candidates = _rating_candidates(limit, weight)
+        food_ids = _indexed_food_ids(query_vector, candidates, category, only_valid)
+        if food_ids is not None:
+            foods = db.execute(select(Food).where(Food.id.in_(food_ids))).scalars().all()
+            foods = _in_id_order(foods, food_ids)
+        else:
+            foods = _planned_foods_by_vector(db, query_vector, candidates, category, only_valid, ef_search)
+        return _rerank_by_rating(foods, query_vector, limit, weight)
+    except Exception as e:
+        print(f"Error in search_foods_by_vector: {e}")
+        db.rollback()
+        # Fallback: return foods without vector search
+        return db.execute(
+            _filtered_foods_stmt(category, only_valid).limit(limit)
+        ).scalars().all()
+
+
+async def asearch_foods_by_vector(query: str, db: AsyncSession, limit: int = 5,
+                                  category: Optional[str] = None,
+                                  ef_search: Optional[int] = None,
+                                  only_valid: bool = False,
+                                  rating_weight: Optional[float] = None) -> List[Food]:
+    """Async variant of search_foods_by_vector"""
+    try:
+        query_vector = await agenerate_embedding(query)
+        if query_vector is None:
+            raise RuntimeError("query embedding unavailable")
+
+        weight = _rating_weight(rating_weight)
+        candidates = _rating_candidates(limit, weight)
+        # The matrix-vector product runs off the event loop (NumPy releases the GIL)
+        food_ids = await asyncio.to_thread(_indexed_food_ids, query_vector, candidates, category, only_valid)
+        if food_ids is not None:
+            result = await db.execute(select(Food).where(Food.id.in_(food_ids)))
+            foods = _in_id_order(list(result.scalars().all()), food_ids)
+        else:
+            foods = await _aplanned_foods_by_vector(
+                db, query_vector, candidates, category, only_valid, ef_search
+            )
+        return _rerank_by_rating(foods, query_vector, limit, weight)
+    except Exception as e:
+        print(f"Error in asearch_foods_by_vector: {e}")
+        await db.rollback()
+        result = await db.execute(_filtered_foods_stmt(category, only_valid).limit(limit))
+        return list(result.scalars().all())
+
+
+def _hybrid_candidates(limit: int) -> int:
+    return max(limit, settings.HYBRID_SEARCH_CANDIDATES)
+
+
+def _hybrid_foods_stmt(query: str, query_vector: List[float], limit: int,
+                       category: Optional[str] = None,
+                       only_valid: bool = False,
+                       exact: bool = False):
+    """
+    One statement fusing full-text rank and cosine similarity with reciprocal
+    rank fusion: score = 1/(k + semantic_rank) + 1/(k + lexical_rank).
+    Each side takes its top HYBRID_SEARCH_CANDIDATES from its own index
+    (HNSW / GIN); a food missing from one side only gets the other side's term.
+    """
+    filters = _food_filters(category, only_valid)
+    candidates = _hybrid_candidates(limit)
+    rrf_k = settings.HYBRID_SEARCH_RRF_K
+    tsquery = websearch_tsquery(query)
+
+    distance = Food.embedding.cosine_distance(query_vector)
+    semantic_top = select(Food.id, distance.label("distance")).where(
+        current_embedding(Food), *filters
+    ).order_by(_vector_order(distance, exact)).limit(candidates).subquery("semantic_top")
+    semantic = select(
+        semantic_top.c.id,
+        func.row_number().over(order_by=semantic_top.c.distance).label("rank")
+    ).cte("semantic")
+
+    text_rank = func.ts_rank(Food.search_vector, tsquery)
+    lexical_top = select(Food.id, text_rank.label("score")).where(
+        Food.search_vector.op("@@")(tsquery), *filters
+    ).order_by(text_rank.desc()).limit(candidates).subquery("lexical_top")
+    lexical = select(
+        lexical_top.c.id,
+        func.row_number().over(order_by=lexical_top.c.score.desc()).label("rank")
+    ).cte("lexical")
+
+    fused = select(
+        func.coalesce(semantic.c.id, lexical.c.id).label("id"),
+        (
+            func.coalesce(1.0 / (rrf_k + semantic.c.rank), 0.0)
+            + func.coalesce(1.0 / (rrf_k + lexical.c.rank), 0.0)
+        ).label("score")
+    ).select_from(
+        semantic.join(lexical, semantic.c.id == lexical.c.id, full=True)
+    ).cte("fused")
+
+    return select(Food).join(fused, fused.c.id == Food.id).order_by(
+        fused.c.score.desc(), Food.id
+    ).limit(limit)
+
+
+def hybrid_search_foods(query: str, db: Session, limit: int = 5,
+                        category: Optional[str] = None,
+                        ef_search: Optional[int] = None,
+                        only_valid: bool = False) -> List[Food]:
+    """Search foods by keyword and meaning, fused with reciprocal rank fusion"""
+    try:
+        query_vector = generate_embedding(query)
+        if query_vector is None:
+            raise RuntimeError("query embedding unavailable")
+        plan = vector_search_planner.plan_food_search(db, category, only_valid)
+        set_hnsw_ef_search(db, ef_search, _hybrid_candidates(limit))
+        vector_search_planner.apply_plan(db, plan)
+
+        return db.execute(
+            _hybrid_foods_stmt(query, query_vector, limit, category, only_valid,
+                               exact=plan == PLAN_EXACT)
+        ).scalars().all()
+    except Exception as e:
+        print(f"Error in hybrid_search_foods: {e}")
+        db.rollback()
+        return db.execute(
+            _filtered_foods_stmt(category, only_valid).limit(limit)
+        ).scalars().all()
+
+
+async def ahybrid_search_foods(query: str, db: AsyncSession, limit: int = 5,
+                               category: Optional[str] = None,
+                               ef_search: Optional[int] = None,
+                               only_valid: bool = False) -> List[Food]:
+    """Async variant of hybrid_search_foods"""
+    try:
+        query_vector = await agenerate_embedding(query)
+        if query_vector is None:
+            raise RuntimeError("query embedding unavailable")
+        plan = await vector_search_planner.aplan_food_search(db, category, only_valid)
+        await aset_hnsw_ef_search(db, ef_search, _hybrid_candidates(limit))
+        await vector_search_planner.aapply_plan(db, plan)
+
+        result = await db.execute(
+            _hybrid_foods_stmt(query, query_vector, limit, category, only_valid,
+                               exact=plan == PLAN_EXACT)
+        )
+        return list(result.scalars().all())
+    except Exception as e:
+        print(f"Error in ahybrid_search_foods: {e}")
+        await db.rollback()
+        result = await db.execute(_filtered_foods_stmt(category, only_valid).limit(limit))
+        return list(result.scalars().all())
+
+
+def _mood_cache_bucket(foods: List[Food], user_context: str) -> str:
+    # The explanation depends on the prompt, the model, the user context and the retrieved foods
+    return make_bucket_key(
+        f"{FOOD_RECOMMENDATION_PROMPT_VERSION}:{llm_model_name}", user_context, [f.id for f in foods]
+    )
+
+
+def recommend_foods_by_mood(mood_description: str, db: Session,
+                            user_id: Optional[int] = None,
+                            limit: int = 5,
+                            ef_search: Optional[int] = None) -> dict:
+    """Get AI-powered food recommendations based on mood/preferences"""
+    if not llm:
+        # Fallback to vector search only
+        foods = search_foods_by_vector(mood_description, db, limit=limit, ef_search=ef_search)
+        return {
+            "recommendations": foods,
+            "explanation": "AI service not configured. Showing similar foods based on your description."
+        }
+
+    # 1. Get relevant foods using vector search
+    relevant_foods = search_foods_by_vector(mood_description, db, limit=5, ef_search=ef_search)
+
+    # 2. Get user history if available
+    user_context = ""
+    if user_id:
+        liked_foods = db.execute(_liked_food_names_stmt(user_id)).scalars().all()
+        user_context = _user_context(liked_foods)
+
+    # 3. Reuse an explanation for the same (or a near-identical) query over the same foods
+    bucket = _mood_cache_bucket(relevant_foods, user_context)
+    query_vector = None
+    if settings.LLM_CACHE_ENABLED:
+        query_vector = generate_embedding(mood_description)  # served by the embedding cache
+        cached = llm_response_cache.get(bucket, mood_description, query_vector)
+        if cached is not None:
+            return {
+                "recommendations": relevant_foods[:limit],
+                "explanation": cached
+            }
+
+    # 4. Use LLM to generate personalized recommendations
+    chain = FOOD_RECOMMENDATION_PROMPT | llm | StrOutputParser()
+
+    explanation = chain.invoke({
+        "mood_description": mood_description,
+        "user_context": user_context,
+        "food_context": _food_context(relevant_foods)
+    })
+
+    if settings.LLM_CACHE_ENABLED:
+        llm_response_cache.put(bucket, mood_description, explanation, query_vector)
+
+    return {
+        "recommendations": relevant_foods[:limit],
+        "explanation": explanation
+    }
+
+
+async def aretrieve_mood_context(mood_description: str, db: AsyncSession,
+                                 user_id: Optional[int] = None,
+                                 limit: int = 5,
+                                 ef_search: Optional[int] = None) -> Tuple[List[Food], str]:
+    """Everything a mood recommendation needs before the LLM call: relevant foods and user context"""
+    if not llm:
+        return await asearch_foods_by_vector(mood_description, db, limit=limit, ef_search=ef_search), ""
+
+    relevant_foods = await asearch_foods_by_vector(mood_description, db, limit=5, ef_search=ef_search)
+
+    user_context = ""
+    if user_id:
+        liked_foods = (await db.execute(_liked_food_names_stmt(user_id))).scalars().all()
+        user_context = _user_context(list(liked_foods))
+
+    return relevant_foods, user_context
+
+
+async def arecommend_foods_by_mood(mood_description: str, db: AsyncSession,
+                                   user_id: Optional[int] = None,
+                                   limit: int = 5,
+                                   ef_search: Optional[int] = None) -> dict:
+    """Async variant of recommend_foods_by_mood using chain.ainvoke"""
+    relevant_foods, user_context = await aretrieve_mood_context(
+        mood_description, db, user_id=user_id, limit=limit, ef_search=ef_search
+    )
+    # Retrieval is done; give the connection back to the pool before the LLM round trip.
+    # Loaded rows stay readable because the async sessions don't expire on commit.
+    await db.commit()
+    food_context = _food_context(relevant_foods)
+
+    if not llm:
+        return {
+            "recommendations": relevant_foods,
+            "explanation": "AI service not configured. Showing similar foods based on your description."
+        }
+
+    bucket = _mood_cache_bucket(relevant_foods, user_context)
+    query_vector = None
+    if settings.LLM_CACHE_ENABLED:
+        query_vector = await agenerate_embedding(mood_description)
+        cached = llm_response_cache.get(bucket, mood_description, query_vector)
+        if cached is not None:
+            return {
+                "recommendations": relevant_foods[:limit],
+                "explanation": cached
+            }
+
+    chain = FOOD_RECOMMENDATION_PROMPT | llm | StrOutputParser()
+
+    explanation = await chain.ainvoke({
+        "mood_description": mood_description,
+        "user_context": user_context,
+        "food_context": food_context
+    })
+
+    if settings.LLM_CACHE_ENABLED:
+        llm_response_cache.put(bucket, mood_description, explanation, query_vector)
+
+    return {
+        "recommendations": relevant_foods[:limit],
+        "explanation": explanation
+    }
+
+
+async def astream_mood_explanation(mood_description: str, foods: List[Food],
+                                   user_context: str = "") -> AsyncIterator[str]:
+    """Stream the LLM explanation for already-retrieved foods token by token"""
+    if not llm:
+        yield "AI service not configured. Showing similar foods based on your description."
+        return
+
+    bucket = _mood_cache_bucket(foods, user_context)
+    query_vector = None
+    if settings.LLM_CACHE_ENABLED:
+        query_vector = await agenerate_embedding(mood_description)
+        cached = llm_response_cache.get(bucket, mood_description, query_vector)
+        if cached is not None:
+            yield cached
+            return
+
+    chain = FOOD_RECOMMENDATION_PROMPT | llm | StrOutputParser()
+
+    chunks = []
+    async for chunk in chain.astream({
+        "mood_description": mood_description,
+        "user_context": user_context,
+        "food_context": _food_context(foods)
+    }):
+        chunks.append(chunk)
+        yield chunk
+
+    # Only complete streams are cached; a disconnect or provider error never reaches here
+    if settings.LLM_CACHE_ENABLED:
+        llm_response_cache.put(bucket, mood_description, "".join(chunks), query_vector)
+
+
+# ========== USER PROFILE VECTOR ==========
+
+def _target_history_filter(user_id: int):
+    # Prefer highly rated foods (>= 4); if there are none,
+    # use all interactions (implicit feedback)
+    has_liked = select(UserFoodHistory.id).where(
+        UserFoodHistory.user_id == user_id,
+        UserFoodHistory.rating >= LIKED_RATING_THRESHOLD
+    ).exists()
+    return and_(
+        UserFoodHistory.user_id == user_id,
+        or_(UserFoodHistory.rating >= LIKED_RATING_THRESHOLD, ~has_liked)
+    )
+
+
+def _profile_avg_stmt(user_id: int):
+    # Plain mean over the distinct target foods, computed by pgvector's avg(vector)
+    # so the embeddings never leave the database
+    target_food_ids = select(UserFoodHistory.food_id).where(_target_history_filter(user_id))
+    return select(
+        func.avg(Food.embedding, type_=Food.embedding.type)
+    ).where(
+        Food.id.in_(target_food_ids),
+        current_embedding(Food)
+    )
+
+
+def _profile_rows_stmt(user_id: int):
+    # One row per target interaction, for weighted profiles
+    return select(
+        Food.embedding, UserFoodHistory.rating, UserFoodHistory.created_at
+    ).join(
+        UserFoodHistory, UserFoodHistory.food_id == Food.id
+    ).where(
+        _target_history_filter(user_id),
+        current_embedding(Food)
+    )
+
+
+def _weighted_profile(rows, recency_half_life_days: Optional[float],
+                      rating_weighted: bool) -> Optional[np.ndarray]:
+    if not rows:
+        return None
+
+    matrix = np.stack([as_array(r[0]) for r in rows])
+    weights = np.ones(len(rows), dtype=np.float64)
+
+    if rating_weighted:
+        weights *= np.asarray(
+            [r[1] if r[1] is not None else settings.PROFILE_NEUTRAL_RATING for r in rows],
+            dtype=np.float64
+        )
+
+    if recency_half_life_days:
+        now = datetime.utcnow()
+        age_days = np.asarray(
+            [((now - r[2]).total_seconds() / 86400.0) if r[2] else 0.0 for r in rows],
+            dtype=np.float64
+        )
+        weights *= np.power(0.5, np.clip(age_days, 0.0, None) / recency_half_life_days)
+
+    if not weights.sum() > 0:
+        return None
+    return np.average(matrix, axis=0, weights=weights)
+
+
+def _profile_options(recency_half_life_days: Optional[float],
+                     rating_weighted: Optional[bool]) -> Tuple[Optional[float], bool]:
+    if recency_half_life_days is None:
+        recency_half_life_days = settings.PROFILE_RECENCY_HALF_LIFE_DAYS
+    if rating_weighted is None:
+        rating_weighted = settings.PROFILE_RATING_WEIGHTED
+    return recency_half_life_days, rating_weighted
+
+
+def compute_profile_vector(user_id: int, db: Session,
+                           recency_half_life_days: Optional[float] = None,
+                           rating_weighted: Optional[bool] = None) -> Optional[np.ndarray]:
+    """
+    User profile vector: the mean embedding of the user's liked foods
+    (or of every interacted food when nothing is rated >= 4).
+    Without weighting the mean is computed in Postgres; with recency decay
+    and/or rating weighting it is a NumPy weighted average.
+    Returns None when the user has no usable history.
+    """
+    recency_half_life_days, rating_weighted = _profile_options(recency_half_life_days, rating_weighted)
+
+    if not recency_half_life_days and not rating_weighted:
+        profile = db.execute(_profile_avg_stmt(user_id)).scalar()
+        return None if profile is None else as_array(profile)
+
+    rows = db.execute(_profile_rows_stmt(user_id)).all()
+    return _weighted_profile(rows, recency_half_life_days, rating_weighted)
+
+
+async def acompute_profile_vector(user_id: int, db: AsyncSession,
+                                  recency_half_life_days: Optional[float] = None,
+                                  rating_weighted: Optional[bool] = None) -> Optional[np.ndarray]:
+    """Async variant of compute_profile_vector"""
+    recency_half_life_days, rating_weighted = _profile_options(recency_half_life_days, rating_weighted)
+
+    if not recency_half_life_days and not rating_weighted:
+        profile = (await db.execute(_profile_avg_stmt(user_id))).scalar()
+        return None if profile is None else as_array(profile)
+
+    rows = (await db.execute(_profile_rows_stmt(user_id))).all()
+    return _weighted_profile(rows, recency_half_life_days, rating_weighted)
+
+
+# ========== PERSONALIZED RECOMMENDATIONS ==========
+
+def _random_foods_stmt(limit: int):
+    return select(Food).order_by(func.random()).limit(limit)
+
+
+def _unseen_by_user(user_id: int):
+    # Anti-join against the user's history (NOT EXISTS rather than a growing NOT IN list)
+    return ~select(UserFoodHistory.id).where(
+        UserFoodHistory.user_id == user_id,
+        UserFoodHistory.food_id == Food.id
+    ).exists()
+
+
+def _unseen_foods_by_vector_stmt(profile_vector, user_id: int, limit: int):
+    return select(Food).where(
+        current_embedding(Food),
+        _unseen_by_user(user_id)
+    ).order_by(
+        Food.embedding.cosine_distance(profile_vector)
+    ).limit(limit)
+
+
+def _personalized_foods_stmt(user_id: int, limit: int):
+    """
+    Profile lookup, exclusion and kNN ordering in one statement:
+
+        WITH profile AS (SELECT coalesce(<stored profile>, <avg over history>) AS v)
+        SELECT foods.* FROM foods
+        WHERE (SELECT v FROM profile) IS NOT NULL AND NOT EXISTS (<seen by user>)
+        ORDER BY foods.embedding <=> (SELECT v FROM profile) LIMIT :limit
+
+    The stored user_profiles vector is preferred (liked mean, else the mean over all
+    interactions); the avg() fallback only runs for users without a stored profile
+    built from the current embedding model.
+    The profile is an InitPlan, so the HNSW index still serves the ORDER BY, and a
+    missing profile short-circuits to no rows.
+    """
+    stored = select(
+        case((UserProfile.liked_count > 0, UserProfile.liked_embedding), else_=UserProfile.all_embedding)
+    ).where(
+        UserProfile.user_id == user_id,
+        or_(UserProfile.liked_count > 0, UserProfile.all_count > 0),
+        current_model(UserProfile.embedding_model)
+    ).scalar_subquery()
+    computed = _profile_avg_stmt(user_id).scalar_subquery()
+
+    profile = select(
+        func.coalesce(stored, computed, type_=Food.embedding.type).label("v")
+    ).cte("profile")
+    profile_vector = select(profile.c.v).scalar_subquery()
+
+    return select(Food).where(
+        profile_vector.isnot(None),
+        current_embedding(Food),
+        _unseen_by_user(user_id)
+    ).order_by(
+        Food.embedding.cosine_distance(profile_vector)
+    ).limit(limit)
+
+
+def _weighted_profile_requested(recency_half_life_days: Optional[float],
+                                rating_weighted: Optional[bool]) -> bool:
+    recency_half_life_days, rating_weighted = _profile_options(recency_half_life_days, rating_weighted)
+    return bool(recency_half_life_days or rating_weighted)
+
+
+def get_personalized_recommendations(user_id: int, db: Session, limit: int = 10,
+                                     ef_search: Optional[int] = None,
+                                     recency_half_life_days: Optional[float] = None,
+                                     rating_weighted: Optional[bool] = None) -> List[Food]:
+    """Get personalized food recommendations based on user history using vector search"""
+    try:
+        # The history anti-join filters the HNSW scan's output, so let the scan go on
+        # past filtered-out rows until LIMIT is met
+        set_hnsw_ef_search(db, ef_search, limit)
+        vector_search_planner.apply_plan(db, PLAN_ITERATIVE_SCAN)
+
+        if _weighted_profile_requested(recency_half_life_days, rating_weighted):
+            # Weighted profiles are computed from the history rows in NumPy
+            profile_vector = compute_profile_vector(
+                user_id, db, recency_half_life_days=recency_half_life_days, rating_weighted=rating_weighted
+            )
+            foods = [] if profile_vector is None else db.execute(
+                _unseen_foods_by_vector_stmt(profile_vector, user_id, limit)
+            ).scalars().all()
+        else:
+            foods = db.execute(_personalized_foods_stmt(user_id, limit)).scalars().all()
+
+        if not foods:
+            # No history (or nothing left unseen), return random foods
+            return db.execute(_random_foods_stmt(limit)).scalars().all()
+        return foods
+
+    except Exception as e:
+        print(f"Error in get_personalized_recommendations: {e}")
+        db.rollback()
+        # Fallback: return random foods
+        return db.execute(_random_foods_stmt(limit)).scalars().all()
+
+
+async def aget_personalized_recommendations(user_id: int, db: AsyncSession, limit: int = 10,
+                                            ef_search: Optional[int] = None,
+                                            recency_half_life_days: Optional[float] = None,
+                                            rating_weighted: Optional[bool] = None) -> List[Food]:
+    """Async variant of get_personalized_recommendations"""
+    try:
+        await aset_hnsw_ef_search(db, ef_search, limit)
+        await vector_search_planner.aapply_plan(db, PLAN_ITERATIVE_SCAN)
+
+        if _weighted_profile_requested(recency_half_life_days, rating_weighted):
+            profile_vector = await acompute_profile_vector(
+                user_id, db, recency_half_life_days=recency_half_life_days, rating_weighted=rating_weighted
+            )
+            foods = [] if profile_vector is None else list((await db.execute(
+                _unseen_foods_by_vector_stmt(profile_vector, user_id, limit)
+            )).scalars().all())
+        else:
+            foods = list((await db.execute(_personalized_foods_stmt(user_id, limit))).scalars().all())
+
+        if not foods:
+            return list((await db.execute(_random_foods_stmt(limit))).scalars().all())
+        return foods
+
+    except Exception as e:
+        print(f"Error in aget_personalized_recommendations: {e}")
+        await db.rollback()
+        return list((await db.execute(_random_foods_stmt(limit))).scalars().all())
+
+
+# ========== FOOD DESCRIPTION GENERATION FUNCTIONS ==========
+
+def _description_inputs(
+    name: str,
+    category: str,
+    main_ingredients: Optional[List[str]],
+    taste_profile: Optional[List[str]],
+    texture: Optional[List[str]],
+    region: Optional[str],
+    selling_points: Optional[List[str]],
+    style: str,
+    language: str,
+) -> dict:
+    # Build context
+    context_parts = [f"Food Name: {name}", f"Category: {category.replace('_', ' ')}"]
+
+    if main_ingredients:
+        context_parts.append(f"Main Ingredients: {', '.join(main_ingredients)}")
+    if taste_profile:
+        context_parts.append(f"Taste Profile: {', '.join(taste_profile)}")
+    if texture:
+        context_parts.append(f"Texture: {', '.join(texture)}")
+    if region:
+        context_parts.append(f"Region of Origin: {region}")
+    if selling_points:
+        context_parts.append(f"Key Selling Points: {', '.join(selling_points)}")
+
+    # Determine style instructions
+    style_instructions = {
+        "promotional": "Write in an engaging, marketing-focused style that highlights the food's appeal and makes people want to try it.",
+        "informational": "Write in a clear, factual style that educates readers about the food.",
+        "casual": "Write in a friendly, conversational style as if recommending to a friend."
+    }
+
+    return {
+        "context": "\n".join(context_parts),
+        "style_instruction": style_instructions.get(style, style_instructions["promotional"]),
+        "language": language,
+        "keywords": ""  # Add keywords parameter for template
+    }
+
+
+def _parse_description(result: str) -> dict:
+    # Try to extract JSON from response
+    if "```json" in result:
+        result = result.split("```json")[1].split("```")[0].strip()
+    elif "```" in result:
+        result = result.split("```")[1].split("```")[0].strip()
+
+    return json.loads(result)
+
+
+def _unconfigured_description(name: str, category: str, selling_points: Optional[List[str]]) -> dict:
+    return {
+        "short_description": f"{name} - A delicious {category.replace('_', ' ')}",
+        "long_description": f"{name} is a wonderful {category.replace('_', ' ')} that you'll love.",
+        "selling_points": selling_points or [],
+        "flavor_characteristics": {}
+    }
+
+
+def _fallback_description(
+    name: str,
+    category: str,
+    main_ingredients: Optional[List[str]],
+    taste_profile: Optional[List[str]],
+    texture: Optional[List[str]],
+    region: Optional[str],
+    selling_points: Optional[List[str]],
+) -> dict:
+    return {
+        "short_description": f"Delicious {name} from {region or 'our kitchen'}. {' '.join(taste_profile[:2]) if taste_profile else 'A must-try dish'}.",
+        "long_description": f"Experience the authentic taste of {name}, a {category.replace('_', ' ')} that combines {', '.join(main_ingredients[:3]) if main_ingredients else 'quality ingredients'}. {'Featuring ' + ', '.join(taste_profile) if taste_profile else 'Perfectly prepared'} to deliver an unforgettable dining experience.",
+        "selling_points": selling_points or ["High quality ingredients", "Expertly prepared", "Authentic recipe"],
+        "flavor_characteristics": {
+            "primary_flavors": taste_profile[:2] if taste_profile else [],
+            "secondary_flavors": taste_profile[2:] if taste_profile and len(taste_profile) > 2 else [],
+            "texture_description": ", ".join(texture) if texture else "Perfect texture",
+            "aroma_notes": "Aromatic and inviting"
+        }
+    }
+
+
+def generate_food_description(
+    name: str,
+    category: str,
+    main_ingredients: Optional[List[str]] = None,
+    taste_profile: Optional[List[str]] = None,
+    texture: Optional[List[str]] = None,
+    region: Optional[str] = None,
+    selling_points: Optional[List[str]] = None,
+    style: str = "promotional",
+    language: str = "en",
+    db: Optional[Session] = None
+) -> dict:
+    """
+    Generate compelling food descriptions using AI.
+    Returns short description, long description, selling points, and flavor characteristics.
+    """
+    if not llm:
+        return _unconfigured_description(name, category, selling_points)
+
+    chain = FOOD_DESCRIPTION_PROMPT | llm | StrOutputParser()
+
+    try:
+        result = chain.invoke(_description_inputs(
+            name, category, main_ingredients, taste_profile, texture,
+            region, selling_points, style, language
+        ))
+        return _parse_description(result)
+
+    except Exception as e:
+        print(f"Description generation error: {e}")
+        return _fallback_description(
+            name, category, main_ingredients, taste_profile, texture, region, selling_points
+        )
+
+
+async def agenerate_food_description(
+    name: str,
+    category: str,
+    main_ingredients: Optional[List[str]] = None,
+    taste_profile: Optional[List[str]] = None,
+    texture: Optional[List[str]] = None,
+    region: Optional[str] = None,
+    selling_points: Optional[List[str]] = None,
+    style: str = "promotional",
+    language: str = "en",
+) -> dict:
+    """Async variant of generate_food_description"""
+    if not llm:
+        return _unconfigured_description(name, category, selling_points)
+
+    chain = FOOD_DESCRIPTION_PROMPT | llm | StrOutputParser()
+
+    try:
+        result = await chain.ainvoke(_description_inputs(
+            name, category, main_ingredients, taste_profile, texture,
+            region, selling_points, style, language
+        ))
+        return _parse_description(result)
+
+    except Exception as e:
+        print(f"Description generation error: {e}")
+        return _fallback_description(
+            name, category, main_ingredients, taste_profile, texture, region, selling_points
+        )
+
+
+def _enhance_inputs(
+    current_description: str,
+    food_name: str,
+    category: str,
+    enhance_for: str,
+    additional_info: Optional[dict],
+) -> dict:
+    enhancement_goals = {
+        "promotional": "Make it more engaging and marketing-focused to drive sales",
+        "seo": "Optimize for search engines while maintaining readability and appeal",
+        "detailed": "Add more sensory details and descriptive language"
+    }
+
+    additional_context = ""
+    if additional_info:
+        additional_context = "\n".join([f"{k}: {v}" for k, v in additional_info.items()])
+
+    return {
+        "food_name": food_name,
+        "category": category,
+        "current_description": current_description,
+        "additional_context": additional_context,
+        "goal": enhancement_goals.get(enhance_for, enhancement_goals["promotional"])
+    }
+
+
+def enhance_food_description(
+    current_description: str,
+    food_name: str,
+    category: str,
+    enhance_for: str = "promotional",
+    additional_info: Optional[dict] = None
+) -> str:
+    """
+    Enhance an existing food description using AI.
+    """
+    if not llm:
+        return current_description
+
+    chain = ENHANCE_DESCRIPTION_PROMPT | llm | StrOutputParser()
+
+    try:
+        enhanced = chain.invoke(_enhance_inputs(
+            current_description, food_name, category, enhance_for, additional_info
+        ))
+        return enhanced.strip()
+    except Exception as e:
+        print(f"Enhancement error: {e}")
+        return current_description
+
+
+async def aenhance_food_description(
+    current_description: str,
+    food_name: str,
+    category: str,
+    enhance_for: str = "promotional",
+    additional_info: Optional[dict] = None
+) -> str:
+    """Async variant of enhance_food_description"""
+    if not llm:
+        return current_description
+
+    chain = ENHANCE_DESCRIPTION_PROMPT | llm | StrOutputParser()
+
     try:
-        enhanced = chain.invoke({
-            "food_name": food_name,
-            "category": category,
-            "current_description": current_description,
-            "additional_context": additional_context,
-            "goal": goal
-        })
+        enhanced = await chain.ainvoke(_enhance_inputs(
+            current_description, food_name, category, enhance_for, additional_info
+        ))
         return enhanced.strip()
     except Exception as e:
         print(f"Enhancement error: {e}")
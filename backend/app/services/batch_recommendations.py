@@ -0,0 +1,219 @@
+"""
+Personalized recommendations for many users at once.
+
+Instead of one profile lookup and one kNN query per user, profiles for a chunk
+of users are read with a single set-based statement and scored against an
+in-process catalog matrix with one matrix multiply; the top-k per user comes
+from `argpartition`. Results are produced lazily, one dict per user, so they
+can be streamed as JSON Lines.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import and_, case, func, or_, select, union_all
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.food import Food
+from app.models.user import User
+from app.models.user_food_history import UserFoodHistory
+from app.models.user_profile import UserProfile
+from app.services import ai_service
+from app.services.embedding_cache import as_array
+from app.services.user_profile_service import LIKED_RATING_THRESHOLD
+
+
+class CatalogMatrix:
+    """Every embedded food as a row-normalized float32 matrix, rows ordered by food id"""
+
+    def __init__(self, food_ids: np.ndarray, matrix: np.ndarray):
+        self.food_ids = food_ids
+        self.matrix = matrix
+        self.loaded_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.food_ids)
+
+    def positions(self, food_ids: Sequence[int]) -> np.ndarray:
+        """Row positions of the given food ids; ids not in the catalog are dropped"""
+        ids = np.asarray(food_ids, dtype=np.int64)
+        pos = np.searchsorted(self.food_ids, ids)
+        pos = np.clip(pos, 0, max(len(self.food_ids) - 1, 0))
+        return pos[self.food_ids[pos] == ids] if len(self.food_ids) else pos[:0]
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def load_catalog_matrix(db: Session) -> CatalogMatrix:
+    rows = db.execute(
+        select(Food.id, Food.embedding).where(ai_service.current_embedding(Food)).order_by(Food.id)
+    ).all()
+    if not rows:
+        return CatalogMatrix(np.empty(0, dtype=np.int64),
+                             np.empty((0, settings.EMBEDDING_DIMENSIONS), dtype=np.float32))
+    food_ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    matrix = np.stack([as_array(r[1]) for r in rows])
+    return CatalogMatrix(food_ids, _normalize_rows(matrix))
+
+
+_catalog: Optional[CatalogMatrix] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog_matrix(db: Session) -> CatalogMatrix:
+    """Process-wide catalog matrix, reloaded after CATALOG_MATRIX_TTL_SECONDS"""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None or time.monotonic() - _catalog.loaded_at > settings.CATALOG_MATRIX_TTL_SECONDS:
+            _catalog = load_catalog_matrix(db)
+        return _catalog
+
+
+def _profiles_stmt(user_ids: Sequence[int]):
+    """
+    Profile vectors for many users in one statement: the stored user_profiles
+    vector where one was built from the current embedding model (liked mean, else
+    the mean over all interactions),
+    otherwise the same means aggregated from history with GROUP BY.
+    """
+    has_current_profile = and_(
+        or_(UserProfile.liked_count > 0, UserProfile.all_count > 0),
+        ai_service.current_model(UserProfile.embedding_model)
+    )
+    stored = select(
+        UserProfile.user_id.label("user_id"),
+        case((UserProfile.liked_count > 0, UserProfile.liked_embedding),
+             else_=UserProfile.all_embedding).label("v")
+    ).where(
+        UserProfile.user_id.in_(user_ids),
+        has_current_profile
+    )
+
+    # One row per (user, food) so both means are over distinct foods, like the stored profiles
+    targets = select(
+        UserFoodHistory.user_id,
+        UserFoodHistory.food_id,
+        func.bool_or(UserFoodHistory.rating >= LIKED_RATING_THRESHOLD).label("liked")
+    ).where(
+        UserFoodHistory.user_id.in_(user_ids),
+        ~select(UserProfile.user_id).where(
+            UserProfile.user_id == UserFoodHistory.user_id,
+            has_current_profile
+        ).exists()
+    ).group_by(UserFoodHistory.user_id, UserFoodHistory.food_id).subquery()
+
+    liked_avg = func.avg(Food.embedding, type_=Food.embedding.type).filter(targets.c.liked)
+    all_avg = func.avg(Food.embedding, type_=Food.embedding.type)
+    computed = select(
+        targets.c.user_id.label("user_id"),
+        func.coalesce(liked_avg, all_avg, type_=Food.embedding.type).label("v")
+    ).join(
+        Food, Food.id == targets.c.food_id
+    ).where(
+        ai_service.current_embedding(Food)
+    ).group_by(targets.c.user_id)
+
+    return union_all(stored, computed)
+
+
+def _load_chunk(db: Session, user_ids: Sequence[int]):
+    profiles = {
+        user_id: as_array(vector)
+        for user_id, vector in db.execute(_profiles_stmt(user_ids)).all()
+        if vector is not None
+    }
+    seen: Dict[int, List[int]] = {}
+    for user_id, food_id in db.execute(
+        select(UserFoodHistory.user_id, UserFoodHistory.food_id).where(
+            UserFoodHistory.user_id.in_(list(profiles))
+        )
+    ).all():
+        seen.setdefault(user_id, []).append(food_id)
+    return profiles, seen
+
+
+def _score_chunk(catalog: CatalogMatrix, user_ids: Sequence[int],
+                 profiles: Dict[int, np.ndarray], seen: Dict[int, List[int]],
+                 limit: int) -> List[dict]:
+    scored_ids = [u for u in user_ids if u in profiles]
+    top: Dict[int, List[dict]] = {}
+
+    if scored_ids and len(catalog):
+        # Cosine similarity of every profile against every food in one GEMM
+        queries = _normalize_rows(np.stack([profiles[u] for u in scored_ids]))
+        scores = queries @ catalog.matrix.T
+
+        for row, user_id in enumerate(scored_ids):
+            if seen.get(user_id):
+                scores[row, catalog.positions(seen[user_id])] = -np.inf
+
+        k = min(limit, len(catalog))
+        if k < len(catalog):
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.tile(np.arange(len(catalog)), (len(scored_ids), 1))
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1)
+
+        for row, user_id in enumerate(scored_ids):
+            top[user_id] = [
+                {"food_id": int(catalog.food_ids[candidates[row, i]]), "score": round(float(candidate_scores[row, i]), 6)}
+                for i in order[row]
+                if np.isfinite(candidate_scores[row, i])
+            ]
+
+    return [{"user_id": user_id, "recommendations": top.get(user_id, [])} for user_id in user_ids]
+
+
+def _all_user_ids(db: Session, chunk_size: int) -> Iterator[List[int]]:
+    # Keyset pagination over users so 50k ids are never held in one list
+    last_id = 0
+    while True:
+        ids = db.execute(
+            select(User.id).where(User.id > last_id).order_by(User.id).limit(chunk_size)
+        ).scalars().all()
+        if not ids:
+            return
+        yield list(ids)
+        last_id = ids[-1]
+
+
+def _chunks(user_ids: Sequence[int], chunk_size: int) -> Iterator[List[int]]:
+    for i in range(0, len(user_ids), chunk_size):
+        yield list(user_ids[i:i + chunk_size])
+
+
+def iter_batch_recommendations(db: Session, user_ids: Optional[Sequence[int]] = None,
+                               limit: int = 10, chunk_size: Optional[int] = None,
+                               workers: Optional[int] = None) -> Iterator[dict]:
+    """
+    Yield {"user_id": ..., "recommendations": [{"food_id": ..., "score": ...}]}
+    for each user (every user when `user_ids` is None), in input order.
+
+    Foods the user already has in their history are excluded. Users without a
+    usable profile get an empty list rather than random picks.
+    Chunks are scored on a thread pool (NumPy releases the GIL) while the next
+    chunk is read from Postgres, keeping at most `workers` chunks in flight.
+    """
+    chunk_size = max(1, chunk_size or settings.BATCH_RECOMMENDATION_CHUNK_SIZE)
+    workers = max(1, workers or settings.BATCH_RECOMMENDATION_WORKERS)
+    catalog = get_catalog_matrix(db)
+    chunks = _all_user_ids(db, chunk_size) if user_ids is None else _chunks(list(user_ids), chunk_size)
+
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for chunk in chunks:
+            profiles, seen = _load_chunk(db, chunk)
+            in_flight.append(executor.submit(_score_chunk, catalog, chunk, profiles, seen, limit))
+            while len(in_flight) >= workers:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
@@ -0,0 +1,215 @@
+"""
+Store-in-city badges: the share of a city's valid stores a client has reviewed.
+
+Everything comes from one grouped query: the users' distinct reviewed stores
+joined to stores and to the trigger-maintained city_store_counts totals, so the
+cost no longer grows with the number of cities a user has reviewed in.
+
+`recompute_all_badges` runs the same aggregate for every client in batches and
+writes them with INSERT ... ON CONFLICT (client_id) DO UPDATE. In incremental
+mode only clients who reviewed a store in a city whose total changed since the
+previous run are recomputed.
+"""
+from datetime import timedelta
+from itertools import groupby
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import cast, func, literal_column, or_, select, union
+from sqlalchemy.dialects.postgresql import JSONB, aggregate_order_by, insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.city_store_count import CityStoreCount
+from app.models.client_badge import ClientBadge
+from app.models.client_badge_run import ClientBadgeRun
+from app.models.review import Review
+from app.models.store import Store
+
+# Stores without a city are grouped under this name (and have no city total)
+UNKNOWN_CITY = "Unknown"
+
+MODE_FULL = "full"
+MODE_INCREMENTAL = "incremental"
+
+_city = func.coalesce(Store.city, UNKNOWN_CITY)
+
+
+def _badges_stmt(user_ids: Sequence[int]):
+    """One row per (user, city) the users reviewed a valid store in, ordered by user"""
+    reviewed = select(Review.user_id, Review.store_id).where(
+        Review.user_id.in_(user_ids),
+        Review.store_id.isnot(None)
+    ).distinct().subquery()
+
+    return select(
+        reviewed.c.user_id,
+        _city.label("city"),
+        func.count().label("reviewed_count"),
+        func.coalesce(func.max(CityStoreCount.valid_store_count), 0).label("total_stores"),
+        func.array_agg(aggregate_order_by(Store.id, Store.id)).label("store_ids"),
+        func.json_agg(aggregate_order_by(
+            func.json_build_object(
+                literal_column("'id'"), Store.id,
+                literal_column("'name'"), Store.name,
+                literal_column("'address'"), Store.address,
+            ),
+            Store.id,
+        )).label("reviewed_stores"),
+    ).join(
+        Store, Store.id == reviewed.c.store_id
+    ).outerjoin(
+        CityStoreCount, CityStoreCount.city == _city
+    ).where(
+        Store.is_valid_store.is_(True)
+    ).group_by(reviewed.c.user_id, _city).order_by(reviewed.c.user_id)
+
+
+def _to_badges(rows) -> Tuple[list, List[int]]:
+    badges = []
+    store_ids: List[int] = []
+    for row in rows:
+        total = row.total_stores
+        badges.append({
+            "city": row.city,
+            "badge_percentage": round(row.reviewed_count / total * 100, 2) if total > 0 else 0,
+            "reviewed_count": row.reviewed_count,
+            "total_stores": total,
+            "reviewed_stores": row.reviewed_stores,
+        })
+        store_ids.extend(row.store_ids)
+
+    badges.sort(key=lambda b: (-b["badge_percentage"], b["city"]))
+    return badges, sorted(store_ids)
+
+
+def compute_badges_for_users(db: Session, user_ids: Sequence[int]) -> Dict[int, Tuple[list, List[int]]]:
+    """(badges, valid reviewed store ids) per user; users with no valid reviewed store get ([], [])"""
+    result = {user_id: ([], []) for user_id in user_ids}
+    rows = db.execute(_badges_stmt(user_ids)).all()
+    for user_id, user_rows in groupby(rows, key=lambda r: r.user_id):
+        result[user_id] = _to_badges(user_rows)
+    return result
+
+
+def compute_city_badges(db: Session, user_id: int):
+    """
+    Badges for every city the user reviewed a valid store in, highest
+    percentage first, plus the ids of those valid stores.
+    Badge percentage = reviewed valid stores in city / valid stores in city * 100.
+    """
+    return compute_badges_for_users(db, [user_id])[user_id]
+
+
+def _upsert_stmt(values: List[dict]):
+    stmt = insert(ClientBadge).values(values)
+    return stmt.on_conflict_do_update(
+        index_elements=[ClientBadge.client_id],
+        set_={"badges": stmt.excluded.badges, "reviewed_stores_id": stmt.excluded.reviewed_stores_id},
+        # json has no equality operator; compare as jsonb so unchanged rows aren't rewritten
+        where=or_(
+            cast(ClientBadge.badges, JSONB) != cast(stmt.excluded.badges, JSONB),
+            cast(ClientBadge.reviewed_stores_id, JSONB) != cast(stmt.excluded.reviewed_stores_id, JSONB),
+        ),
+    )
+
+
+def upsert_client_badges(db: Session, badges_by_user: Dict[int, Tuple[list, List[int]]]) -> int:
+    """Write many users' badges in one statement; returns how many rows were inserted or changed"""
+    if not badges_by_user:
+        return 0
+    values = [
+        {"client_id": user_id, "badges": badges, "reviewed_stores_id": store_ids}
+        for user_id, (badges, store_ids) in badges_by_user.items()
+    ]
+    return db.execute(_upsert_stmt(values)).rowcount
+
+
+def save_client_badges(db: Session, user_id: int, badges: list, store_ids: List[int]) -> None:
+    """Store the user's badges, leaving the row untouched when nothing changed"""
+    upsert_client_badges(db, {user_id: (badges, store_ids)})
+    db.commit()
+
+
+# ---------- bulk recompute ----------
+
+def _all_clients_stmt():
+    # Anyone who reviewed a store, plus anyone holding badges that may now be empty
+    return union(
+        select(Review.user_id.label("user_id")).where(Review.store_id.isnot(None)),
+        select(ClientBadge.client_id.label("user_id")),
+    ).subquery()
+
+
+def _clients_in_cities_stmt(cities: Sequence[str]):
+    return select(Review.user_id.label("user_id")).join(
+        Store, Store.id == Review.store_id
+    ).where(_city.in_(cities)).distinct().subquery()
+
+
+def _user_id_batches(db: Session, clients, batch_size: int) -> Iterator[List[int]]:
+    # Keyset over user ids so the full client list is never held in memory
+    last_id = 0
+    while True:
+        ids = db.execute(
+            select(clients.c.user_id).where(clients.c.user_id > last_id)
+            .order_by(clients.c.user_id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return
+        yield list(ids)
+        last_id = ids[-1]
+
+
+def _last_finished_run(db: Session) -> Optional[ClientBadgeRun]:
+    return db.query(ClientBadgeRun).filter(
+        ClientBadgeRun.finished_at.isnot(None)
+    ).order_by(ClientBadgeRun.started_at.desc()).first()
+
+
+def _changed_cities(db: Session, since) -> List[str]:
+    since = since - timedelta(seconds=settings.CLIENT_BADGE_WATERMARK_OVERLAP_SECONDS)
+    return list(db.execute(
+        select(CityStoreCount.city).where(CityStoreCount.updated_at >= since)
+    ).scalars().all())
+
+
+def recompute_all_badges(db: Session, incremental: bool = False, batch_size: Optional[int] = None) -> dict:
+    """
+    Recompute and upsert badges for every client, or with `incremental` only for
+    clients with a reviewed store in a city whose valid-store total changed
+    since the last finished run (the first run is always full).
+    Commits once per batch; returns a summary of the run.
+    """
+    batch_size = max(1, batch_size or settings.CLIENT_BADGE_BATCH_SIZE)
+    previous = _last_finished_run(db) if incremental else None
+    mode = MODE_INCREMENTAL if previous else MODE_FULL
+
+    run = ClientBadgeRun(mode=mode, clients_updated=0)
+    db.add(run)
+    db.commit()
+
+    cities: Optional[List[str]] = None
+    if mode == MODE_INCREMENTAL:
+        cities = _changed_cities(db, previous.started_at)
+        run.cities_changed = len(cities)
+        clients = _clients_in_cities_stmt(cities) if cities else None
+    else:
+        clients = _all_clients_stmt()
+
+    clients_seen = 0
+    if clients is not None:
+        for user_ids in _user_id_batches(db, clients, batch_size):
+            run.clients_updated += upsert_client_badges(db, compute_badges_for_users(db, user_ids))
+            clients_seen += len(user_ids)
+            db.commit()
+
+    run.finished_at = func.now()
+    db.commit()
+
+    return {
+        "run_id": run.id,
+        "mode": mode,
+        "cities_changed": run.cities_changed,
+        "clients_checked": clients_seen,
+        "clients_updated": run.clients_updated,
+    }
@@ -0,0 +1,245 @@
+import asyncio
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.core.metrics import CACHE_LOOKUPS
+from app.core.database import SessionLocal
+from app.models.embedding_cache import EmbeddingCacheEntry
+
+# Stats counter -> `result` label of cache_lookups_total
+_LOOKUP_RESULTS = {"memory_hits": "memory_hit", "db_hits": "db_hit", "misses": "miss"}
+
+
+def normalize_text(text_content: str) -> str:
+    """Normalize text so that trivially different inputs share one cache entry"""
+    return " ".join(unicodedata.normalize("NFC", text_content).split())
+
+
+def make_cache_key(model: str, normalized_text: str) -> str:
+    """Content address of an embedding: sha256 over model name and normalized text"""
+    return hashlib.sha256(f"{model}\x00{normalized_text}".encode("utf-8")).hexdigest()
+
+
+def as_array(embedding) -> np.ndarray:
+    """float32 array from a list, a vector column value or a halfvec column value (HalfVector)"""
+    if hasattr(embedding, "to_numpy"):
+        embedding = embedding.to_numpy()
+    return np.asarray(embedding, dtype=np.float32)
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache.
+
+    Tier 1 is an in-process LRU holding float32 arrays, tier 2 is the
+    `embedding_cache` table shared by every worker. Both tiers expire entries
+    after `ttl_seconds`; the LRU is capped at `max_size` entries and the table
+    at `db_max_rows` rows (oldest rows are pruned first).
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl_seconds: int,
+        db_enabled: bool = True,
+        db_max_rows: int = 200_000,
+        db_prune_every: int = 500,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.db_enabled = db_enabled
+        self.db_max_rows = db_max_rows
+        self.db_prune_every = db_prune_every
+
+        self._entries: "OrderedDict[str, Tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_writes = 0
+        self._stats: Dict[str, int] = {
+            "memory_hits": 0,
+            "db_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+        }
+
+    # ---------- public API ----------
+
+    def get(self, key: str) -> Optional[List[float]]:
+        vector = self._memory_get(key)
+        if vector is not None:
+            self._incr("memory_hits")
+            return vector.tolist()
+
+        if self.db_enabled:
+            vector = self._db_get(key)
+            if vector is not None:
+                self._incr("db_hits")
+                self._memory_put(key, vector)
+                return vector.tolist()
+
+        self._incr("misses")
+        return None
+
+    def put(self, key: str, model: str, embedding: List[float]) -> None:
+        vector = as_array(embedding)
+        self._memory_put(key, vector)
+        if self.db_enabled:
+            self._db_put(key, model, vector)
+
+    async def aget(self, key: str) -> Optional[List[float]]:
+        """Async lookup: memory tier inline, Postgres tier off the event loop"""
+        vector = self._memory_get(key)
+        if vector is not None:
+            self._incr("memory_hits")
+            return vector.tolist()
+        if self.db_enabled:
+            vector = await asyncio.to_thread(self._db_get, key)
+            if vector is not None:
+                self._incr("db_hits")
+                self._memory_put(key, vector)
+                return vector.tolist()
+        self._incr("misses")
+        return None
+
+    async def aput(self, key: str, model: str, embedding: List[float]) -> None:
+        vector = as_array(embedding)
+        self._memory_put(key, vector)
+        if self.db_enabled:
+            await asyncio.to_thread(self._db_put, key, model, vector)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats: Dict[str, float] = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+        stats["hit_rate"] = (
+            (stats["memory_hits"] + stats["db_hits"]) / lookups if lookups else 0.0
+        )
+        return stats
+
+    def prune_db(self) -> int:
+        """Delete expired rows and trim the table down to `db_max_rows`"""
+        db = SessionLocal()
+        try:
+            cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+            deleted = db.execute(
+                delete(EmbeddingCacheEntry).where(EmbeddingCacheEntry.created_at < cutoff)
+            ).rowcount or 0
+
+            overflow = (db.scalar(select(func.count()).select_from(EmbeddingCacheEntry)) or 0) - self.db_max_rows
+            if overflow > 0:
+                oldest = (
+                    select(EmbeddingCacheEntry.key)
+                    .order_by(EmbeddingCacheEntry.created_at)
+                    .limit(overflow)
+                    .scalar_subquery()
+                )
+                deleted += db.execute(
+                    delete(EmbeddingCacheEntry).where(EmbeddingCacheEntry.key.in_(oldest))
+                ).rowcount or 0
+
+            db.commit()
+            return deleted
+        except Exception as e:
+            print(f"Embedding cache prune error: {e}")
+            db.rollback()
+            return 0
+        finally:
+            db.close()
+
+    # ---------- tier 1: in-process LRU ----------
+
+    def _incr(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+        if name in _LOOKUP_RESULTS:
+            CACHE_LOOKUPS.labels("embedding", _LOOKUP_RESULTS[name]).inc()
+
+    def _memory_get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, vector = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return vector
+
+    def _memory_put(self, key: str, vector: np.ndarray) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    # ---------- tier 2: Postgres ----------
+
+    def _db_get(self, key: str) -> Optional[np.ndarray]:
+        db = SessionLocal()
+        try:
+            cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+            embedding = db.scalar(
+                select(EmbeddingCacheEntry.embedding).where(
+                    EmbeddingCacheEntry.key == key,
+                    EmbeddingCacheEntry.created_at >= cutoff,
+                )
+            )
+            return None if embedding is None else as_array(embedding)
+        except Exception as e:
+            print(f"Embedding cache read error: {e}")
+            return None
+        finally:
+            db.close()
+
+    def _db_put(self, key: str, model: str, vector: np.ndarray) -> None:
+        db = SessionLocal()
+        try:
+            stmt = insert(EmbeddingCacheEntry).values(
+                key=key, model=model, embedding=vector, created_at=datetime.utcnow()
+            )
+            db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[EmbeddingCacheEntry.key],
+                    set_={"embedding": stmt.excluded.embedding, "created_at": stmt.excluded.created_at},
+                )
+            )
+            db.commit()
+        except Exception as e:
+            print(f"Embedding cache write error: {e}")
+            db.rollback()
+            return
+        finally:
+            db.close()
+
+        with self._lock:
+            self._db_writes += 1
+            should_prune = self.db_prune_every > 0 and self._db_writes % self.db_prune_every == 0
+        if should_prune:
+            self.prune_db()
+
+
+embedding_cache = EmbeddingCache(
+    max_size=settings.EMBEDDING_CACHE_MAX_SIZE,
+    ttl_seconds=settings.EMBEDDING_CACHE_TTL_SECONDS,
+    db_enabled=settings.EMBEDDING_CACHE_DB_ENABLED,
+    db_max_rows=settings.EMBEDDING_CACHE_DB_MAX_ROWS,
+    db_prune_every=settings.EMBEDDING_CACHE_DB_PRUNE_EVERY,
+)
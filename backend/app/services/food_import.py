@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# Columns holding lists; in CSV they are either a JSON array or ';'-separated values
+LIST_FIELDS = ("main_ingredients", "taste_profile", "texture", "mood_tags")
+
+SUPPORTED_FORMATS = ("csv", "jsonl")
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    """Guess the upload format from the file name, then the content type"""
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+
+    content_type = (content_type or "").lower()
+    if "csv" in content_type:
+        return "csv"
+    if "ndjson" in content_type or "jsonl" in content_type or "json-lines" in content_type:
+        return "jsonl"
+    return None
+
+
+def _parse_list(value: str) -> List[str]:
+    value = value.strip()
+    if value.startswith("["):
+        return json.loads(value)
+    return [item.strip() for item in value.split(";") if item.strip()]
+
+
+def _clean_csv_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    cleaned: Dict[str, Any] = {}
+    for key, value in row.items():
+        if key is None:
+            continue
+        key = key.strip()
+        if isinstance(value, str):
+            value = value.strip()
+        # Empty cells fall back to schema defaults
+        if value in ("", None):
+            continue
+        if key in LIST_FIELDS:
+            value = _parse_list(value)
+        cleaned[key] = value
+    return cleaned
+
+
+def parse_rows(content: bytes, fmt: str) -> List[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """
+    Parse an uploaded CSV or JSON Lines file.
+    Returns (row_number, raw_row, parse_error) tuples; exactly one of raw_row / parse_error is set.
+    Raises csv.Error when the CSV itself is malformed (e.g. a field over the size
+    limit); the reader cannot resume after it.
+    """
+    text_content = content.decode("utf-8-sig")
+    rows: List[Tuple[int, Optional[Dict[str, Any]], Optional[str]]] = []
+
+    if fmt == "jsonl":
+        for row_number, line in enumerate(text_content.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+                if not isinstance(data, dict):
+                    raise ValueError("each line must be a JSON object")
+                rows.append((row_number, data, None))
+            except ValueError as e:
+                rows.append((row_number, None, f"Invalid JSON: {e}"))
+        return rows
+
+    reader = csv.DictReader(io.StringIO(text_content))
+    # Row 1 is the header, so data rows start at 2
+    for row_number, row in enumerate(reader, 2):
+        try:
+            rows.append((row_number, _clean_csv_row(row), None))
+        except ValueError as e:
+            rows.append((row_number, None, f"Invalid list value: {e}"))
+    return rows
+
+
+def format_validation_error(errors: List[Dict[str, Any]]) -> str:
+    """Flatten pydantic errors into one readable line"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err.get('loc', ())) or 'row'}: {err.get('msg')}"
+        for err in errors
+    )
@@ -0,0 +1,226 @@
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.food import Food
+from app.models.job import Job
+from app.models.review import Review
+from app.models.store import Store
+from app.services import ai_service, client_badges, job_queue, review_analysis
+from app.services.response_cache import FOODS, STORES, response_cache
+
+EMBED_FOOD = "embed_food"
+EMBED_STORE = "embed_store"
+EMBED_REVIEW = "embed_review"
+GENERATE_FOOD_DESCRIPTION = "generate_food_description"
+ENHANCE_FOOD_DESCRIPTION = "enhance_food_description"
+RECOMPUTE_CLIENT_BADGES = "recompute_client_badges"
+
+
+# ---------- embeddings (batched) ----------
+
+def _embed_rows(db: Session, jobs: List[Job], model, id_key: str, text_for: Callable) -> None:
+    ids = [job.payload[id_key] for job in jobs]
+    rows = {row.id: row for row in db.scalars(select(model).where(model.id.in_(ids)))}
+
+    targets = []
+    for job in jobs:
+        row = rows.get(job.payload[id_key])
+        if row is None:
+            # Deleted before the worker got to it; nothing left to embed
+            job_queue.complete(db, job, {"skipped": "row no longer exists"})
+        else:
+            targets.append((job, row))
+
+    # One batched embed_documents round trip per EMBEDDING_BATCH_SIZE rows
+    vectors = ai_service.generate_embeddings([text_for(row) for _, row in targets]) if targets else []
+
+    for (job, row), vector in zip(targets, vectors):
+        if vector is None:
+            # Provider failed for this batch; retry later
+            if job_queue.fail(db, job, "embedding provider returned no vector"):
+                # An older vector stays searchable, so the row is stale rather than failed
+                row.embedding_status = "stale" if row.embedding is not None else "failed"
+            continue
+        for field, value in ai_service.embedding_columns(vector).items():
+            setattr(row, field, value)
+        job_queue.complete(db, job)
+
+    db.commit()
+
+
+def food_embedding_text(food: Food) -> str:
+    return ai_service.build_food_embedding_text({
+        "name": food.name,
+        "description": food.description,
+        "category": food.category,
+        "main_ingredients": food.main_ingredients,
+        "taste_profile": food.taste_profile,
+        "texture": food.texture,
+        "mood_tags": food.mood_tags,
+    })
+
+
+def store_embedding_text(store: Store) -> str:
+    return ai_service.build_store_embedding_text(store.name, store.description, store.address)
+
+
+def review_embedding_text(review: Review) -> str:
+    return review.comment
+
+
+def embed_foods(db: Session, jobs: List[Job]) -> None:
+    _embed_rows(db, jobs, Food, "food_id", food_embedding_text)
+
+
+def embed_stores(db: Session, jobs: List[Job]) -> None:
+    _embed_rows(db, jobs, Store, "store_id", store_embedding_text)
+
+
+def embed_reviews(db: Session, jobs: List[Job]) -> None:
+    _embed_rows(db, jobs, Review, "review_id", review_embedding_text)
+    # Classify the newly embedded reviews; any left over are picked up by init/analyze_reviews.py
+    review_analysis.analyze_reviews(db, [job.payload["review_id"] for job in jobs])
+    db.commit()
+
+
+# ---------- AI descriptions (one LLM call per job) ----------
+
+def _run_each(db: Session, jobs: List[Job], handler: Callable[[Session, Job], dict]) -> None:
+    for job in jobs:
+        try:
+            job_queue.complete(db, job, handler(db, job))
+        except Exception as e:
+            print(f"Job {job.id} ({job.kind}) failed: {e}")
+            db.rollback()
+            job = db.get(Job, job.id)
+            job_queue.fail(db, job, str(e))
+        db.commit()
+
+
+def _load_food(db: Session, job: Job) -> Food:
+    food = db.get(Food, job.payload["food_id"])
+    if food is None:
+        raise ValueError(f"Food {job.payload['food_id']} not found")
+    return food
+
+
+def _food_fields(food: Food) -> dict:
+    # Plain values survive the commit below (it expires ORM attributes)
+    return {
+        "name": food.name,
+        "category": food.category,
+        "description": food.description,
+        "main_ingredients": food.main_ingredients or [],
+        "taste_profile": food.taste_profile or [],
+        "texture": food.texture or [],
+    }
+
+
+def _generate_description(db: Session, job: Job) -> dict:
+    fields = _food_fields(_load_food(db, job))
+    # Release the connection while waiting on the LLM
+    db.commit()
+
+    result = ai_service.generate_food_description(
+        name=fields["name"],
+        category=fields["category"],
+        main_ingredients=fields["main_ingredients"],
+        taste_profile=fields["taste_profile"],
+        texture=fields["texture"],
+        region=None,
+        selling_points=None,
+        style="promotional",
+        language="en"
+    )
+
+    if result.get("short_description"):
+        food = _load_food(db, job)
+        food.description = result["short_description"]
+    return result
+
+
+def _enhance_description(db: Session, job: Job) -> dict:
+    fields = _food_fields(_load_food(db, job))
+    db.commit()
+
+    enhanced = ai_service.enhance_food_description(
+        current_description=fields["description"] or f"{fields['name']} - {fields['category']}",
+        food_name=fields["name"],
+        category=fields["category"],
+        enhance_for="promotional",
+        additional_info=None
+    )
+
+    food = _load_food(db, job)
+    food.enhanced_description = enhanced
+    return {"enhanced_description": enhanced}
+
+
+def generate_food_descriptions(db: Session, jobs: List[Job]) -> None:
+    _run_each(db, jobs, _generate_description)
+
+
+def enhance_food_descriptions(db: Session, jobs: List[Job]) -> None:
+    _run_each(db, jobs, _enhance_description)
+
+
+# ---------- client badges ----------
+
+def _recompute_badges(db: Session, job: Job) -> dict:
+    return client_badges.recompute_all_badges(db, incremental=bool(job.payload.get("incremental")))
+
+
+def recompute_client_badges(db: Session, jobs: List[Job]) -> None:
+    _run_each(db, jobs, _recompute_badges)
+
+
+HANDLERS: Dict[str, Callable[[Session, List[Job]], None]] = {
+    EMBED_FOOD: embed_foods,
+    EMBED_STORE: embed_stores,
+    EMBED_REVIEW: embed_reviews,
+    GENERATE_FOOD_DESCRIPTION: generate_food_descriptions,
+    ENHANCE_FOOD_DESCRIPTION: enhance_food_descriptions,
+    RECOMPUTE_CLIENT_BADGES: recompute_client_badges,
+}
+
+# Cached catalog entity (namespace, payload id key) a kind's handler can change
+INVALIDATES = {
+    EMBED_FOOD: (FOODS, "food_id"),
+    EMBED_STORE: (STORES, "store_id"),
+    GENERATE_FOOD_DESCRIPTION: (FOODS, "food_id"),
+    ENHANCE_FOOD_DESCRIPTION: (FOODS, "food_id"),
+}
+
+
+def run_jobs(db: Session, jobs: List[Job]) -> None:
+    """Dispatch claimed jobs to their handlers, grouped by kind so embeddings batch"""
+    by_kind: Dict[str, List[Job]] = defaultdict(list)
+    for job in jobs:
+        by_kind[job.kind].append(job)
+
+    for kind, kind_jobs in by_kind.items():
+        handler = HANDLERS.get(kind)
+        if handler is None:
+            for job in kind_jobs:
+                # Retrying cannot help, fail on the first attempt
+                job.max_attempts = job.attempts
+                job_queue.fail(db, job, f"Unknown job kind: {kind}")
+            db.commit()
+            continue
+        try:
+            handler(db, kind_jobs)
+            if kind in INVALIDATES:
+                namespace, id_key = INVALIDATES[kind]
+                for job in kind_jobs:
+                    response_cache.invalidate_entity(namespace, job.payload[id_key])
+        except Exception as e:
+            print(f"Error running {kind} jobs: {e}")
+            db.rollback()
+            for job in kind_jobs:
+                job = db.get(Job, job.id)
+                if job is not None and job.status == job_queue.RUNNING:
+                    job_queue.fail(db, job, str(e))
+            db.commit()
@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta
+from typing import Any, Iterable, List, Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.job import Job
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def _new_job(kind: str, payload: dict, user_id: Optional[int], run_after: Optional[datetime]) -> Job:
+    return Job(
+        kind=kind,
+        payload=payload,
+        status=PENDING,
+        attempts=0,
+        max_attempts=settings.JOB_MAX_ATTEMPTS,
+        user_id=user_id,
+        run_after=run_after or datetime.utcnow(),
+    )
+
+
+def enqueue(db: Session, kind: str, payload: dict, user_id: Optional[int] = None,
+            run_after: Optional[datetime] = None) -> Job:
+    """
+    Add a job to the caller's transaction. Nothing runs until the caller commits,
+    so a job never refers to a row that was rolled back.
+    """
+    job = _new_job(kind, payload, user_id, run_after)
+    db.add(job)
+    db.flush()
+    return job
+
+
+def enqueue_many(db: Session, kind: str, payloads: Iterable[dict], user_id: Optional[int] = None) -> List[Job]:
+    """enqueue for many payloads of one kind, flushed together"""
+    jobs = [_new_job(kind, payload, user_id, None) for payload in payloads]
+    db.add_all(jobs)
+    db.flush()
+    return jobs
+
+
+async def aenqueue(db: AsyncSession, kind: str, payload: dict, user_id: Optional[int] = None,
+                   run_after: Optional[datetime] = None) -> Job:
+    """Async variant of enqueue"""
+    job = _new_job(kind, payload, user_id, run_after)
+    db.add(job)
+    await db.flush()
+    return job
+
+
+def claim_batch(db: Session, worker_id: str, limit: int, kinds: Optional[Iterable[str]] = None) -> List[Job]:
+    """
+    Atomically claim up to `limit` runnable jobs for this worker and commit the claim.
+    FOR UPDATE SKIP LOCKED lets any number of workers poll the same table without
+    blocking each other or claiming a job twice. Jobs left `running` by a worker that
+    died are reclaimed after JOB_LOCK_TIMEOUT_SECONDS, or failed for good once that
+    claim already used their last attempt.
+    """
+    now = datetime.utcnow()
+    stale_before = now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT_SECONDS)
+    lock_expired = (Job.status == RUNNING) & (Job.locked_at < stale_before)
+
+    db.execute(
+        update(Job)
+        .where(lock_expired, Job.attempts >= Job.max_attempts)
+        .values(
+            status=FAILED,
+            last_error="worker lock expired on the last attempt",
+            locked_at=None,
+            locked_by=None,
+            updated_at=now,
+        )
+    )
+
+    runnable = select(Job.id).where(
+        or_(
+            (Job.status == PENDING) & (Job.run_after <= now),
+            lock_expired & (Job.attempts < Job.max_attempts),
+        )
+    )
+    if kinds:
+        runnable = runnable.where(Job.kind.in_(list(kinds)))
+    runnable = runnable.order_by(Job.id).limit(limit).with_for_update(skip_locked=True)
+
+    claimed_ids = db.scalars(
+        update(Job)
+        .where(Job.id.in_(runnable.scalar_subquery()))
+        .values(
+            status=RUNNING,
+            locked_at=now,
+            locked_by=worker_id,
+            attempts=Job.attempts + 1,
+            updated_at=now,
+        )
+        .returning(Job.id)
+    ).all()
+    db.commit()
+
+    if not claimed_ids:
+        return []
+    return list(db.scalars(select(Job).where(Job.id.in_(claimed_ids)).order_by(Job.id)).all())
+
+
+def complete(db: Session, job: Job, result: Any = None) -> None:
+    """Mark a job done (caller commits)"""
+    job.status = DONE
+    job.result = result
+    job.last_error = None
+    job.locked_at = None
+    job.locked_by = None
+
+
+def fail(db: Session, job: Job, error: str) -> bool:
+    """
+    Record a failed attempt (caller commits). The job is retried with linear backoff
+    until max_attempts; returns True when it has failed for good.
+    """
+    job.last_error = error[:2000]
+    job.locked_at = None
+    job.locked_by = None
+    if job.attempts >= job.max_attempts:
+        job.status = FAILED
+        return True
+    job.status = PENDING
+    job.run_after = datetime.utcnow() + timedelta(seconds=settings.JOB_RETRY_BACKOFF_SECONDS * job.attempts)
+    return False
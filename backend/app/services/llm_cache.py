@@ -0,0 +1,153 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import CACHE_LOOKUPS
+from app.services.embedding_cache import normalize_text
+
+
+def make_bucket_key(template_version: str, user_context: str, food_ids: Sequence[int]) -> str:
+    """Everything besides the query that the completion depends on"""
+    ids = ",".join(str(food_id) for food_id in food_ids)
+    return hashlib.sha256(f"{template_version}\x00{user_context}\x00{ids}".encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _Entry:
+    bucket: str
+    response: str
+    query_vector: Optional[np.ndarray]
+    stored_at: float
+
+
+class LLMResponseCache:
+    """
+    Cache for LLM completions that are a function of (query, retrieved context).
+
+    Entries live in buckets keyed by prompt template version, user context and
+    the retrieved food ids. A lookup first tries the exact normalized query in
+    its bucket, then any cached query in the same bucket whose embedding has
+    cosine similarity >= `semantic_threshold`. Global LRU capped at `max_size`,
+    entries expire after `ttl_seconds`.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: int, semantic_threshold: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.semantic_threshold = semantic_threshold
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._buckets: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0}
+
+    # ---------- public API ----------
+
+    def get(self, bucket: str, query: str, query_vector: Optional[Sequence[float]] = None) -> Optional[str]:
+        key = self._entry_key(bucket, query)
+        vector = self._unit(query_vector)
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._record("exact_hits", "exact_hit")
+                return entry.response
+
+            if vector is not None and self.semantic_threshold:
+                match = self._nearest(bucket, vector)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self._record("semantic_hits", "semantic_hit")
+                    return self._entries[match].response
+
+            self._record("misses", "miss")
+            return None
+
+    def put(self, bucket: str, query: str, response: str,
+            query_vector: Optional[Sequence[float]] = None) -> None:
+        if self.max_size <= 0 or not response:
+            return
+        key = self._entry_key(bucket, query)
+        with self._lock:
+            if key not in self._entries:
+                self._buckets.setdefault(bucket, []).append(key)
+            self._entries[key] = _Entry(bucket, response, self._unit(query_vector), time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                oldest, _ = next(iter(self._entries.items()))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats: Dict[str, float] = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["exact_hits"] + stats["semantic_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    # ---------- internals (callers hold the lock) ----------
+
+    @staticmethod
+    def _entry_key(bucket: str, query: str) -> str:
+        return hashlib.sha256(f"{bucket}\x00{normalize_text(query).lower()}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _unit(vector: Optional[Sequence[float]]) -> Optional[np.ndarray]:
+        # Zero vectors (embedding failures) never take part in semantic matching
+        if vector is None:
+            return None
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm > 0 else None
+
+    def _live_entry(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry.stored_at > self.ttl_seconds:
+            self._remove(key)
+            return None
+        return entry
+
+    def _nearest(self, bucket: str, vector: np.ndarray) -> Optional[str]:
+        candidates = [
+            key for key in list(self._buckets.get(bucket, []))
+            if (entry := self._live_entry(key)) is not None and entry.query_vector is not None
+        ]
+        if not candidates:
+            return None
+        matrix = np.stack([self._entries[key].query_vector for key in candidates])
+        similarities = matrix @ vector
+        best = int(np.argmax(similarities))
+        return candidates[best] if similarities[best] >= self.semantic_threshold else None
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._buckets.get(entry.bucket)
+        if keys is not None:
+            keys.remove(key)
+            if not keys:
+                del self._buckets[entry.bucket]
+
+    def _record(self, stat: str, result: str) -> None:
+        self._stats[stat] += 1
+        CACHE_LOOKUPS.labels("llm_response", result).inc()
+
+
+llm_response_cache = LLMResponseCache(
+    max_size=settings.LLM_CACHE_MAX_SIZE,
+    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+    semantic_threshold=settings.LLM_CACHE_SEMANTIC_THRESHOLD,
+)
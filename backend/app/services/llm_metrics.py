@@ -0,0 +1,58 @@
+import time
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from app.core.metrics import AI_CALL_ERRORS, AI_CALL_SECONDS, AI_TOKENS
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """
+    LangChain callback recording chat-model latency, token usage and errors,
+    labeled by provider. Attach one instance per chat model via `callbacks=[...]`.
+    """
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self._started: Dict[UUID, float] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        self._observe(run_id)
+        prompt_tokens, completion_tokens = _token_usage(response)
+        if prompt_tokens:
+            AI_TOKENS.labels(self.provider, "prompt").inc(prompt_tokens)
+        if completion_tokens:
+            AI_TOKENS.labels(self.provider, "completion").inc(completion_tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._observe(run_id)
+        AI_CALL_ERRORS.labels(self.provider, "chat").inc()
+
+    def _observe(self, run_id: UUID) -> None:
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            AI_CALL_SECONDS.labels(self.provider, "chat").observe(time.perf_counter() - started)
+
+
+def _token_usage(response: LLMResult) -> Tuple[int, int]:
+    # Chat models put usage on each message; older integrations only fill llm_output
+    prompt_tokens = completion_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage: Optional[Dict[str, Any]] = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                prompt_tokens += usage.get("input_tokens", 0) or 0
+                completion_tokens += usage.get("output_tokens", 0) or 0
+    if prompt_tokens or completion_tokens:
+        return prompt_tokens, completion_tokens
+
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    return token_usage.get("prompt_tokens", 0) or 0, token_usage.get("completion_tokens", 0) or 0
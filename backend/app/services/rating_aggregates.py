@@ -0,0 +1,106 @@
+"""
+Denormalized review aggregates on stores and foods: rating_avg, rating_count and
+rating_histogram (reviews per star, 1..5).
+
+`record_review` bumps them with a single UPDATE ... SET x = x + ... per row, so
+concurrent reviews never lose an increment and list endpoints never run
+AVG(rating) over reviews. `reconcile` recomputes everything from reviews to fix
+drift (seeds, manual edits, float rounding).
+"""
+import math
+from typing import Optional
+
+from sqlalchemy import Integer, and_, cast, func, or_, select, update
+from sqlalchemy.dialects.postgresql import array
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.food import Food
+from app.models.review import Review
+from app.models.store import Store
+
+HISTOGRAM_BUCKETS = 5
+
+
+def rating_bucket(rating: float) -> int:
+    """1-based histogram bucket: the rating rounded half up to whole stars, within 1..5"""
+    return min(HISTOGRAM_BUCKETS, max(1, math.floor(rating + 0.5)))
+
+
+def _rating_bucket_sql(rating):
+    # Must agree with rating_bucket()
+    return func.least(HISTOGRAM_BUCKETS, func.greatest(1, func.floor(rating + 0.5)))
+
+
+def _bump_stmt(model, row_id: int, rating: float):
+    table = model.__table__
+    bucket = rating_bucket(rating)
+    return update(table).where(table.c.id == row_id).values({
+        # Every right-hand side reads the pre-update row, so avg and count stay in step
+        table.c.rating_avg: (func.coalesce(table.c.rating_avg, 0) * table.c.rating_count + rating)
+                            / (table.c.rating_count + 1),
+        table.c.rating_count: table.c.rating_count + 1,
+        table.c.rating_histogram[bucket]: table.c.rating_histogram[bucket] + 1,
+    })
+
+
+def record_review(db: Session, store_id: Optional[int], food_id: Optional[int], rating: float) -> None:
+    """Add one review to its store's and food's aggregates; runs in the caller's transaction"""
+    if store_id:
+        db.execute(_bump_stmt(Store, store_id, rating))
+    if food_id:
+        db.execute(_bump_stmt(Food, food_id, rating))
+
+
+def bayesian_rating(rating_avg: Optional[float], rating_count: int) -> float:
+    """Average shrunk towards RATING_PRIOR_MEAN, so one 5-star review doesn't outrank fifty 4.8s"""
+    prior_weight = settings.RATING_PRIOR_WEIGHT
+    total = (rating_avg or 0.0) * rating_count + settings.RATING_PRIOR_MEAN * prior_weight
+    return total / (rating_count + prior_weight) if rating_count + prior_weight > 0 else 0.0
+
+
+def _reconcile_stmt(model, review_fk):
+    table = model.__table__
+    bucket = _rating_bucket_sql(Review.rating)
+    totals = select(
+        review_fk.label("id"),
+        func.count().label("rating_count"),
+        func.avg(Review.rating).label("rating_avg"),
+        # count() is bigint; cast so the array compares with the integer[] column
+        array([
+            cast(func.count().filter(bucket == b), Integer) for b in range(1, HISTOGRAM_BUCKETS + 1)
+        ]).label("rating_histogram"),
+    ).where(review_fk.isnot(None)).group_by(review_fk).subquery()
+
+    # Every row, with zeros for rows that have no reviews left
+    expected = select(
+        table.c.id,
+        func.coalesce(totals.c.rating_count, 0).label("rating_count"),
+        totals.c.rating_avg,
+        func.coalesce(totals.c.rating_histogram, array([0] * HISTOGRAM_BUCKETS)).label("rating_histogram"),
+    ).select_from(table.outerjoin(totals, totals.c.id == table.c.id)).subquery()
+
+    return update(table).where(
+        table.c.id == expected.c.id,
+        or_(
+            table.c.rating_count != expected.c.rating_count,
+            table.c.rating_histogram != expected.c.rating_histogram,
+            table.c.rating_avg.is_distinct_from(expected.c.rating_avg)
+            & ~and_(table.c.rating_avg.isnot(None), expected.c.rating_avg.isnot(None),
+                    func.abs(table.c.rating_avg - expected.c.rating_avg) < 1e-9),
+        )
+    ).values(
+        rating_count=expected.c.rating_count,
+        rating_avg=expected.c.rating_avg,
+        rating_histogram=expected.c.rating_histogram,
+        # Drift repair isn't a content change
+        updated_at=table.c.updated_at,
+    )
+
+
+def reconcile(db: Session) -> dict:
+    """Recompute every store and food aggregate from reviews; returns how many rows were corrected"""
+    stores = db.execute(_reconcile_stmt(Store, Review.store_id)).rowcount
+    foods = db.execute(_reconcile_stmt(Food, Review.food_id)).rowcount
+    db.commit()
+    return {"stores_fixed": stores, "foods_fixed": foods}
@@ -0,0 +1,327 @@
+"""
+Cache for public catalog reads (GET /foods, /foods/{id}, /stores, /stores/{id}).
+
+Serialized JSON bodies are cached per namespace ("foods", "stores") and request
+(path + sorted query params) together with a strong ETag, so a hit skips both
+Postgres and Pydantic, and a matching If-None-Match is answered with 304.
+
+Tier 1 is an in-process LRU. Tier 2 is an optional shared store (Redis when
+RESPONSE_CACHE_REDIS_URL is set; any object with the MemoryStore interface can
+stand in for it locally).
+
+Invalidation bumps generation counters that are part of the keys, so stale
+entries are never read again and simply age out:
+- every key includes its namespace's epoch (`invalidate`, for cascades);
+- list keys include the namespace's list generation (`invalidate_lists`);
+- detail keys include their entity's generation (`invalidate_entity`), so a
+  write to one food leaves every other food's entry alone.
+Review writes only touch the reviewed store's and food's detail entries; the
+rating fields in list pages are refreshed by RESPONSE_CACHE_TTL_SECONDS.
+
+Generations live in the shared store when there is one, so a write on one
+worker invalidates all of them within RESPONSE_CACHE_GENERATION_REFRESH_SECONDS
+(shared values are re-read at most that often); without it, other processes
+(e.g. the job worker) are bounded by RESPONSE_CACHE_TTL_SECONDS.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from app.core.config import settings
+from app.core.metrics import CACHE_LOOKUPS
+
+FOODS = "foods"
+STORES = "stores"
+
+# Response headers set by the endpoint that belong to the cached body
+CACHED_HEADERS = ("X-Next-Cursor",)
+
+
+@dataclass
+class CachedResponse:
+    etag: str
+    body: bytes
+    headers: Dict[str, str]
+
+    def dumps(self) -> bytes:
+        meta = json.dumps({"etag": self.etag, "headers": self.headers}).encode("utf-8")
+        return meta + b"\n" + self.body
+
+    @classmethod
+    def loads(cls, raw: bytes) -> "CachedResponse":
+        meta, body = raw.split(b"\n", 1)
+        fields = json.loads(meta)
+        return cls(fields["etag"], body, fields["headers"])
+
+
+class MemoryStore:
+    """
+    Thread-safe LRU with per-entry TTL. Used as tier 1, and as a local stand-in
+    for the shared store (same get/set/incr interface as RedisStore).
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at and time.monotonic() > expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + ttl_seconds if ttl_seconds else 0.0
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def mget(self, keys: Sequence[str]) -> List[Optional[Any]]:
+        return [self.get(key) for key in keys]
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            _, value = self._entries.get(key, (0.0, 0))
+            self._entries[key] = (0.0, int(value) + 1)
+            return int(value) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisStore:
+    """Shared tier on Redis; the `redis` package is only needed when this is configured"""
+
+    def __init__(self, url: str):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[Any]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
+        self._client.set(key, value, ex=ttl_seconds or None)
+
+    def mget(self, keys: Sequence[str]) -> List[Optional[Any]]:
+        return self._client.mget(keys)
+
+    def incr(self, key: str) -> int:
+        return int(self._client.incr(key))
+
+
+def _shared_store_from_settings():
+    if not settings.RESPONSE_CACHE_REDIS_URL:
+        return None
+    try:
+        return RedisStore(settings.RESPONSE_CACHE_REDIS_URL)
+    except Exception as e:
+        print(f"⚠️ Response cache shared store unavailable, using in-process cache only: {e}")
+        return None
+
+
+def make_etag(body: bytes) -> str:
+    """Strong validator: changes whenever a single byte of the body does"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip() for tag in if_none_match.split(","))
+
+
+class ResponseCache:
+    def __init__(self, max_size: int, ttl_seconds: int, max_age_seconds: int,
+                 enabled: bool = True, shared=None, generation_refresh_seconds: float = 1.0):
+        self.ttl_seconds = ttl_seconds
+        self.max_age_seconds = max_age_seconds
+        self.enabled = enabled
+        self.shared = shared
+        self.generation_refresh_seconds = generation_refresh_seconds
+        self._local = MemoryStore(max_size)
+        # Never evicted: dropping a counter would make older entries reachable again
+        self._generations: Dict[str, int] = {}
+        # Last read of each shared counter: (monotonic read time, value)
+        self._shared_generations: Dict[str, Tuple[float, int]] = {}
+        self._adapters: Dict[Any, TypeAdapter] = {}
+        self._lock = threading.Lock()
+
+    # ---------- public API ----------
+
+    def respond(self, request: Request, response: Response, namespace: str,
+                response_model: Any, load: Callable[[], Any], entity_id: Optional[int] = None) -> Response:
+        """
+        Serve `load()` serialized as `response_model`, from cache when possible.
+        Pass `entity_id` for single-entity reads; anything else is cached as a list.
+        Exceptions from `load` (404s, bad cursors) propagate and are never cached.
+        """
+        key = self._key(namespace, request, entity_id)
+        cached = self._get(key) if self.enabled else None
+        if cached is None:
+            adapter = self._adapter(response_model)
+            body = adapter.dump_json(adapter.validate_python(load(), from_attributes=True))
+            headers = {h: response.headers[h] for h in CACHED_HEADERS if h in response.headers}
+            cached = CachedResponse(make_etag(body), body, headers)
+            if self.enabled:
+                self._put(key, cached)
+        return self._to_response(request, cached)
+
+    def invalidate(self, *namespaces: str) -> None:
+        """Make every cached entry of these namespaces unreachable, e.g. after a cascading delete"""
+        self._bump(list(namespaces))
+
+    def invalidate_lists(self, namespace: str) -> None:
+        """Drop the namespace's list pages, e.g. after a create"""
+        self._bump([self._lists_name(namespace)])
+
+    def invalidate_entity(self, namespace: str, entity_id: int, lists: bool = True) -> None:
+        """
+        Drop one entity's detail entries, and with `lists` the namespace's list pages
+        that may show it. Other entities' detail entries stay cached.
+        """
+        names = [self._entity_name(namespace, entity_id)]
+        if lists:
+            names.append(self._lists_name(namespace))
+        self._bump(names)
+
+    def clear(self) -> None:
+        self._local.clear()
+
+    # ---------- internals ----------
+
+    @staticmethod
+    def _lists_name(namespace: str) -> str:
+        return f"{namespace}:lists"
+
+    @staticmethod
+    def _entity_name(namespace: str, entity_id: int) -> str:
+        return f"{namespace}:{entity_id}"
+
+    @staticmethod
+    def _generation_key(name: str) -> str:
+        return f"response-cache:generation:{name}"
+
+    def _bump(self, names: List[str]) -> None:
+        for name in names:
+            if self.shared is None:
+                with self._lock:
+                    self._generations[name] = self._generations.get(name, 0) + 1
+                continue
+            try:
+                value = self.shared.incr(self._generation_key(name))
+                with self._lock:
+                    self._shared_generations[name] = (time.monotonic(), int(value))
+            except Exception as e:
+                # At least this worker stops serving what it has; the rest wait for the TTL
+                print(f"⚠️ Response cache invalidation failed on shared store: {e}")
+                self._local.clear()
+
+    def _shared_values(self, names: List[str]) -> List[int]:
+        # Re-read from the shared store at most every generation_refresh_seconds, in one round trip
+        now = time.monotonic()
+        with self._lock:
+            known = {name: self._shared_generations.get(name) for name in names}
+        stale = [name for name, entry in known.items()
+                 if entry is None or now - entry[0] >= self.generation_refresh_seconds]
+        if stale:
+            try:
+                values = self.shared.mget([self._generation_key(name) for name in stale])
+            except Exception as e:
+                print(f"⚠️ Response cache shared store read failed: {e}")
+                values = [None] * len(stale)
+            with self._lock:
+                for name, value in zip(stale, values):
+                    # Counters only grow; never let a read that raced our own incr go backwards
+                    current = self._shared_generations.get(name)
+                    value = max(int(value) if value is not None else 0, current[1] if current else 0)
+                    known[name] = self._shared_generations[name] = (now, value)
+        return [known[name][1] for name in names]
+
+    def _generation(self, names: List[str]) -> str:
+        # With a shared tier only shared counters go into keys, so workers agree on them
+        if self.shared is None:
+            values = [self._generations.get(name, 0) for name in names]
+        else:
+            values = self._shared_values(names)
+        return ".".join(map(str, values))
+
+    def _key(self, namespace: str, request: Request, entity_id: Optional[int] = None) -> str:
+        scope = self._lists_name(namespace) if entity_id is None else self._entity_name(namespace, entity_id)
+        params = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+        raw = f"{self._generation([namespace, scope])}\x00{request.url.path}\x00{params}"
+        return f"response-cache:{namespace}:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _adapter(self, response_model: Any) -> TypeAdapter:
+        adapter = self._adapters.get(response_model)
+        if adapter is None:
+            adapter = self._adapters[response_model] = TypeAdapter(response_model)
+        return adapter
+
+    def _get(self, key: str) -> Optional[CachedResponse]:
+        cached = self._local.get(key)
+        if cached is not None:
+            CACHE_LOOKUPS.labels("response", "memory_hit").inc()
+            return cached
+        if self.shared is not None:
+            try:
+                raw = self.shared.get(key)
+            except Exception as e:
+                print(f"⚠️ Response cache shared store read failed: {e}")
+                raw = None
+            if raw is not None:
+                cached = CachedResponse.loads(raw)
+                self._local.set(key, cached, self.ttl_seconds)
+                CACHE_LOOKUPS.labels("response", "shared_hit").inc()
+                return cached
+        CACHE_LOOKUPS.labels("response", "miss").inc()
+        return None
+
+    def _put(self, key: str, cached: CachedResponse) -> None:
+        self._local.set(key, cached, self.ttl_seconds)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, cached.dumps(), self.ttl_seconds)
+            except Exception as e:
+                print(f"⚠️ Response cache shared store write failed: {e}")
+
+    def _to_response(self, request: Request, cached: CachedResponse) -> Response:
+        headers = {
+            **cached.headers,
+            "ETag": cached.etag,
+            "Cache-Control": f"public, max-age={self.max_age_seconds}",
+        }
+        if _etag_matches(request.headers.get("if-none-match"), cached.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=cached.body, media_type="application/json", headers=headers)
+
+
+response_cache = ResponseCache(
+    max_size=settings.RESPONSE_CACHE_MAX_SIZE,
+    ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+    max_age_seconds=settings.RESPONSE_CACHE_MAX_AGE_SECONDS,
+    enabled=settings.RESPONSE_CACHE_ENABLED,
+    shared=_shared_store_from_settings(),
+    generation_refresh_seconds=settings.RESPONSE_CACHE_GENERATION_REFRESH_SECONDS,
+)
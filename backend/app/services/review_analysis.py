@@ -0,0 +1,202 @@
+"""
+Classifies reviews into problem categories using the stored review embeddings.
+
+Each ProblemCategory is embedded once (name, description and keywords). A
+review's category is its nearest active category by cosine similarity, picked in
+SQL for a whole batch with a LATERAL ... ORDER BY distance LIMIT 1 join, and kept
+only when the review is rated low enough and is similar enough to count as a
+complaint. Classified reviews are added to store_problem_stats in the same
+transaction, so the owner's issues dashboard reads aggregates, not reviews.
+"""
+from collections import defaultdict
+from typing import Iterable, List, Optional, Sequence
+
+from sqlalchemy import and_, case, delete, func, select, true, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.models.problem_category import ProblemCategory
+from app.models.review import Review
+from app.models.store import Store
+from app.models.store_problem_stat import StoreProblemStat
+from app.services import ai_service
+
+
+def category_embedding_text(category: ProblemCategory) -> str:
+    parts = [category.name, category.description or "", ", ".join(category.keywords or [])]
+    return ". ".join(p for p in parts if p)
+
+
+def embed_categories(db: Session, force: bool = False) -> int:
+    """
+    Embed active categories that have no embedding yet or were embedded by another
+    model (or all of them with `force`). Returns how many were embedded; caller commits.
+    """
+    query = db.query(ProblemCategory).filter(ProblemCategory.is_active.is_(True))
+    if not force:
+        query = query.filter(
+            (ProblemCategory.embedding.is_(None))
+            | (ProblemCategory.embedding_model.is_distinct_from(ai_service.embedding_model_name))
+        )
+    categories = query.order_by(ProblemCategory.id).all()
+    if not categories:
+        return 0
+
+    vectors = ai_service.generate_embeddings([category_embedding_text(c) for c in categories])
+    embedded = 0
+    for category, vector in zip(categories, vectors):
+        if vector is None:
+            continue
+        category.embedding = vector
+        category.embedding_model = ai_service.embedding_model_name
+        embedded += 1
+    return embedded
+
+
+def _classify_stmt(review_ids: Sequence[int]):
+    # Postgres won't let a LATERAL in UPDATE ... FROM see the target table, so the
+    # nearest category is found over an alias and joined back by id
+    candidate = aliased(Review)
+    distance = ProblemCategory.embedding.cosine_distance(candidate.embedding)
+    nearest = select(
+        ProblemCategory.id.label("category_id"),
+        distance.label("distance"),
+    ).where(
+        ProblemCategory.is_active.is_(True),
+        ai_service.current_embedding(ProblemCategory)
+    ).order_by(distance).limit(1).lateral("nearest")
+
+    candidates = select(
+        candidate.id.label("review_id"),
+        nearest.c.category_id,
+        (1 - nearest.c.distance).label("similarity"),
+    ).select_from(candidate).join(nearest, true()).where(
+        candidate.id.in_(review_ids),
+        ai_service.current_embedding(candidate)
+    ).subquery()
+
+    is_problem = and_(
+        Review.rating <= settings.REVIEW_PROBLEM_MAX_RATING,
+        candidates.c.similarity >= settings.REVIEW_PROBLEM_MIN_SIMILARITY,
+    )
+    return update(Review).where(
+        Review.id == candidates.c.review_id,
+        # Re-checked on the locked row, so concurrent analyzers never count a review twice
+        Review.analyzed_at.is_(None)
+    ).values(
+        problem_category_id=case((is_problem, candidates.c.category_id), else_=None),
+        problem_similarity=candidates.c.similarity,
+        analyzed_at=func.now(),
+    ).returning(
+        Review.store_id, Review.problem_category_id, Review.rating, Review.problem_similarity, Review.created_at
+    )
+
+
+def _add_to_stats(db: Session, rows: Iterable) -> None:
+    totals = defaultdict(lambda: {"review_count": 0, "rating_sum": 0.0, "similarity_sum": 0.0, "last_review_at": None})
+    for store_id, category_id, rating, similarity, created_at in rows:
+        if store_id is None or category_id is None:
+            continue
+        entry = totals[(store_id, category_id)]
+        entry["review_count"] += 1
+        entry["rating_sum"] += rating
+        entry["similarity_sum"] += similarity
+        if created_at and (entry["last_review_at"] is None or created_at > entry["last_review_at"]):
+            entry["last_review_at"] = created_at
+    if not totals:
+        return
+
+    stmt = insert(StoreProblemStat).values([
+        {"store_id": store_id, "category_id": category_id, **entry}
+        for (store_id, category_id), entry in totals.items()
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[StoreProblemStat.store_id, StoreProblemStat.category_id],
+        set_={
+            "review_count": StoreProblemStat.review_count + stmt.excluded.review_count,
+            "rating_sum": StoreProblemStat.rating_sum + stmt.excluded.rating_sum,
+            "similarity_sum": StoreProblemStat.similarity_sum + stmt.excluded.similarity_sum,
+            "last_review_at": func.greatest(StoreProblemStat.last_review_at, stmt.excluded.last_review_at),
+        },
+    ))
+
+
+def analyze_reviews(db: Session, review_ids: Sequence[int]) -> int:
+    """
+    Classify the given reviews that are embedded and not yet analyzed, and add
+    them to their stores' problem stats. Returns how many were analyzed; caller commits.
+    Reviews stay pending while no category is embedded.
+    """
+    if not review_ids:
+        return 0
+    rows = db.execute(_classify_stmt(review_ids)).all()
+    _add_to_stats(db, rows)
+    return len(rows)
+
+
+def analyze_pending(db: Session, batch_size: Optional[int] = None) -> int:
+    """Analyze every embedded review not analyzed yet, committing per batch"""
+    batch_size = max(1, batch_size or settings.REVIEW_ANALYSIS_BATCH_SIZE)
+    analyzed = 0
+    last_id = 0
+    while True:
+        review_ids: List[int] = db.execute(
+            select(Review.id).where(
+                Review.id > last_id,
+                Review.analyzed_at.is_(None),
+                ai_service.current_embedding(Review)
+            ).order_by(Review.id).limit(batch_size)
+        ).scalars().all()
+        if not review_ids:
+            return analyzed
+        analyzed += analyze_reviews(db, review_ids)
+        db.commit()
+        last_id = review_ids[-1]
+
+
+def reset_analysis(db: Session) -> None:
+    """Forget every classification and aggregate, e.g. after categories or thresholds change"""
+    db.execute(delete(StoreProblemStat))
+    db.execute(
+        update(Review).where(Review.analyzed_at.isnot(None)).values(
+            problem_category_id=None, problem_similarity=None, analyzed_at=None
+        )
+    )
+    db.commit()
+
+
+def store_issues(db: Session, owner_id: int) -> List[dict]:
+    """Problem summary for each store owned by `owner_id`, read from store_problem_stats"""
+    rows = db.execute(
+        select(Store.id, Store.name, StoreProblemStat, ProblemCategory).join(
+            StoreProblemStat, StoreProblemStat.store_id == Store.id
+        ).join(
+            ProblemCategory, ProblemCategory.id == StoreProblemStat.category_id
+        ).where(
+            Store.umkm_id == owner_id,
+            ProblemCategory.is_active.is_(True),
+            StoreProblemStat.review_count > 0
+        ).order_by(Store.id)
+    ).all()
+
+    stores = {}
+    for store_id, store_name, stat, category in rows:
+        store = stores.setdefault(store_id, {
+            "store_id": store_id, "store_name": store_name, "total_problem_reviews": 0, "issues": []
+        })
+        store["total_problem_reviews"] += stat.review_count
+        store["issues"].append({
+            "category_key": category.category_key,
+            "name": category.name,
+            "review_count": stat.review_count,
+            "average_rating": round(stat.rating_sum / stat.review_count, 2),
+            "average_similarity": round(stat.similarity_sum / stat.review_count, 4),
+            "severity_score": round(stat.review_count * category.severity_weight, 2),
+            "suggested_action": category.action_template,
+            "last_review_at": stat.last_review_at,
+        })
+
+    for store in stores.values():
+        store["issues"].sort(key=lambda i: i["severity_score"], reverse=True)
+    return sorted(stores.values(), key=lambda s: s["total_problem_reviews"], reverse=True)
@@ -0,0 +1,25 @@
+import re
+from typing import Optional
+
+from sqlalchemy import ColumnElement, func
+
+# Must match the configuration used by foods.search_vector
+TEXT_SEARCH_CONFIG = "simple"
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def websearch_tsquery(query: str):
+    """Free-form query ("nasi goreng -pedas", quoted phrases, OR) as a tsquery"""
+    return func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, query)
+
+
+def prefix_tsquery(query: str) -> Optional[ColumnElement]:
+    """
+    Prefix-matching tsquery for as-you-type search: "nasi gor" -> 'nasi:* & gor:*'.
+    Returns None when the input has no searchable words.
+    """
+    words = _WORD.findall(query.lower())
+    if not words:
+        return None
+    return func.to_tsquery(TEXT_SEARCH_CONFIG, " & ".join(f"{word}:*" for word in words))
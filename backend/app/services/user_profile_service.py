@@ -0,0 +1,236 @@
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select, union
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.food import Food
+from app.models.user_food_history import UserFoodHistory
+from app.models.user_profile import UserProfile
+from app.services.embedding_cache import as_array
+
+# Interactions rated at or above this count towards the "liked" profile vector
+LIKED_RATING_THRESHOLD = 4
+
+# Profile vectors are plain means over distinct foods, the same definition as
+# ai_service._profile_avg_stmt: a food enters the "all" mean on the user's first
+# interaction with it and the "liked" mean on its first rating >= the threshold.
+# Repeat interactions still count in the counters below, but not in the vectors.
+
+
+def _current_model() -> Optional[str]:
+    # Imported here because ai_service imports this module
+    from app.services import ai_service
+    return ai_service.embedding_model_name
+
+
+def _is_current_model(name: Optional[str]) -> bool:
+    from app.services import ai_service
+    return ai_service.is_current_model(name)
+
+
+# ---------- incremental updates ----------
+
+def _running_mean(current, count: int, vector) -> np.ndarray:
+    new = as_array(vector)
+    if current is None or count <= 0:
+        return new
+    current = as_array(current)
+    return current + (new - current) / (count + 1)
+
+
+def _bump(counts: Optional[Dict[str, int]], keys: Iterable[str]) -> Dict[str, int]:
+    # Always return a new dict so SQLAlchemy sees the JSON column as changed
+    updated = dict(counts or {})
+    for key in keys:
+        updated[key] = updated.get(key, 0) + 1
+    return updated
+
+
+def _reset(profile: UserProfile) -> None:
+    profile.liked_embedding = None
+    profile.liked_count = 0
+    profile.all_embedding = None
+    profile.all_count = 0
+    profile.embedding_model = None
+    profile.category_counts = {}
+    profile.taste_counts = {}
+    profile.mood_counts = {}
+    profile.selection_counts = {}
+    profile.rating_sum = 0.0
+    profile.rating_count = 0
+    profile.total_interactions = 0
+
+
+def _is_liked(history: UserFoodHistory) -> bool:
+    return history.rating is not None and history.rating >= LIKED_RATING_THRESHOLD
+
+
+def _apply(profile: UserProfile, history: UserFoodHistory, food: Food,
+           first_seen: bool, first_liked: bool) -> None:
+    """
+    Fold one history row into the profile (same rules as the old full-scan preferences).
+    first_seen / first_liked say whether this row adds the food to the all / liked set.
+    """
+    profile.total_interactions += 1
+
+    if food.category:
+        profile.category_counts = _bump(profile.category_counts, [food.category])
+    if food.taste_profile:
+        profile.taste_counts = _bump(profile.taste_counts, food.taste_profile)
+    if food.mood_tags:
+        profile.mood_counts = _bump(profile.mood_counts, food.mood_tags)
+
+    if history.interaction_type == "rated" and history.rating is not None:
+        profile.rating_sum += history.rating
+        profile.rating_count += 1
+
+    if history.interaction_type == "selected":
+        profile.selection_counts = _bump(profile.selection_counts, [str(food.id)])
+
+    if food.embedding is None or not _is_current_model(food.embedding_model):
+        # Not embedded yet, or by another model during a switch
+        return
+    if not profile.all_count and not profile.liked_count:
+        profile.embedding_model = _current_model()
+    if _is_current_model(profile.embedding_model):
+        # A profile built from another model keeps its vectors until rebuild_profile
+        if first_seen:
+            profile.all_embedding = _running_mean(profile.all_embedding, profile.all_count, food.embedding)
+            profile.all_count += 1
+        if first_liked:
+            profile.liked_embedding = _running_mean(profile.liked_embedding, profile.liked_count, food.embedding)
+            profile.liked_count += 1
+
+
+def _lock_profile(db: Session, user_id: int) -> Tuple[UserProfile, bool]:
+    # Create the row if needed, then lock it so concurrent history writes serialize.
+    # Also returns whether this call created the row.
+    created = db.execute(
+        insert(UserProfile).values(user_id=user_id).on_conflict_do_nothing(
+            index_elements=[UserProfile.user_id]
+        ).returning(UserProfile.user_id)
+    ).first() is not None
+    profile = db.scalars(
+        select(UserProfile).where(UserProfile.user_id == user_id).with_for_update()
+    ).one()
+    return profile, created
+
+
+def record_interaction(db: Session, history: UserFoodHistory, food: Food) -> UserProfile:
+    """
+    Update the user's profile with one new history row.
+    Runs in the caller's transaction; the caller commits together with the history row.
+    """
+    profile, created = _lock_profile(db, history.user_id)
+    db.flush()  # so the queries below see the new row
+    if created:
+        # First write since the table existed: fold the whole history, this row included
+        return _fold_history(db, profile, history.user_id)
+    seen, liked = db.execute(
+        select(
+            func.count(),
+            func.count().filter(UserFoodHistory.rating >= LIKED_RATING_THRESHOLD)
+        ).where(
+            UserFoodHistory.user_id == history.user_id,
+            UserFoodHistory.food_id == food.id,
+            UserFoodHistory.id != history.id
+        )
+    ).one()
+    _apply(profile, history, food, first_seen=not seen, first_liked=_is_liked(history) and not liked)
+    return profile
+
+
+# ---------- rebuilds ----------
+
+def _fold_history(db: Session, profile: UserProfile, user_id: int) -> UserProfile:
+    _reset(profile)
+
+    rows = db.execute(
+        select(UserFoodHistory, Food)
+        .join(Food, Food.id == UserFoodHistory.food_id)
+        .where(UserFoodHistory.user_id == user_id)
+        .order_by(UserFoodHistory.id)
+    ).all()
+    seen, liked = set(), set()
+    for history, food in rows:
+        first_seen = food.id not in seen
+        first_liked = _is_liked(history) and food.id not in liked
+        seen.add(food.id)
+        if first_liked:
+            liked.add(food.id)
+        _apply(profile, history, food, first_seen=first_seen, first_liked=first_liked)
+    return profile
+
+
+def rebuild_profile(db: Session, user_id: int) -> UserProfile:
+    """Recompute one user's profile from their full history (caller commits)"""
+    profile, _ = _lock_profile(db, user_id)
+    return _fold_history(db, profile, user_id)
+
+
+def rebuild_all_profiles(db: Session) -> int:
+    """Recompute every profile from scratch, committing per user. Returns the number rebuilt."""
+    user_ids = db.scalars(
+        union(
+            select(UserFoodHistory.user_id),
+            select(UserProfile.user_id)
+        )
+    ).all()
+
+    rebuilt = 0
+    for user_id in user_ids:
+        try:
+            rebuild_profile(db, user_id)
+            db.commit()
+            rebuilt += 1
+        except Exception as e:
+            print(f"Error rebuilding profile for user {user_id}: {e}")
+            db.rollback()
+    return rebuilt
+
+
+def read_profile(db: Session, user_id: int) -> UserProfile:
+    """
+    Read a profile without writing. Users that predate the table get one computed
+    from history in memory; it is persisted by their next history write or by
+    init/rebuild_user_profiles.py.
+    """
+    profile = db.get(UserProfile, user_id)
+    if profile is None:
+        # Transient: never added to the session
+        profile = _fold_history(db, UserProfile(user_id=user_id), user_id)
+    return profile
+
+
+# ---------- reads ----------
+
+def profile_vector(profile: Optional[UserProfile]) -> Optional[np.ndarray]:
+    """Liked-foods mean when the user has any, otherwise the mean over all interactions"""
+    if profile is None or not _is_current_model(profile.embedding_model):
+        return None
+    if profile.liked_count and profile.liked_embedding is not None:
+        return as_array(profile.liked_embedding)
+    if profile.all_count and profile.all_embedding is not None:
+        return as_array(profile.all_embedding)
+    return None
+
+
+async def aget_profile(db: AsyncSession, user_id: int) -> Optional[UserProfile]:
+    return await db.get(UserProfile, user_id)
+
+
+def top_keys(counts: Optional[Dict[str, int]], n: int) -> List[str]:
+    return [key for key, _ in Counter(counts or {}).most_common(n)]
+
+
+def top_selections(profile: UserProfile, n: int = 5) -> List[Tuple[int, int]]:
+    """(food_id, selection_count) pairs, most selected first"""
+    return [(int(food_id), count) for food_id, count in Counter(profile.selection_counts or {}).most_common(n)]
+
+
+def average_rating(profile: UserProfile) -> Optional[float]:
+    return profile.rating_sum / profile.rating_count if profile.rating_count else None
@@ -0,0 +1,319 @@
+"""
+Optional in-process brute-force index over Food.embedding.
+
+For catalogs up to a few hundred thousand foods one matrix-vector product
+plus `argpartition` answers a kNN query faster than a database round trip.
+
+Layout:
+- base: a snapshot on disk (food_ids.npy, matrix.npy, categories.npy,
+  valid.npy, meta.json) memory-mapped read-only, so every worker process on
+  the host shares the same page-cache pages. Rows are L2-normalized, so a dot
+  product is the cosine similarity.
+- delta: foods changed since the snapshot watermark (`updated_at`, less
+  VECTOR_INDEX_WATERMARK_OVERLAP_SECONDS for late commits), held in memory;
+  a base row superseded by a delta row is masked out.
+
+A background thread refreshes the delta every VECTOR_INDEX_REFRESH_SECONDS,
+rebuilds the snapshot when the delta grows past VECTOR_INDEX_MAX_DELTA_ROWS
+or rows disappear, and hot-reloads snapshots written by other processes.
+`search` returns None when the index is not loaded or is older than
+VECTOR_INDEX_MAX_STALENESS_SECONDS; callers then fall back to pgvector.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import CACHE_LOOKUPS
+from app.models.food import Food
+from app.services.embedding_cache import as_array
+
+_CURRENT_FILE = "CURRENT"
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+def _columns():
+    return (Food.id, Food.embedding, Food.embedding_model, Food.category, Food.is_valid_food, Food.updated_at)
+
+
+def _current_embedding():
+    # Imported here because ai_service imports this module
+    from app.services import ai_service
+    return ai_service.current_embedding(Food)
+
+
+def _current_model() -> Optional[str]:
+    from app.services import ai_service
+    return ai_service.embedding_model_name
+
+
+def _is_current(row) -> bool:
+    """Same rule as ai_service.current_embedding, for rows already loaded"""
+    from app.services import ai_service
+    return row.embedding is not None and ai_service.is_current_model(row.embedding_model)
+
+
+class _Rows:
+    """Column arrays for a set of foods; categories are codes into a shared vocabulary"""
+
+    def __init__(self, food_ids: np.ndarray, matrix: np.ndarray, categories: np.ndarray, valid: np.ndarray):
+        self.food_ids = food_ids
+        self.matrix = matrix
+        self.categories = categories
+        self.valid = valid
+
+    @classmethod
+    def from_db_rows(cls, rows, vocabulary: Dict[str, int]) -> "_Rows":
+        dimensions = settings.EMBEDDING_DIMENSIONS
+        if not rows:
+            return cls(np.empty(0, dtype=np.int64), np.empty((0, dimensions), dtype=np.float32),
+                       np.empty(0, dtype=np.int32), np.empty(0, dtype=bool))
+        food_ids = np.fromiter((r.id for r in rows), dtype=np.int64, count=len(rows))
+        matrix = _normalize_rows(np.stack([as_array(r.embedding) for r in rows]))
+        categories = np.fromiter(
+            (vocabulary.setdefault(r.category, len(vocabulary)) for r in rows), dtype=np.int32, count=len(rows)
+        )
+        valid = np.fromiter((bool(r.is_valid_food) for r in rows), dtype=bool, count=len(rows))
+        return cls(food_ids, matrix, categories, valid)
+
+    def __len__(self) -> int:
+        return len(self.food_ids)
+
+
+class _IndexState:
+    """Immutable view used by searches; refreshes build a new one and swap it in"""
+
+    def __init__(self, version: str, base: _Rows, vocabulary: Dict[str, int], watermark: Optional[datetime],
+                 base_alive: np.ndarray, delta_rows: dict, live_count: int):
+        self.version = version
+        self.base = base
+        self.vocabulary = vocabulary
+        self.watermark = watermark
+        self.base_alive = base_alive
+        # Latest row per changed food id; rows whose embedding was cleared (or is from
+        # another model) only mask the base row
+        self.delta_rows = delta_rows
+        self.delta = _Rows.from_db_rows([r for r in delta_rows.values() if _is_current(r)], vocabulary)
+        self.live_count = live_count
+        self.refreshed_at = time.monotonic()
+
+        # Precomputed filter bitmasks
+        self.base_valid = base_alive & base.valid
+        self.base_categories = {code: base_alive & (base.categories == code) for code in vocabulary.values()}
+        self.delta_alive = np.ones(len(self.delta), dtype=bool)
+        self.delta_categories = {code: self.delta.categories == code for code in vocabulary.values()}
+
+    def _masks(self, category: Optional[str], only_valid: bool):
+        base_mask, delta_mask = (self.base_valid, self.delta.valid) if only_valid else (self.base_alive, self.delta_alive)
+        if category is not None:
+            code = self.vocabulary.get(category)
+            if code is None:
+                return np.zeros(len(self.base), dtype=bool), np.zeros(len(self.delta), dtype=bool)
+            base_mask = base_mask & self.base_categories[code]
+            delta_mask = delta_mask & self.delta_categories[code]
+        return base_mask, delta_mask
+
+    def search(self, query: np.ndarray, limit: int, category: Optional[str], only_valid: bool) -> List[int]:
+        base_mask, delta_mask = self._masks(category, only_valid)
+        scores = np.concatenate([
+            np.where(base_mask, self.base.matrix @ query, -np.inf),
+            np.where(delta_mask, self.delta.matrix @ query, -np.inf),
+        ])
+        n_base = len(self.base)
+
+        k = min(limit, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [
+            int(self.base.food_ids[i] if i < n_base else self.delta.food_ids[i - n_base])
+            for i in top if np.isfinite(scores[i])
+        ]
+
+
+class FoodVectorIndex:
+    def __init__(self, snapshot_dir: str):
+        self.snapshot_dir = Path(snapshot_dir)
+        self._state: Optional[_IndexState] = None
+        self._refresh_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ---------- snapshot files ----------
+
+    def _current_version(self) -> Optional[str]:
+        try:
+            return (self.snapshot_dir / _CURRENT_FILE).read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _write_snapshot(self, base: _Rows, vocabulary: Dict[str, int], watermark: Optional[datetime]) -> str:
+        version = f"{time.time_ns()}-{os.getpid()}"
+        path = self.snapshot_dir / version
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "food_ids.npy", base.food_ids)
+        np.save(path / "matrix.npy", base.matrix)
+        np.save(path / "categories.npy", base.categories)
+        np.save(path / "valid.npy", base.valid)
+        (path / "meta.json").write_text(json.dumps({
+            "dimensions": settings.EMBEDDING_DIMENSIONS,
+            "model": _current_model(),
+            "vocabulary": vocabulary,
+            "watermark": watermark.isoformat() if watermark else None,
+            "rows": len(base),
+        }))
+        # Publish atomically, then drop all but the two newest snapshots
+        tmp = self.snapshot_dir / f"{_CURRENT_FILE}.{version}"
+        tmp.write_text(version)
+        os.replace(tmp, self.snapshot_dir / _CURRENT_FILE)
+        for old in sorted(p for p in self.snapshot_dir.iterdir() if p.is_dir())[:-2]:
+            shutil.rmtree(old, ignore_errors=True)
+        return version
+
+    def _load_snapshot(self, version: str):
+        path = self.snapshot_dir / version
+        meta = json.loads((path / "meta.json").read_text())
+        if meta["dimensions"] != settings.EMBEDDING_DIMENSIONS or meta.get("model") != _current_model():
+            return None
+        base = _Rows(
+            np.load(path / "food_ids.npy", mmap_mode="r"),
+            np.load(path / "matrix.npy", mmap_mode="r"),
+            np.load(path / "categories.npy", mmap_mode="r"),
+            np.load(path / "valid.npy", mmap_mode="r"),
+        )
+        watermark = datetime.fromisoformat(meta["watermark"]) if meta["watermark"] else None
+        return base, dict(meta["vocabulary"]), watermark
+
+    # ---------- building and refreshing ----------
+
+    def _live_count(self, db: Session) -> int:
+        return db.scalar(select(func.count()).select_from(Food).where(_current_embedding()))
+
+    def rebuild(self, db: Session) -> str:
+        """Full load from Postgres, written as a new snapshot and swapped in; returns its version"""
+        rows = db.execute(select(*_columns()).where(_current_embedding()).order_by(Food.id)).all()
+        vocabulary: Dict[str, int] = {}
+        base = _Rows.from_db_rows(rows, vocabulary)
+        watermark = max((r.updated_at for r in rows if r.updated_at), default=None)
+        version = self._write_snapshot(base, vocabulary, watermark)
+        self._activate(db, version)
+        return version
+
+    def _activate(self, db: Session, version: str) -> bool:
+        loaded = self._load_snapshot(version)
+        if loaded is None:
+            return False
+        base, vocabulary, watermark = loaded
+        self._state = self._apply_changes(db, version, base, vocabulary, watermark,
+                                          np.ones(len(base), dtype=bool), {})
+        return True
+
+    def _apply_changes(self, db: Session, version: str, base: _Rows, vocabulary: Dict[str, int],
+                       watermark: Optional[datetime], base_alive: np.ndarray, delta_rows: dict) -> _IndexState:
+        # >= because several rows can share one timestamp, and the overlap catches rows
+        # stamped before the watermark but committed after it; re-applying a row is harmless
+        stmt = select(*_columns())
+        if watermark is not None:
+            since = watermark - timedelta(seconds=settings.VECTOR_INDEX_WATERMARK_OVERLAP_SECONDS)
+            stmt = stmt.where(Food.updated_at >= since)
+        changed = db.execute(stmt).all()
+
+        delta_rows = dict(delta_rows)
+        base_alive = base_alive.copy()
+        for row in changed:
+            delta_rows[row.id] = row
+            if row.updated_at and (watermark is None or row.updated_at > watermark):
+                watermark = row.updated_at
+        if delta_rows and len(base):
+            ids = np.fromiter(delta_rows, dtype=np.int64, count=len(delta_rows))
+            pos = np.clip(np.searchsorted(base.food_ids, ids), 0, len(base) - 1)
+            base_alive[pos[base.food_ids[pos] == ids]] = False
+
+        # The vocabulary is copied because new categories in the delta extend it
+        return _IndexState(version, base, dict(vocabulary), watermark, base_alive, delta_rows, self._live_count(db))
+
+    def refresh(self, db: Session) -> None:
+        """Hot-reload a newer snapshot if one was published, otherwise apply changes since the watermark"""
+        with self._refresh_lock:
+            current = self._current_version()
+            state = self._state
+            if current is None:
+                self.rebuild(db)
+                return
+            if state is None or state.version != current:
+                if not self._activate(db, current):
+                    self.rebuild(db)
+                return
+
+            state = self._apply_changes(db, state.version, state.base, state.vocabulary, state.watermark,
+                                        state.base_alive, state.delta_rows)
+            live_rows = int(state.base_alive.sum()) + len(state.delta)
+            if live_rows != state.live_count or len(state.delta_rows) > settings.VECTOR_INDEX_MAX_DELTA_ROWS:
+                # Deleted or un-embedded foods, or the delta got large: fold everything into a new snapshot
+                self.rebuild(db)
+            else:
+                self._state = state
+
+    # ---------- background thread ----------
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            db = SessionLocal()
+            try:
+                self.refresh(db)
+            except Exception as e:
+                print(f"Food vector index refresh error: {e}")
+            finally:
+                db.close()
+            self._stop.wait(settings.VECTOR_INDEX_REFRESH_SECONDS)
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="food-vector-index", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    # ---------- queries ----------
+
+    def is_fresh(self) -> bool:
+        state = self._state
+        return state is not None and time.monotonic() - state.refreshed_at <= settings.VECTOR_INDEX_MAX_STALENESS_SECONDS
+
+    def search(self, query_vector: List[float], limit: int, category: Optional[str] = None,
+               only_valid: bool = False) -> Optional[List[int]]:
+        """
+        Food ids ordered by cosine similarity, or None when the index cannot
+        answer (disabled, not loaded yet, or stale) and pgvector should be used.
+        """
+        state = self._state
+        if not settings.VECTOR_INDEX_ENABLED or state is None or not self.is_fresh():
+            CACHE_LOOKUPS.labels("food_vector_index", "stale").inc()
+            return None
+        query = as_array(query_vector)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        CACHE_LOOKUPS.labels("food_vector_index", "hit").inc()
+        return state.search(query, limit, category, only_valid)
+
+
+food_vector_index = FoodVectorIndex(settings.VECTOR_INDEX_SNAPSHOT_DIR)
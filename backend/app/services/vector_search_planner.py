@@ -0,0 +1,174 @@
+"""
+Chooses how a filtered vector search is executed so that LIMIT k is met.
+
+An HNSW scan followed by a WHERE filter only sees the first ef_search
+candidates, so a selective filter can return fewer than k rows. Per filter:
+
+- unfiltered      plain HNSW scan
+- exact           few matching rows: skip the ANN index and sort them all
+- partial_index   a partial HNSW index whose predicate equals the filter
+- iterative_scan  pgvector's hnsw.iterative_scan keeps walking the graph
+                  until enough rows pass the filter
+
+Selectivity comes from per-filter row counts cached for
+VECTOR_FILTER_STATS_TTL_SECONDS.
+"""
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.food import Food
+from app.models.store import Store
+
+PLAN_UNFILTERED = "unfiltered"
+PLAN_EXACT = "exact"
+PLAN_PARTIAL_INDEX = "partial_index"
+PLAN_ITERATIVE_SCAN = "iterative_scan"
+
+_SET_ITERATIVE_SCAN = text(
+    "SELECT set_config('hnsw.iterative_scan', :mode, true), set_config('hnsw.max_scan_tuples', :max_tuples, true)"
+)
+
+# (category, is_valid) -> embedded rows; category is None for stores
+_stats: Dict[str, Tuple[float, Dict[Tuple[Optional[str], bool], int]]] = {}
+_stats_lock = threading.Lock()
+
+
+def _current_embedding(model):
+    # Imported here because ai_service imports this module
+    from app.services import ai_service
+    return ai_service.current_embedding(model)
+
+
+def _food_stats_stmt():
+    return select(Food.category, Food.is_valid_food.is_(True), func.count()).where(
+        _current_embedding(Food)
+    ).group_by(Food.category, Food.is_valid_food.is_(True))
+
+
+def _store_stats_stmt():
+    return select(Store.is_valid_store.is_(True), func.count()).where(
+        _current_embedding(Store)
+    ).group_by(Store.is_valid_store.is_(True))
+
+
+def _cached(table: str):
+    with _stats_lock:
+        entry = _stats.get(table)
+    if entry and time.monotonic() - entry[0] <= settings.VECTOR_FILTER_STATS_TTL_SECONDS:
+        return entry[1]
+    return None
+
+
+def _store(table: str, counts: Dict[Tuple[Optional[str], bool], int]):
+    with _stats_lock:
+        _stats[table] = (time.monotonic(), counts)
+    return counts
+
+
+def _food_stats(db: Session):
+    counts = _cached("foods")
+    if counts is None:
+        counts = _store("foods", {(c, bool(v)): n for c, v, n in db.execute(_food_stats_stmt()).all()})
+    return counts
+
+
+async def _afood_stats(db: AsyncSession):
+    counts = _cached("foods")
+    if counts is None:
+        rows = (await db.execute(_food_stats_stmt())).all()
+        counts = _store("foods", {(c, bool(v)): n for c, v, n in rows})
+    return counts
+
+
+def _store_stats(db: Session):
+    counts = _cached("stores")
+    if counts is None:
+        counts = _store("stores", {(None, bool(v)): n for v, n in db.execute(_store_stats_stmt()).all()})
+    return counts
+
+
+async def _astore_stats(db: AsyncSession):
+    counts = _cached("stores")
+    if counts is None:
+        rows = (await db.execute(_store_stats_stmt())).all()
+        counts = _store("stores", {(None, bool(v)): n for v, n in rows})
+    return counts
+
+
+def _matching(counts, category: Optional[str], only_valid: bool) -> int:
+    return sum(
+        n for (c, valid), n in counts.items()
+        if (category is None or c == category) and (valid or not only_valid)
+    )
+
+
+def choose_plan(matching_rows: int, has_partial_index: bool, filtered: bool) -> str:
+    """Pure decision, given how many rows pass the filter and whether a partial index covers it"""
+    if not filtered:
+        return PLAN_UNFILTERED
+    if matching_rows <= settings.VECTOR_EXACT_SCAN_MAX_ROWS:
+        return PLAN_EXACT
+    if has_partial_index:
+        return PLAN_PARTIAL_INDEX
+    return PLAN_ITERATIVE_SCAN
+
+
+def _food_has_partial_index(category: Optional[str], only_valid: bool) -> bool:
+    # Index predicates are "is_valid_food IS true" and "category = X AND is_valid_food IS true"
+    if not only_valid:
+        return False
+    return category is None or category in settings.VECTOR_PARTIAL_INDEX_CATEGORIES
+
+
+def _food_plan(counts, category: Optional[str], only_valid: bool) -> str:
+    return choose_plan(
+        _matching(counts, category, only_valid),
+        _food_has_partial_index(category, only_valid),
+        bool(category or only_valid),
+    )
+
+
+def plan_food_search(db: Session, category: Optional[str] = None, only_valid: bool = False) -> str:
+    if not (category or only_valid):
+        return PLAN_UNFILTERED
+    return _food_plan(_food_stats(db), category, only_valid)
+
+
+async def aplan_food_search(db: AsyncSession, category: Optional[str] = None, only_valid: bool = False) -> str:
+    if not (category or only_valid):
+        return PLAN_UNFILTERED
+    return _food_plan(await _afood_stats(db), category, only_valid)
+
+
+def plan_store_search(db: Session, only_valid: bool = False) -> str:
+    if not only_valid:
+        return PLAN_UNFILTERED
+    return choose_plan(_matching(_store_stats(db), None, True), True, True)
+
+
+async def aplan_store_search(db: AsyncSession, only_valid: bool = False) -> str:
+    if not only_valid:
+        return PLAN_UNFILTERED
+    return choose_plan(_matching(await _astore_stats(db), None, True), True, True)
+
+
+def _iterative_scan_params() -> dict:
+    return {"mode": settings.HNSW_ITERATIVE_SCAN, "max_tuples": str(int(settings.HNSW_MAX_SCAN_TUPLES))}
+
+
+def apply_plan(db: Session, plan: str) -> None:
+    """Session settings for the plan, scoped to the current transaction"""
+    if plan == PLAN_ITERATIVE_SCAN:
+        db.execute(_SET_ITERATIVE_SCAN, _iterative_scan_params())
+
+
+async def aapply_plan(db: AsyncSession, plan: str) -> None:
+    """Async variant of apply_plan"""
+    if plan == PLAN_ITERATIVE_SCAN:
+        await db.execute(_SET_ITERATIVE_SCAN, _iterative_scan_params())
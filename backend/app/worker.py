@@ -0,0 +1,61 @@
+"""
+Background job worker.
+
+Claims jobs from the `jobs` table (FOR UPDATE SKIP LOCKED, so several workers can
+run side by side), batches embedding jobs and runs AI description jobs.
+
+Usage:
+    python -m app.worker            # poll forever
+    python -m app.worker --once     # drain runnable jobs, then exit
+"""
+import os
+import signal
+import socket
+import sys
+import time
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.base import check_embedding_schema
+from app.services import job_handlers, job_queue
+
+_stopping = False
+
+
+def _request_stop(signum, frame):
+    global _stopping
+    _stopping = True
+    print("🛑 Worker stopping after the current batch...")
+
+
+def run_worker(once: bool = False) -> None:
+    check_embedding_schema()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+    print(f"👷 Job worker {worker_id} started")
+
+    while not _stopping:
+        db = SessionLocal()
+        try:
+            jobs = job_queue.claim_batch(db, worker_id, settings.JOB_WORKER_BATCH_SIZE)
+            if jobs:
+                print(f"⚙️ Running {len(jobs)} job(s)")
+                job_handlers.run_jobs(db, jobs)
+        except Exception as e:
+            print(f"❌ Worker error: {e}")
+            db.rollback()
+            jobs = []
+        finally:
+            db.close()
+
+        if not jobs:
+            if once:
+                break
+            time.sleep(settings.JOB_WORKER_POLL_SECONDS)
+
+    print(f"✅ Job worker {worker_id} stopped")
+
+
+if __name__ == "__main__":
+    run_worker(once="--once" in sys.argv[1:])
@@ -0,0 +1,52 @@
+"""
+Embed the problem categories and classify every review that hasn't been
+analyzed yet, updating the per-store problem stats behind the issues dashboard.
+New reviews are analyzed as they are created; run this after seeding categories
+(init/seed_review_analysis.py), after bulk imports, or with --reset after
+changing categories or the REVIEW_PROBLEM_* thresholds.
+
+Usage:
+    python init/analyze_reviews.py           # pending reviews only
+    python init/analyze_reviews.py --reset   # re-embed categories and reclassify everything
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.database import SessionLocal
+from app.services import review_analysis
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify reviews into problem categories")
+    parser.add_argument("--reset", action="store_true",
+                        help="re-embed every category and reclassify all reviews from scratch")
+    parser.add_argument("--batch-size", type=int, default=None, help="reviews classified per statement")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        embedded = review_analysis.embed_categories(db, force=args.reset)
+        db.commit()
+        print(f"✅ Embedded {embedded} problem categories")
+
+        if args.reset:
+            print("🔄 Clearing previous classifications...")
+            review_analysis.reset_analysis(db)
+
+        print("🔄 Classifying reviews...")
+        analyzed = review_analysis.analyze_pending(db, batch_size=args.batch_size)
+        print(f"✅ Analyzed {analyzed} reviews")
+    except Exception as e:
+        print(f"❌ Error analyzing reviews: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
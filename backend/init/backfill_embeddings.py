@@ -0,0 +1,204 @@
+"""
+Re-embed rows whose embedding is missing, failed, stale or from another model.
+
+Rows are processed in id order, in chunks of batch-size x concurrency rows that
+are embedded with parallel embed_documents batches. After every committed chunk
+the last id per table is written to a checkpoint file, so an interrupted run
+resumes where it stopped. A requests-per-minute limit keeps the provider happy.
+
+Switching embedding models is an online operation: point the settings at the new
+model and run with --mode stale, then init/rebuild_user_profiles.py. Vector
+searches only consider rows embedded by the configured model, so results cover
+the re-embedded part of the catalog and grow as the backfill advances.
+
+Rows embedded before the embedding_model column existed have it NULL and are
+searched as the configured model. Run --stamp-legacy once, before any switch,
+so they are not mistaken for vectors from the new model.
+
+Usage:
+    python init/backfill_embeddings.py                          # missing/failed rows, all tables
+    python init/backfill_embeddings.py --mode stale --table foods
+    python init/backfill_embeddings.py --reset --rpm 60
+    python init/backfill_embeddings.py --stamp-legacy
+"""
+import argparse
+import json
+import math
+import sys
+import time
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import or_, select, update
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.food import Food
+from app.models.review import Review
+from app.models.store import Store
+from app.models.user_profile import UserProfile
+from app.services import ai_service
+from app.services.job_handlers import food_embedding_text, review_embedding_text, store_embedding_text
+
+TABLES = {
+    "foods": (Food, food_embedding_text),
+    "stores": (Store, store_embedding_text),
+    "reviews": (Review, review_embedding_text),
+}
+
+DEFAULT_CHECKPOINT = Path(__file__).parent / ".backfill_embeddings.json"
+
+
+def stamp_legacy(db) -> dict:
+    """Record the configured model on vectors that predate the embedding_model column"""
+    stamped = {}
+    for table, (model, _) in TABLES.items():
+        stamped[table] = db.execute(
+            update(model).where(model.embedding.isnot(None), model.embedding_model.is_(None))
+            .values(embedding_model=ai_service.embedding_model_name)
+        ).rowcount
+    stamped["user_profiles"] = db.execute(
+        update(UserProfile).where(
+            or_(UserProfile.liked_count > 0, UserProfile.all_count > 0),
+            UserProfile.embedding_model.is_(None)
+        ).values(embedding_model=ai_service.embedding_model_name)
+    ).rowcount
+    db.commit()
+    return stamped
+
+
+def needs_embedding(model, mode: str):
+    missing = or_(model.embedding.is_(None), model.embedding_status.in_(["failed", "stale"]))
+    if mode == "missing":
+        return missing
+    if mode == "stale":
+        return or_(missing, model.embedding_model.is_distinct_from(ai_service.embedding_model_name))
+    return None  # "all"
+
+
+class RateLimiter:
+    """Spaces out provider requests to at most `per_minute` per minute"""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self.next_allowed = time.monotonic()
+
+    def wait(self, requests: int) -> None:
+        now = time.monotonic()
+        if self.next_allowed > now:
+            time.sleep(self.next_allowed - now)
+        self.next_allowed = max(now, self.next_allowed) + self.interval * requests
+
+
+def load_checkpoint(path: Path, mode: str) -> dict:
+    if path.exists():
+        checkpoint = json.loads(path.read_text())
+        # A checkpoint from another model or mode does not describe this run
+        if checkpoint.get("model") == ai_service.embedding_model_name and checkpoint.get("mode") == mode:
+            return checkpoint
+    return {"model": ai_service.embedding_model_name, "mode": mode, "last_ids": {}}
+
+
+def save_checkpoint(path: Path, checkpoint: dict) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(checkpoint, indent=2))
+    tmp.replace(path)
+
+
+def backfill_table(db, table: str, mode: str, chunk_size: int, limiter: RateLimiter,
+                   checkpoint: dict, checkpoint_path: Path) -> dict:
+    model, text_for = TABLES[table]
+    condition = needs_embedding(model, mode)
+    last_id = checkpoint["last_ids"].get(table, 0)
+    stats = {"embedded": 0, "failed": 0}
+
+    while True:
+        stmt = select(model).where(model.id > last_id)
+        if condition is not None:
+            stmt = stmt.where(condition)
+        rows = db.scalars(stmt.order_by(model.id).limit(chunk_size)).all()
+        if not rows:
+            break
+
+        limiter.wait(math.ceil(len(rows) / max(1, settings.EMBEDDING_BATCH_SIZE)))
+        vectors = ai_service.generate_embeddings([text_for(row) for row in rows])
+
+        for row, vector in zip(rows, vectors):
+            if vector is None:
+                # Keep an existing (stale) vector searchable; flag rows that have none
+                row.embedding_status = "stale" if row.embedding is not None else "failed"
+                stats["failed"] += 1
+            else:
+                for field, value in ai_service.embedding_columns(vector).items():
+                    setattr(row, field, value)
+                stats["embedded"] += 1
+
+        last_id = rows[-1].id
+        db.commit()
+        checkpoint["last_ids"][table] = last_id
+        save_checkpoint(checkpoint_path, checkpoint)
+        print(f"  {table}: up to id {last_id} ({stats['embedded']} embedded, {stats['failed']} failed)")
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed missing, failed or stale embeddings")
+    parser.add_argument("--table", choices=[*TABLES, "all"], default="all")
+    parser.add_argument("--mode", choices=["missing", "stale", "all"], default="missing",
+                        help="missing: NULL/failed/stale rows; stale: also rows from another model; all: every row")
+    parser.add_argument("--batch-size", type=int, default=settings.EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=settings.EMBEDDING_BATCH_CONCURRENCY)
+    parser.add_argument("--rpm", type=float, default=120, help="Max embedding requests per minute (0 = unlimited)")
+    parser.add_argument("--checkpoint", type=Path, default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--reset", action="store_true", help="Ignore the checkpoint and start from the first row")
+    parser.add_argument("--stamp-legacy", action="store_true",
+                        help="Only record the configured model on vectors embedded before it was tracked")
+    args = parser.parse_args()
+
+    if not ai_service.embeddings:
+        print("❌ No embedding provider configured. Set OPENROUTER_API_KEY or GEMINI_API_KEY.")
+        sys.exit(1)
+
+    if args.stamp_legacy:
+        db = SessionLocal()
+        try:
+            stamped = stamp_legacy(db)
+        finally:
+            db.close()
+        for table, count in stamped.items():
+            print(f"✅ {table}: {count} rows stamped with {ai_service.embedding_model_name}")
+        return
+
+    settings.EMBEDDING_BATCH_SIZE = args.batch_size
+    settings.EMBEDDING_BATCH_CONCURRENCY = args.concurrency
+
+    if args.reset and args.checkpoint.exists():
+        args.checkpoint.unlink()
+    checkpoint = load_checkpoint(args.checkpoint, args.mode)
+    limiter = RateLimiter(args.rpm)
+    tables = list(TABLES) if args.table == "all" else [args.table]
+
+    print(f"🔄 Backfilling embeddings with {ai_service.embedding_model_name} (mode={args.mode})")
+    db = SessionLocal()
+    try:
+        for table in tables:
+            stats = backfill_table(
+                db, table, args.mode, args.batch_size * args.concurrency,
+                limiter, checkpoint, args.checkpoint
+            )
+            print(f"✅ {table}: {stats['embedded']} embedded, {stats['failed']} failed")
+        # Finished: the next run should look at every row again
+        if args.checkpoint.exists():
+            args.checkpoint.unlink()
+    except KeyboardInterrupt:
+        db.rollback()
+        print("\n⏸️  Interrupted; rerun to resume from the checkpoint")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
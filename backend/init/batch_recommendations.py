@@ -0,0 +1,71 @@
+"""
+Compute personalized food recommendations for many users and write them as
+JSON Lines, one {"user_id": ..., "recommendations": [...]} object per user.
+Intended for scheduled jobs (e.g. the morning push notification run).
+
+Usage:
+    python init/batch_recommendations.py                          # every user, to stdout
+    python init/batch_recommendations.py --output recs.jsonl --limit 10
+    python init/batch_recommendations.py --user-ids 12 34 56
+    python init/batch_recommendations.py --user-ids-file users.txt  # one id per line
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.database import SessionLocal
+from app.services import batch_recommendations
+
+
+def _read_user_ids(args):
+    if args.user_ids_file:
+        with open(args.user_ids_file) as f:
+            return [int(line) for line in f if line.strip()]
+    return args.user_ids or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch personalized recommendations as JSON Lines")
+    parser.add_argument("--user-ids", type=int, nargs="*", help="users to score (default: every user)")
+    parser.add_argument("--user-ids-file", help="file with one user id per line")
+    parser.add_argument("--limit", type=int, default=10, help="recommendations per user")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="users per matrix multiply (default: BATCH_RECOMMENDATION_CHUNK_SIZE)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="chunks scored in parallel (default: BATCH_RECOMMENDATION_WORKERS)")
+    parser.add_argument("--output", help="output file (default: stdout)")
+    args = parser.parse_args()
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    db = SessionLocal()
+    started = time.perf_counter()
+    written = 0
+    try:
+        for row in batch_recommendations.iter_batch_recommendations(
+            db,
+            user_ids=_read_user_ids(args),
+            limit=args.limit,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+        ):
+            out.write(json.dumps(row) + "\n")
+            written += 1
+        # Progress goes to stderr so stdout stays valid JSON Lines
+        print(f"✅ Wrote recommendations for {written} users in {time.perf_counter() - started:.1f}s",
+              file=sys.stderr)
+    except Exception as e:
+        print(f"❌ Error computing batch recommendations: {e}", file=sys.stderr)
+        raise
+    finally:
+        db.close()
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
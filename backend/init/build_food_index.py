@@ -0,0 +1,36 @@
+"""
+Build a fresh snapshot of the in-process food vector index (VECTOR_INDEX_SNAPSHOT_DIR).
+API workers with VECTOR_INDEX_ENABLED pick it up on their next refresh; run it
+after bulk imports or an embedding backfill instead of waiting for the delta
+to be folded in.
+
+Usage:
+    python init/build_food_index.py
+"""
+import sys
+import time
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.database import SessionLocal
+from app.services.vector_index import food_vector_index
+
+
+def main():
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        print(f"🔄 Building food vector index snapshot in {food_vector_index.snapshot_dir}...")
+        version = food_vector_index.rebuild(db)
+        print(f"✅ Snapshot {version} built in {time.perf_counter() - started:.1f}s")
+    except Exception as e:
+        print(f"❌ Error building food vector index: {e}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
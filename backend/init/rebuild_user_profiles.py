@@ -0,0 +1,42 @@
+"""
+Rebuild materialized user preference profiles from user_food_history.
+Profiles are normally kept up to date on every history write; run this after
+bulk history imports, manual data fixes, or when the embedding model changes.
+
+Usage:
+    python init/rebuild_user_profiles.py            # every user
+    python init/rebuild_user_profiles.py 12 34      # only these user ids
+"""
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.database import SessionLocal
+from app.services import user_profile_service
+
+
+def main():
+    db = SessionLocal()
+    try:
+        user_ids = [int(arg) for arg in sys.argv[1:]]
+        if user_ids:
+            for user_id in user_ids:
+                profile = user_profile_service.rebuild_profile(db, user_id)
+                db.commit()
+                print(f"✅ Rebuilt profile for user {user_id} ({profile.total_interactions} interactions)")
+        else:
+            print("🔄 Rebuilding all user profiles...")
+            rebuilt = user_profile_service.rebuild_all_profiles(db)
+            print(f"✅ Rebuilt {rebuilt} user profiles")
+    except Exception as e:
+        print(f"❌ Error rebuilding user profiles: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Recompute store-in-city badges for every client in one pass and upsert them
+into client_badges. Schedule it nightly, e.g. from cron:
+
+    0 3 * * * cd /app && python init/recompute_client_badges.py --incremental
+
+Usage:
+    python init/recompute_client_badges.py                  # every client
+    python init/recompute_client_badges.py --incremental    # only cities whose totals changed since the last run
+    python init/recompute_client_badges.py --batch-size 500
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.database import SessionLocal
+from app.services.client_badges import recompute_all_badges
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute client badges in bulk")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only clients in cities whose valid-store totals changed since the last run")
+    parser.add_argument("--batch-size", type=int, default=None, help="clients per aggregate + upsert")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(f"🔄 Recomputing client badges ({'incremental' if args.incremental else 'full'})...")
+        summary = recompute_all_badges(db, incremental=args.incremental, batch_size=args.batch_size)
+        cities = "" if summary["cities_changed"] is None else f", {summary['cities_changed']} cities changed"
+        print(
+            f"✅ {summary['mode'].capitalize()} run {summary['run_id']}: "
+            f"{summary['clients_updated']}/{summary['clients_checked']} clients updated{cities}"
+        )
+    except Exception as e:
+        print(f"❌ Error recomputing client badges: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Recompute store and food rating aggregates (rating_avg, rating_count,
+rating_histogram) from the reviews table. They are normally kept current by
+create_review; run this after seeding reviews, manual data fixes, or to repair
+any drift. Only rows whose aggregates differ are rewritten.
+
+Usage:
+    python init/reconcile_ratings.py
+"""
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.database import SessionLocal
+from app.services import rating_aggregates
+
+
+def main():
+    db = SessionLocal()
+    try:
+        print("🔄 Reconciling rating aggregates...")
+        fixed = rating_aggregates.reconcile(db)
+        print(f"✅ Fixed {fixed['stores_fixed']} stores and {fixed['foods_fixed']} foods")
+    except Exception as e:
+        print(f"❌ Error reconciling ratings: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
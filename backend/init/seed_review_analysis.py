@@ -5,10 +5,12 @@ Run this script to populate the database with problem categories for review anal
 import sys
 from pathlib import Path
 
-sys.path.append(str(Path(__file__).parent))
+# Add backend directory to path
+sys.path.append(str(Path(__file__).parent.parent))
 
 from app.core.database import SessionLocal
 from app.models.problem_category import ProblemCategory
+from app.services import review_analysis
 
 # Problem categories with descriptions and keywords
 PROBLEM_CATEGORIES = [
@@ -105,6 +107,11 @@ def seed_problem_categories():
             db.add(category)
         
         db.commit()
+
+        # Embed once here so new reviews can be classified right away
+        embedded = review_analysis.embed_categories(db)
+        db.commit()
+        print(f"  Embedded {embedded} categories")
         
         print(f"\n✅ Successfully seeded {len(PROBLEM_CATEGORIES)} problem categories!")
         
@@ -453,6 +453,32 @@ def test_food_endpoints():
     success = response.status_code == 200
     print_result("List Foods", success)
 
+    # ===============================
+    # 2b. LIST FOODS BY CURSOR (X-Next-Cursor)
+    # ===============================
+    url = f"{BASE_URL}/foods?limit=1"
+    print_request("GET", url)
+    first_page = requests.get(url, headers=headers)
+    print_response(first_page)
+    next_cursor = first_page.headers.get("X-Next-Cursor")
+    success = first_page.status_code == 200 and len(first_page.json()) == 1
+    if success and next_cursor:
+        url = f"{BASE_URL}/foods?limit=1&cursor={next_cursor}"
+        print_request("GET", url)
+        second_page = requests.get(url, headers=headers)
+        print_response(second_page)
+        success = (
+            second_page.status_code == 200
+            and all(f["id"] != first_page.json()[0]["id"] for f in second_page.json())
+        )
+    print_result("List Foods by Cursor", success)
+
+    url = f"{BASE_URL}/foods?cursor=not-a-cursor"
+    print_request("GET", url)
+    response = requests.get(url, headers=headers)
+    print_response(response)
+    print_result("List Foods with Invalid Cursor (should 400)", response.status_code == 400)
+
     # ===============================
     # 3. GET FOOD DETAIL
     # ===============================
@@ -463,6 +489,16 @@ def test_food_endpoints():
     success = response.status_code == 200
     print_result("Get Food Detail", success)
 
+    # ===============================
+    # 3b. CONDITIONAL GET (ETag / If-None-Match)
+    # ===============================
+    etag = response.headers.get("ETag")
+    print_request("GET", url, headers={"If-None-Match": etag})
+    response = requests.get(url, headers={**headers, "If-None-Match": etag or ""})
+    print(f"Status Code: {response.status_code}")
+    success = bool(etag) and response.status_code == 304
+    print_result("Get Food Detail Not Modified (should 304)", success)
+
     # ===============================
     # 4. UPDATE FOOD
     # ===============================
@@ -478,6 +514,18 @@ def test_food_endpoints():
     success = response.status_code == 200
     print_result("Update Food", success)
 
+    # The update invalidates the cached detail, so the old ETag no longer matches
+    url = f"{BASE_URL}/foods/{food_id}"
+    print_request("GET", url, headers={"If-None-Match": etag})
+    response = requests.get(url, headers={**headers, "If-None-Match": etag or ""})
+    print_response(response)
+    success = (
+        response.status_code == 200
+        and response.headers.get("ETag") != etag
+        and response.json().get("description") == "Updated fried rice"
+    )
+    print_result("Get Food Detail After Update (new ETag)", success)
+
 
     # ===============================
     # 5. VALIDATE FOOD (ADMIN only)
@@ -543,6 +591,35 @@ def test_food_endpoints():
     success = response.status_code == 404
     print_result("Get Deleted Food (should 404)", success)
 
+    # ===============================
+    # 9. BULK IMPORT FOODS (CSV)
+    # ===============================
+    csv_content = (
+        "name,description,category,price,main_ingredients,taste_profile,texture,mood_tags\n"
+        "Bulk Soto Ayam,Chicken turmeric soup,main_meals,20000,chicken;turmeric,savory,soft,comfort\n"
+        "Bulk Es Teler,Mixed fruit iced dessert,desserts,15000,avocado;jackfruit,sweet,creamy,happy\n"
+        "Bulk Soto Ayam,Duplicate row in the same file,main_meals,20000,,,,\n"
+        ",Missing name,snacks,5000,,,,\n"
+    ).encode("utf-8")
+    files = {"file": ("menu.csv", csv_content, "text/csv")}
+
+    url = f"{BASE_URL}/foods/bulk"
+    print_request("POST", url, data="menu.csv")
+    response = requests.post(url, files=files, headers=headers)
+    print_response(response)
+    report = response.json() if response.status_code == 201 else {}
+    success = (
+        response.status_code == 201
+        and report.get("total_rows") == 4
+        and report.get("created") == 2
+        and report.get("failed") == 2
+    )
+    print_result("Bulk Import Foods (per-row report)", success)
+
+    for row in report.get("results", []):
+        if row.get("food_id"):
+            requests.delete(f"{BASE_URL}/foods/{row['food_id']}", headers=headers)
+
 
 # ========== USER FOOD HISTORY API TESTS ==========
 
@@ -793,6 +870,21 @@ def test_reviews_api():
         print_response(response)
         print_result(f"Create Review #{i}", response.status_code == 201)
 
+    # ===============================
+    # 4b. Store rating aggregates follow the new reviews
+    # ===============================
+    url = f"{BASE_URL}/stores/{store_id}"
+    print_request("GET", url)
+    response = requests.get(url)
+    print_response(response)
+    store = response.json() if response.status_code == 200 else {}
+    success = (
+        store.get("rating_count") == len(review_payloads)
+        and abs((store.get("rating_avg") or 0) - 4.75) < 1e-6
+        and store.get("rating_histogram") == [0, 0, 0, 0, 2]
+    )
+    print_result("Store Rating Aggregates", success)
+
     # ===============================
     # 5. READ Reviews by Store
     # ===============================
@@ -836,6 +928,27 @@ def test_reviews_api():
         for r in reviews:
             print(f" - ⭐ {r['rating']} | {r['comment']}")
 
+    # ===============================
+    # 8. Issues dashboard (UMKM only, from problem aggregates)
+    # ===============================
+    url = f"{BASE_URL}/reviews/umkm/issues"
+    print_request("GET", url)
+    response = requests.get(url, headers=headers)
+    print_response(response)
+    print_result("Issues Dashboard as Client (should 403)", response.status_code == 403)
+
+    response = requests.post(f"{BASE_URL}/auth/login", data={"username": "umkm@gmail.com", "password": "umkm1"})
+    if response.status_code == 200:
+        umkm_headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        print_request("GET", url)
+        response = requests.get(url, headers=umkm_headers)
+        print_response(response)
+        success = response.status_code == 200 and isinstance(response.json(), list)
+        print_result("Issues Dashboard as UMKM", success)
+        for store in response.json() if success else []:
+            for issue in store["issues"]:
+                print(f" - {store['store_name']}: {issue['name']} x{issue['review_count']} (severity {issue['severity_score']})")
+
 
 # ========== CLIENT BADGES API TESTS ==========
 
@@ -1018,6 +1131,45 @@ def test_client_badges_api():
             print(f"       Reviewed: {badge['reviewed_count']}/{badge['total_stores']} stores")
             print(f"       Stores: {[s['name'] for s in badge['reviewed_stores']]}")
 
+    # ===============================
+    # 6. Invalidating a store lowers its city total (city_store_counts)
+    # ===============================
+    if success and store_ids:
+        totals_before = {b["city"]: b["total_stores"] for b in response.json().get("badges", [])}
+
+        url = f"{BASE_URL}/stores/{store_ids[0]}/invalidate"
+        print_request("PUT", url)
+        response = requests.put(url, headers=headers_admin)
+        print_response(response)
+
+        url = f"{BASE_URL}/client-badges/store-in-city-badges"
+        print_request("POST", url)
+        response = requests.post(url, headers=headers)
+        print_response(response)
+        totals_after = {b["city"]: b["total_stores"] for b in response.json().get("badges", [])}
+        success = (
+            response.status_code == 200
+            and totals_after.get("Jakarta Selatan") == totals_before.get("Jakarta Selatan", 0) - 1
+        )
+        print_result("City Total Follows Invalidation", success)
+
+        requests.put(f"{BASE_URL}/stores/{store_ids[0]}/validate", headers=headers_admin)
+
+    # ===============================
+    # 7. Bulk recompute (admin only, queued as a job)
+    # ===============================
+    url = f"{BASE_URL}/client-badges/recompute?incremental=true"
+    print_request("POST", url)
+    response = requests.post(url, headers=headers)
+    print_response(response)
+    print_result("Recompute Badges as Client (should 403)", response.status_code == 403)
+
+    print_request("POST", url)
+    response = requests.post(url, headers=headers_admin)
+    print_response(response)
+    success = response.status_code == 202 and response.json().get("kind") == "recompute_client_badges"
+    print_result("Queue Bulk Badge Recompute", success)
+
     print("\n✔ Client badges API test completed.\n")
 
 
@@ -1143,6 +1295,16 @@ def test_ai_endpoints():
     print_response(response)
     print_result("AI Recommend Stores", response.status_code == 200)
 
+    # Test: Nearby stores (Jakarta, 10 km), ranked by distance and relevance
+    url = f"{BASE_URL}/ai/nearby-stores?lat=-6.2&lng=106.816666&radius_m=10000&query=coffee&only_valid=false"
+    print_request("GET", url)
+    response = requests.get(url, headers=headers)
+    print_response(response)
+    success = response.status_code == 200 and all(
+        s["distance_m"] <= 10000 for s in response.json()
+    )
+    print_result("AI Nearby Stores", success)
+
     # ===============================
     # 4. TEST AI FOOD ENDPOINTS
     # ===============================
@@ -1163,6 +1325,39 @@ def test_ai_endpoints():
     success = response.status_code == 200
     print_result("AI Search Foods (With Category Filter)", success)
 
+    # Test: Filtered vector search meets the requested limit (no post-filter recall loss)
+    for category in [None, "main_meals"]:
+        list_url = f"{BASE_URL}/foods/?limit=100" + (f"&category={category}" if category else "")
+        listed = requests.get(list_url, headers=headers).json()
+        searchable = [
+            f for f in listed
+            if f.get("is_valid_food") and f.get("embedding_status", "ready") == "ready"
+        ]
+        expected = min(5, len(searchable))
+
+        url = f"{BASE_URL}/ai/search-foods?query=comfort food&limit=5&only_valid=true"
+        if category:
+            url += f"&category={category}"
+        print_request("GET", url)
+        response = requests.get(url, headers=headers)
+        print_response(response)
+        foods = response.json().get("foods", []) if response.status_code == 200 else []
+        success = (
+            response.status_code == 200
+            and len(foods) == expected
+            and all(f["is_valid_food"] for f in foods)
+            and all(f["category"] == category for f in foods if category)
+        )
+        print_result(f"AI Search Foods Meets Limit (only_valid, category={category})", success)
+
+    # Test: Search Foods (hybrid full-text + vector)
+    url = f"{BASE_URL}/ai/search-foods?query=Rendang&limit=5&mode=hybrid"
+    print_request("GET", url)
+    response = requests.get(url, headers=headers)
+    print_response(response)
+    success = response.status_code == 200 and response.json().get("mode") == "hybrid"
+    print_result("AI Search Foods (Hybrid Mode)", success)
+
     # Test: Recommend Foods by Mood
     url = f"{BASE_URL}/ai/recommend-foods?query=I feel stressed and need comfort food&limit=5"
     print_request("GET", url)
@@ -1188,6 +1383,15 @@ def test_ai_endpoints():
         data = response.json()
         print(f"  📊 Total Recommendations: {data.get('total_results')}")
 
+    # Test: Batch Recommendations are admin only (JSON Lines stream for admins)
+    url = f"{BASE_URL}/ai/batch-recommendations"
+    payload = {"user_ids": [1, 2, 3], "limit": 5}
+    print_request("POST", url, data=payload)
+    response = requests.post(url, json=payload, headers=headers)
+    print_response(response)
+    success = response.status_code == 403
+    print_result("AI Batch Recommendations Forbidden for Client", success)
+
     # ===============================
     # 5. TEST AI DESCRIPTION GENERATION
     # ===============================
@@ -1227,6 +1431,25 @@ def test_ai_endpoints():
             data = response.json()
             print(f"  📝 Enhanced Description: {data.get('enhanced_description', '')[:150]}...")
 
+        # Test: Enhance Food Description in the background + poll the job
+        url = f"{BASE_URL}/ai/generate-enhanced-food-description/{test_food_id}?background=true"
+        print_request("POST", url, data=None)
+        response = requests.post(url, headers=headers)
+        print_response(response)
+        success = response.status_code == 202 and response.json().get("status") == "pending"
+        print_result("AI Enhance Food Description (Background Job)", success)
+
+        if success:
+            job_id = response.json()["id"]
+            url = f"{BASE_URL}/jobs/{job_id}"
+            print_request("GET", url)
+            response = requests.get(url, headers=headers)
+            print_response(response)
+            success = response.status_code == 200 and response.json().get("id") == job_id
+            print_result("GET Background Job Status", success)
+            if success:
+                print(f"  ⏳ Job status: {response.json().get('status')} (needs `python -m app.worker` running to finish)")
+
     print("\n✔ All AI API tests completed.\n")
 
 